@@ -187,6 +187,7 @@ setup(name = 'veusz',
                    'veusz/helpers/src/qtloops/beziers.cpp',
                    'veusz/helpers/src/qtloops/beziers_qtwrap.cpp',
                    'veusz/helpers/src/qtloops/numpyfuncs.cpp',
+                   'veusz/helpers/src/qtloops/colormap.cpp',
                    'veusz/helpers/src/qtloops/qtloops.sip'],
                   language="c++",
                   include_dirs=['veusz/helpers/src/qtloops',
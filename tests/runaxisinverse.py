@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+#    Copyright (C) 2017 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""A program to benchmark and check solving the functions of function
+axes.
+
+For each test function, this times solving --count values with
+widgets.axisfunction.solveFunction, both including and excluding
+making the table of solutions, and times the earlier solver (solving
+one value at a time by bisection) on --reference-count of the values.
+
+The solutions are checked to be at least as accurate as those of the
+earlier solver, i.e. that the function of each solution is within the
+larger of 1e-6 times the value and the error of the earlier solver.
+The program returns the number of values which fail this check.
+
+Examples:
+ runaxisinverse.py
+ runaxisinverse.py --count 1000000 --reference-count 100
+
+This program requires the veusz module to be on the PYTHONPATH.
+"""
+
+from __future__ import print_function, division
+import optparse
+import sys
+import time
+
+import numpy as N
+
+from veusz.compat import crange
+from veusz.widgets import axisfunction
+
+# function, mint, maxt, range of t to choose values from
+test_functions = (
+    ('t', None, None, (-1e3, 1e3)),
+    ('t**3', None, None, (-10., 10.)),
+    ('exp(t)', None, None, (-20., 20.)),
+    ('log10(t)', 1e-10, None, (1e-5, 1e5)),
+    ('sqrt(t)', 0., None, (0., 1e4)),
+    ('1/t', 0., None, (1e-3, 1e3)),
+    ('sinh(t)', None, None, (-5., 5.)),
+    ('arctan(t)', None, None, (-50., 50.)),
+    ('2*t+0.5*sin(t)', None, None, (-100., 100.)),
+)
+
+def makeFunction(text):
+    """Make a function of t evaluating text."""
+    env = dict(N.__dict__)
+    compiled = compile(text, '<function>', 'eval')
+    def function(t):
+        env['t'] = t
+        return eval(compiled, env)
+    return function
+
+def referenceSolve(function, vals, mint=None, maxt=None):
+    """The earlier solver, solving each value in turn by bisection."""
+
+    xvals = axisfunction._probevals
+    if mint is not None:
+        xvals = N.hstack(( mint, xvals[xvals > mint] ))
+    if maxt is not None:
+        xvals = N.hstack(( xvals[xvals < maxt], maxt ))
+
+    yvals = function(xvals) + N.zeros(len(xvals))
+    f = N.isfinite(yvals)
+    xfilt = xvals[f]
+    yfilt = yvals[f]
+    if yfilt[-1] < yfilt[0]:
+        yfilt = yfilt[::-1]
+        xfilt = xfilt[::-1]
+
+    out = []
+    for thisval in vals:
+        ydelta = yfilt - thisval
+        idx = N.searchsorted(ydelta, 0.)
+        if idx == 0 and ydelta[0] == 0.:
+            idx = 1
+
+        x1, x2 = xfilt[idx-1], xfilt[idx]
+        y1, y2 = ydelta[idx-1], ydelta[idx]
+
+        tol = abs(1e-6 * thisval)
+        for i in crange(30):
+            if abs(y1) <= tol and abs(y1) < abs(y2):
+                x2, y2 = x1, y1
+                break
+            if abs(y2) <= tol:
+                x1, y1 = x2, y2
+                break
+
+            x3 = 0.5*(x1+x2)
+            y3 = function(x3) - thisval
+            if y3 < 0:
+                x1 = x3
+                y1 = y3
+            else:
+                x2 = x3
+                y2 = y3
+
+        out.append(0.5*(x1+x2))
+
+    return N.array(out)
+
+def runTest(text, mint, maxt, trange, count, refcount):
+    """Time and check solving the function given by text.
+    Returns the number of inaccurate solutions."""
+
+    function = makeFunction(text)
+    vals = function(N.linspace(trange[0], trange[1], count))
+
+    start = time.time()
+    table = axisfunction.makeInverseTable(function, mint=mint, maxt=maxt)
+    tabletime = time.time() - start
+
+    start = time.time()
+    solved = axisfunction.solveInverseTable(function, table, vals)
+    solvetime = time.time() - start
+
+    refvals = vals[::max(1, count//refcount)]
+    start = time.time()
+    refsolved = referenceSolve(function, refvals, mint=mint, maxt=maxt)
+    reftime = (time.time() - start) * len(vals) / len(refvals)
+
+    # check accuracy against the earlier solver
+    error = N.abs(function(solved) - vals)
+    referror = N.abs(function(refsolved) - refvals)
+    allowed = N.abs(1e-6*vals)
+    refallowed = N.maximum(N.abs(1e-6*refvals), referror)
+    fails = int( N.sum(~(error <= allowed)) +
+                 N.sum(~(error[::max(1, count//refcount)][:len(refvals)] <=
+                         refallowed)) )
+
+    print(' %-16s %8.4fs %8.4fs %9.2fs %7.1fx %10.2g %10.2g%s' % (
+        text, tabletime, solvetime, reftime,
+        reftime / (tabletime+solvetime),
+        N.max(error / N.maximum(N.abs(vals), 1e-300)),
+        N.max(referror / N.maximum(N.abs(refvals), 1e-300)),
+        ' FAIL' if fails else ''))
+    return fails
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option("", "--count", type="int", default=100000,
+                      help="number of values to solve [default: %default]")
+    parser.add_option("", "--reference-count", type="int", default=1000,
+                      help="number of values to solve with the earlier"
+                      " solver [default: %default]")
+    options, args = parser.parse_args()
+    if args:
+        parser.error("no arguments expected")
+
+    # the test functions overflow for extreme values of t
+    N.seterr(all='ignore')
+
+    print(' %-16s %9s %9s %10s %8s %10s %10s' % (
+        'Function', 'table', 'solve', 'earlier', 'speedup', 'rel err',
+        'earlier'))
+    fails = 0
+    for text, mint, maxt, trange in test_functions:
+        fails += runTest(text, mint, maxt, trange, options.count,
+                         options.reference_count)
+
+    print()
+    if fails:
+        print('%i values were not solved accurately' % fails)
+    else:
+        print('All values solved accurately')
+    sys.exit(fails)
@@ -0,0 +1,566 @@
+#!/usr/bin/env python
+
+#    Copyright (C) 2011 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""A program to benchmark the speed of Veusz.
+
+This times loading, autoranging, painting and exporting synthetic
+documents of different sizes (number of points, number of widgets,
+image sizes and contour levels) and the example documents, and
+importing CSV, text and HDF5 files of different sizes. Loading
+documents with many expressions is timed with the cache of compiled
+expressions empty (load_cold), in the disk cache (load_disk) and in
+memory (load_memory).
+
+The results are written as a JSON file (-o), which can be compared
+against an earlier results file (--compare). The program returns the
+number of benchmarks which were slower than the baseline by more than
+the threshold fraction (--threshold).
+
+Examples:
+ runbenchmark.py -o base.json
+ runbenchmark.py -o new.json --compare base.json --threshold 0.2
+ runbenchmark.py --list
+ runbenchmark.py --select 'points*' --repeat 5
+
+This program requires the veusz module to be on the PYTHONPATH. It
+uses the offscreen Qt platform unless QT_QPA_PLATFORM is set.
+
+The time of each benchmark is the minimum of the repeats. If
+--memory is given, the peak memory allocated by Python and numpy
+during each benchmark is also recorded (using tracemalloc, which
+makes the timings slower).
+"""
+
+from __future__ import print_function
+import fnmatch
+import gc
+import glob
+import json
+import optparse
+import os
+import os.path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as N
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from veusz.compat import crange
+import veusz.qtall as qt4
+import veusz.utils as utils
+import veusz.document as document
+import veusz.setting as setting
+import veusz.dataimport
+
+# required to get structures initialised
+import veusz.windows.mainwindow
+
+# sizes of synthetic documents
+points_sizes = (1000, 10000, 100000)
+widgets_sizes = (10, 100, 500)
+image_sizes = (100, 500, 1000)
+contour_levels = (5, 20, 50)
+import_sizes = (1000, 100000)
+expression_sizes = (100, 1000)
+custom_sizes = (100, 1000)
+
+# formats to export to, if available
+export_formats = ('png', 'svg', 'pdf', 'emf', 'eps')
+
+def timeCall(func, repeat, memory):
+    """Call func repeat times.
+    Returns (minimum time, peak memory or None).
+    """
+
+    times = []
+    peak = None
+    for i in crange(repeat):
+        gc.collect()
+        if memory:
+            tracemalloc.start()
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+        if memory:
+            peak = max(peak or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return min(times), peak
+
+class Bench(object):
+    """Collects benchmark results."""
+
+    def __init__(self, select=None, repeat=3, memory=False, listonly=False):
+        self.select = select
+        self.repeat = repeat
+        self.memory = memory
+        self.listonly = listonly
+        self.results = {}
+
+    def wanted(self, name):
+        """Should benchmark with name be run?"""
+        return not self.select or any(
+            [fnmatch.fnmatch(name, s) for s in self.select])
+
+    def run(self, name, func, repeat=None):
+        """Run benchmark func with name, if selected."""
+        if not self.wanted(name):
+            return
+        if self.listonly:
+            print(name)
+            return
+        if repeat is None:
+            repeat = self.repeat
+        try:
+            t, peak = timeCall(func, repeat, self.memory)
+        except Exception as e:
+            print(' %-40s ERROR: %s' % (name, e))
+            self.results[name] = {'error': str(e)}
+            return
+
+        res = {'time': t}
+        if peak is not None:
+            res['peakmem'] = peak
+        self.results[name] = res
+        if peak is not None:
+            print(' %-40s %9.4fs %9.1fMB' % (name, t, peak/1048576.))
+        else:
+            print(' %-40s %9.4fs' % (name, t))
+
+def makePoints(npts):
+    """A document with a single xy plot of npts points."""
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    rand = N.random.RandomState(42)
+    ifc.SetData('x', rand.normal(size=npts), symerr=rand.rand(npts)*0.1)
+    ifc.SetData('y', rand.normal(size=npts), symerr=rand.rand(npts)*0.1)
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('graph'))
+    ifc.Add('xy', xData='x', yData='y', marker='circle')
+    return doc
+
+def makeWidgets(nwidgets):
+    """A document with a grid of nwidgets graphs, each with a
+    function and xy plot."""
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    ifc.SetData('x', N.arange(20.))
+    ifc.SetData('y', N.arange(20.)**2)
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('grid', columns=int(N.sqrt(nwidgets))+1))
+    for i in crange(nwidgets):
+        ifc.To(ifc.Add('graph'))
+        ifc.Add('xy', xData='x', yData='y')
+        ifc.Add('function', function='x**2')
+        ifc.To('..')
+    return doc
+
+def makeImage(size):
+    """A document with an image of size x size pixels."""
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    y, x = N.indices((size, size))
+    ifc.SetData2D('img', N.sin(x*0.05)*N.cos(y*0.03),
+                  xrange=(0, 1), yrange=(0, 1))
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('graph'))
+    ifc.Add('image', data='img', colorMap='heat')
+    return doc
+
+def makeContour(levels):
+    """A document with a contour plot with the number of levels."""
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    y, x = N.indices((200, 200))
+    ifc.SetData2D('img', N.sin(x*0.05)*N.cos(y*0.03),
+                  xrange=(0, 1), yrange=(0, 1))
+    ifc.To(ifc.Add('page'))
+    ifc.To(ifc.Add('graph'))
+    ifc.Add('contour', data='img', numLevels=levels)
+    return doc
+
+def writeExpressions(filename, nexpr):
+    """Save a document with nexpr custom definitions and nexpr
+    dataset expressions using them to filename."""
+    doc = document.Document()
+    ifc = document.CommandInterface(doc)
+    ifc.SetData('x', N.arange(100.))
+    for i in crange(nexpr):
+        ifc.AddCustom('definition', 'c%i' % i, '%i.5*pi' % i)
+        ifc.SetDataExpression(
+            'e%i' % i, 'x*c%i + sin(x/%i.)' % (i, i+1), linked=True)
+    with open(filename, 'w') as f:
+        doc.saveToFile(f)
+
+def loadExpressions(filename):
+    """Load document with expressions, evaluating its datasets."""
+    doc = loadDocument(filename)
+    for ds in doc.data.values():
+        ds.data
+
+def benchExpressions(bench, tempdir):
+    """Benchmark loading documents with many expressions, with the
+    compiled expression cache empty, on disk and in memory."""
+
+    cache = document.evaluate.compiledcache
+    olddisk = cache.disk, cache.diskchecked
+
+    def cold():
+        cache.clear()
+        cache.disk = None
+        loadExpressions(filename)
+
+    def disk():
+        cache.clear()
+        # read the file again each time
+        cache.disk = utils.MarshalCache(
+            'bench-expressions', 64*1024*1024, directory=tempdir)
+        loadExpressions(filename)
+
+    def memory():
+        loadExpressions(filename)
+
+    try:
+        cache.diskchecked = True
+        for nexpr in expression_sizes:
+            filename = os.path.join(tempdir, 'expressions_%i.vsz' % nexpr)
+            if not bench.listonly and any([
+                    bench.wanted('expressions/%i/%s' % (nexpr, s))
+                    for s in ('load_cold', 'load_disk', 'load_memory')]):
+                writeExpressions(filename, nexpr)
+                # fill the disk cache
+                cold()
+                cache.disk = utils.MarshalCache(
+                    'bench-expressions', 64*1024*1024, directory=tempdir)
+                cache.clear()
+                loadExpressions(filename)
+                cache.disk.save()
+
+            bench.run('expressions/%i/load_cold' % nexpr, cold)
+            bench.run('expressions/%i/load_disk' % nexpr, disk)
+            bench.run('expressions/%i/load_memory' % nexpr, memory)
+    finally:
+        cache.disk, cache.diskchecked = olddisk
+
+def benchCustoms(bench):
+    """Benchmark changing a custom definition in a document with many
+    of them, where no other definitions use it (edit_one) and where
+    each definition uses the previous one (edit_chain)."""
+
+    def benchEdit(name, defs):
+        doc = document.Document()
+        doc.applyOperation(document.OperationSetCustom('definition', defs))
+        def edit():
+            for i in crange(10):
+                defs[0] = ['c0', '%i.' % i]
+                doc.applyOperation(
+                    document.OperationSetCustom('definition', defs))
+        bench.run(name, edit)
+
+    for ncustom in custom_sizes:
+        names = ['customs/%i/%s' % (ncustom, s)
+                 for s in ('edit_one', 'edit_chain')]
+        if bench.listonly or not any([bench.wanted(n) for n in names]):
+            bench.run(names[0], None)
+            bench.run(names[1], None)
+            continue
+        benchEdit(
+            names[0], [['c%i' % i, '%i.5' % i] for i in crange(ncustom)])
+        benchEdit(
+            names[1], [['c0', '1.']] + [
+                ['c%i' % i, 'c%i+1' % (i-1)] for i in crange(1, ncustom)])
+
+def loadDocument(filename):
+    """Load a document from filename."""
+    doc = document.Document()
+    mode = 'hdf5' if os.path.splitext(filename)[1] == '.vszh5' else 'vsz'
+    doc.load(filename, mode=mode)
+    return doc
+
+def autoRange(doc):
+    """Recompute the ranges of each axis in the document."""
+    def walk(widget):
+        if hasattr(widget, 'computePlottedRange'):
+            # forget the range was already computed
+            widget.docchangeset = -1
+            widget.computePlottedRange()
+        for c in widget.children:
+            walk(c)
+    walk(doc.basewidget)
+
+def paintDocument(doc, dpi=100):
+    """Paint each page of the document into an image."""
+    for page in crange(doc.getNumberPages()):
+        size = doc.pageSize(page, dpi=(dpi, dpi))
+        img = qt4.QImage(size[0], size[1], qt4.QImage.Format_ARGB32)
+        img.fill(qt4.qRgb(255, 255, 255))
+        painter = document.DirectPainter(img)
+        helper = document.PaintHelper(doc, size, dpi=(dpi, dpi),
+                                      directpaint=painter)
+        painter.save()
+        doc.paintTo(helper, page)
+        painter.restore()
+        painter.end()
+
+def availableFormats():
+    """Return export formats which can be written."""
+    avail = set()
+    for exts, descr in document.Export.getFormats():
+        avail.update(exts)
+    return [f for f in export_formats if f in avail]
+
+def benchDocument(bench, name, makedoc, tempdir, formats):
+    """Benchmark creating/loading, autoranging, painting and exporting
+    the document made by makedoc."""
+
+    names = ['%s/%s' % (name, s) for s in
+             ['load', 'autorange', 'paint'] +
+             ['export_%s' % f for f in formats]]
+    if not any([bench.wanted(n) for n in names]):
+        return
+    if bench.listonly:
+        for n in names:
+            bench.run(n, None)
+        return
+
+    docs = []
+    bench.run(names[0], lambda: docs.append(makedoc()))
+    doc = docs[-1] if docs else makedoc()
+    del docs[:-1]
+
+    bench.run(names[1], lambda: autoRange(doc))
+    bench.run(names[2], lambda: paintDocument(doc))
+    pages = list(crange(doc.getNumberPages()))
+    for fmt, bname in zip(formats, names[3:]):
+        # formats which can only be written as single pages
+        if fmt not in ('pdf', 'ps'):
+            fpages = pages[:1]
+        else:
+            fpages = pages
+        filename = os.path.join(tempdir, 'bench.%s' % fmt)
+        export = document.Export(doc, filename, fpages)
+        bench.run(bname, export.export)
+
+def writeImportFiles(tempdir, nrows):
+    """Write files to test importing, returning dict of filenames."""
+    rand = N.random.RandomState(42)
+    data = rand.normal(size=(nrows, 4))
+    files = {}
+
+    files['csv'] = os.path.join(tempdir, 'bench_%i.csv' % nrows)
+    with open(files['csv'], 'w') as f:
+        f.write('a,b,c,d\n')
+        N.savetxt(f, data, delimiter=',', fmt='%.8g')
+
+    files['text'] = os.path.join(tempdir, 'bench_%i.dat' % nrows)
+    N.savetxt(files['text'], data, fmt='%.8g')
+
+    if h5py is not None:
+        files['hdf5'] = os.path.join(tempdir, 'bench_%i.hdf5' % nrows)
+        with h5py.File(files['hdf5'], 'w') as f:
+            for i, col in enumerate('abcd'):
+                f[col] = data[:, i]
+
+    return files
+
+def benchImports(bench, tempdir):
+    """Benchmark the importers."""
+
+    def doimport(func):
+        doc = document.Document()
+        ifc = document.CommandInterface(doc)
+        func(ifc)
+
+    for nrows in import_sizes:
+        if not any([bench.wanted('import_%s/%i' % (t, nrows))
+                    for t in ('csv', 'text', 'hdf5')]):
+            continue
+        if bench.listonly:
+            files = {'hdf5': None} if h5py is not None else {}
+        else:
+            files = writeImportFiles(tempdir, nrows)
+
+        bench.run(
+            'import_csv/%i' % nrows,
+            lambda: doimport(lambda ifc: ifc.ImportFileCSV(files['csv'])))
+        bench.run(
+            'import_text/%i' % nrows,
+            lambda: doimport(
+                lambda ifc: ifc.ImportFile(files['text'], 'a b c d')))
+        if 'hdf5' in files:
+            bench.run(
+                'import_hdf5/%i' % nrows,
+                lambda: doimport(
+                    lambda ifc: ifc.ImportFileHDF5(files['hdf5'], ['/'])))
+
+def runBenchmarks(bench, examples=True):
+    """Run all the benchmarks."""
+
+    formats = availableFormats()
+    tempdir = tempfile.mkdtemp(prefix='veusz-bench-')
+    try:
+        for npts in points_sizes:
+            benchDocument(bench, 'points/%i' % npts,
+                          lambda: makePoints(npts), tempdir, formats)
+        for nwidgets in widgets_sizes:
+            benchDocument(bench, 'widgets/%i' % nwidgets,
+                          lambda: makeWidgets(nwidgets), tempdir, formats)
+        for size in image_sizes:
+            benchDocument(bench, 'image/%i' % size,
+                          lambda: makeImage(size), tempdir, formats)
+        for levels in contour_levels:
+            benchDocument(bench, 'contour/%i' % levels,
+                          lambda: makeContour(levels), tempdir, formats)
+
+        benchImports(bench, tempdir)
+        benchExpressions(bench, tempdir)
+        benchCustoms(bench)
+
+        if examples:
+            thisdir = os.path.dirname(os.path.abspath(__file__))
+            exampledir = os.path.join(thisdir, '..', 'examples')
+            # examples load files relative to their directory
+            olddir = os.getcwd()
+            os.chdir(exampledir)
+            try:
+                for filename in sorted(glob.glob('*.vsz')):
+                    benchDocument(bench, 'example/%s' % filename,
+                                  lambda: loadDocument(filename),
+                                  tempdir, formats)
+            finally:
+                os.chdir(olddir)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+def compareResults(results, baseline, threshold):
+    """Compare results with baseline, printing changes.
+    Returns number of regressions."""
+
+    print()
+    print('Comparison with baseline (threshold %g%%)' % (threshold*100))
+    regressions = 0
+    for name in sorted(results):
+        new = results[name].get('time')
+        old = baseline.get(name, {}).get('time')
+        if new is None or old is None:
+            continue
+        frac = (new - old) / max(old, 1e-6)
+        flag = ''
+        if frac > threshold:
+            flag = ' REGRESSION'
+            regressions += 1
+        elif frac < -threshold:
+            flag = ' improved'
+        print(' %-40s %9.4fs %9.4fs %+7.1f%%%s' % (
+            name, old, new, frac*100, flag))
+
+    print()
+    if regressions:
+        print('%i benchmarks regressed' % regressions)
+    else:
+        print('No regressions')
+    return regressions
+
+if __name__ == '__main__':
+    os.environ['LC_ALL'] = 'C'
+    if 'QT_QPA_PLATFORM' not in os.environ:
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+    app = qt4.QApplication([])
+
+    setting.transient_settings['unsafe_mode'] = True
+
+    parser = optparse.OptionParser()
+    parser.add_option("-o", "--output", metavar="FILE",
+                      help="write results to JSON file")
+    parser.add_option("", "--compare", metavar="FILE",
+                      help="compare results with baseline JSON file")
+    parser.add_option("", "--threshold", type="float", default=0.2,
+                      help="fractional slowdown counted as a regression"
+                      " [default: %default]")
+    parser.add_option("", "--repeat", type="int", default=3,
+                      help="number of times to repeat each benchmark"
+                      " [default: %default]")
+    parser.add_option("", "--select", action="append", metavar="PATTERN",
+                      help="only run benchmarks matching wildcard pattern"
+                      " (can be given several times)")
+    parser.add_option("", "--no-examples", action="store_true",
+                      help="do not benchmark the example documents")
+    parser.add_option("", "--memory", action="store_true",
+                      help="record peak memory use of each benchmark")
+    parser.add_option("", "--list", action="store_true",
+                      help="list the benchmarks without timing them")
+
+    options, args = parser.parse_args()
+    if args:
+        parser.error("no arguments expected")
+    if options.memory and tracemalloc is None:
+        parser.error("--memory requires the tracemalloc module")
+
+    bench = Bench(select=options.select, repeat=options.repeat,
+                  memory=options.memory, listonly=options.list)
+    if options.list:
+        runBenchmarks(bench, examples=not options.no_examples)
+        sys.exit(0)
+
+    print("Veusz %s benchmarks" % utils.version())
+    runBenchmarks(bench, examples=not options.no_examples)
+
+    out = {
+        'veusz_version': utils.version(),
+        'python_version': platform.python_version(),
+        'numpy_version': N.__version__,
+        'qt_version': qt4.qVersion(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': options.repeat,
+        'results': bench.results,
+        }
+    if resource is not None:
+        # peak resident size of the whole run (kB on Linux)
+        out['maxrss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(out, f, indent=1, sort_keys=True)
+
+    regressions = 0
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        regressions = compareResults(
+            bench.results, baseline['results'], options.threshold)
+    sys.exit(regressions)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+#    Copyright (C) 2017 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""A program to check handling of data which the self tests do not
+cover, as it is not shown in plots.
+
+Each check prints whether it passed. The program returns the number of
+failed checks.
+
+This program requires the veusz module to be on the PYTHONPATH. It
+uses the offscreen Qt platform unless QT_QPA_PLATFORM is set.
+"""
+
+from __future__ import print_function, division
+import os
+import sys
+import traceback
+
+import numpy as N
+
+if 'QT_QPA_PLATFORM' not in os.environ:
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+import veusz.qtall as qt4
+import veusz.utils as utils
+import veusz.document as document
+import veusz.datasets as datasets
+import veusz.widgets
+import veusz.dataimport
+
+def checkPasteEdit():
+    """Copy and paste a dataset, then edit a value of the pasted one."""
+
+    doc = document.Document()
+    doc.applyOperation(document.OperationDatasetSet(
+        'x', datasets.Dataset(data=[1., 2., 3.], serr=[0.1, 0.2, 0.3])))
+    mime = document.generateDatasetsMime(['x'], doc)
+    doc.applyOperation(document.OperationDataPaste(mime))
+
+    doc.applyOperation(document.OperationDatasetSetVal(
+        'x_2', 'data', 1, 10.))
+    doc.applyOperation(document.OperationDatasetSetVal(
+        'x_2', 'serr', 0, 0.5))
+    return ( list(doc.data['x_2'].data) == [1., 10., 3.] and
+             list(doc.data['x_2'].serr) == [0.5, 0.2, 0.3] and
+             list(doc.data['x'].data) == [1., 2., 3.] )
+
+def checkDateStrings():
+    """Check converting many date strings at once gives the same results
+    as converting each in turn."""
+
+    strs = [
+        '2009-01-01', '2009-01-01T10:00:00', '2009-01-01 10:00:00.25',
+        '2009-01-01T10:00:00.5Z', '2009-01-01T10:00:00.5+01',
+        '2009-13-01', '01/02/2009', 'nonsense', '',
+    ]
+    ok = True
+    for test in (strs, strs[3:5]):
+        vals = utils.dateStringsToFloats(test)
+        for s, v in zip(test, vals):
+            ref = utils.dateStringToDate(s)
+            if not (v == ref or (N.isnan(v) and N.isnan(ref))):
+                print('  %r gave %r, not %r' % (s, v, ref))
+                ok = False
+    return ok
+
+checks = (
+    ('paste and edit dataset', checkPasteEdit),
+    ('convert date strings', checkDateStrings),
+)
+
+if __name__ == '__main__':
+    app = qt4.QApplication([])
+
+    fails = 0
+    for name, check in checks:
+        try:
+            ok = check()
+        except Exception:
+            traceback.print_exc()
+            ok = False
+        print(' %-40s %s' % (name, 'ok' if ok else 'FAIL'))
+        if not ok:
+            fails += 1
+
+    print()
+    if fails:
+        print('%i/%i checks FAILED' % (fails, len(checks)))
+    else:
+        print('All %i checks passed' % len(checks))
+    sys.exit(fails)
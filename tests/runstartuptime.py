@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+#    Copyright (C) 2017 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""A program to check the time Veusz takes to start without a window.
+
+Batch jobs using veusz --export or the embedding interface start many
+Veusz processes, so the time taken to start matters. This program
+times, in new Python processes,
+
+ - importing the modules needed to load and export a document and
+   making an empty document (startup)
+ - exporting an example document with veusz --export (export)
+
+and checks that each is within its time budget. It also checks that
+modules only needed by the user interface or for optional features
+(such as PyQt5.uic, urllib, h5py and astropy) or for other output
+formats are not imported at startup.
+
+The program returns the number of failed checks.
+
+Examples:
+ runstartuptime.py
+ runstartuptime.py --budget 0.5 --export-budget 1.5 --repeat 10
+
+This program requires the veusz module to be on the PYTHONPATH. It
+uses the offscreen Qt platform unless QT_QPA_PLATFORM is set.
+"""
+
+from __future__ import print_function
+import json
+import optparse
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# modules which should not be imported when starting without a window
+unwanted_modules = (
+    'PyQt5.uic',
+    'PyQt5.QtSvg',
+    'PyQt5.QtPrintSupport',
+    'urllib.request',
+    'urllib2',
+    'h5py',
+    'astropy',
+    'iminuit',
+    'minuit',
+    'veusz.windows',
+    'veusz.dialogs',
+    'veusz.dataimport.dialog_standard',
+    'veusz.document.svg_export',
+    )
+
+# program run to time the startup
+startup_program = '''
+import json, sys, time
+start = time.time()
+import veusz.qtall as qt4
+app = qt4.QApplication([])
+import veusz.document as document
+import veusz.widgets
+import veusz.dataimport
+doc = document.Document()
+print(json.dumps({'time': time.time()-start, 'modules': list(sys.modules)}))
+'''
+
+def runStartup():
+    """Time starting in a new process.
+    Returns (time, list of modules imported)."""
+    out = subprocess.check_output([sys.executable, '-c', startup_program])
+    res = json.loads(out.decode('utf-8').strip().split('\n')[-1])
+    return res['time'], res['modules']
+
+def runExport(vsz, outfile):
+    """Time exporting vsz to outfile with veusz --export."""
+    start = time.time()
+    subprocess.check_call(
+        [sys.executable, '-m', 'veusz.veusz_main', '--export', outfile, vsz],
+        cwd=os.path.dirname(vsz))
+    if not os.path.exists(outfile):
+        raise RuntimeError('Export did not create %s' % outfile)
+    return time.time() - start
+
+def checkTime(name, times, budget):
+    """Print the time (minimum of repeats), returning whether it is
+    within the budget."""
+    t = min(times)
+    ok = t <= budget
+    print(' %-30s %8.3fs (budget %.3fs)%s' % (
+        name, t, budget, '' if ok else ' FAIL'))
+    return ok
+
+def checkModules(modules):
+    """Check unwanted modules were not imported, returning the number
+    of failures."""
+    imported = set(modules)
+    fails = 0
+    for mod in unwanted_modules:
+        if mod in imported:
+            print(' %-30s imported at startup FAIL' % mod)
+            fails += 1
+    if not fails:
+        print(' %-30s ok' % 'no unwanted modules')
+    return fails
+
+if __name__ == '__main__':
+    if 'QT_QPA_PLATFORM' not in os.environ:
+        os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+
+    thisdir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = optparse.OptionParser()
+    parser.add_option("", "--budget", type="float", default=1.0,
+                      help="maximum time in seconds to start"
+                      " [default: %default]")
+    parser.add_option("", "--export-budget", type="float", default=2.0,
+                      help="maximum time in seconds to export the example"
+                      " [default: %default]")
+    parser.add_option("", "--example", metavar="FILE",
+                      default=os.path.join(thisdir, '..', 'examples',
+                                           'sin.vsz'),
+                      help="document to export [default: %default]")
+    parser.add_option("", "--repeat", type="int", default=5,
+                      help="number of times to repeat each check"
+                      " [default: %default]")
+    options, args = parser.parse_args()
+    if args:
+        parser.error("no arguments expected")
+
+    fails = 0
+
+    # the first run is not counted, as it may compile the modules
+    runStartup()
+    times = []
+    for i in range(options.repeat):
+        t, modules = runStartup()
+        times.append(t)
+    if not checkTime('startup', times, options.budget):
+        fails += 1
+    fails += checkModules(modules)
+
+    tempdir = tempfile.mkdtemp(prefix='veusz-startup-')
+    try:
+        outfile = os.path.join(tempdir, 'out.png')
+        vsz = os.path.abspath(options.example)
+        times = [runExport(vsz, outfile) for i in range(options.repeat)]
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+    if not checkTime('export', times, options.export_budget):
+        fails += 1
+
+    print()
+    if fails:
+        print('%i startup checks failed' % fails)
+    else:
+        print('All startup checks passed')
+    sys.exit(fails)
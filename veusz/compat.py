@@ -30,13 +30,29 @@ import sys
 
 cpy3 = sys.version_info[0] == 3
 
+class _LazyModule(object):
+    """Stand-in for a module which is imported on first use.
+
+    This avoids the cost of importing rarely-used modules (such as
+    urllib and the modules it pulls in) every time Veusz starts."""
+
+    def __init__(self, name):
+        self._lazyname = name
+        self._lazymodule = None
+
+    def __getattr__(self, attr):
+        if self._lazymodule is None:
+            __import__(self._lazyname)
+            self._lazymodule = sys.modules[self._lazyname]
+        return getattr(self._lazymodule, attr)
+
 if cpy3:
     # py3
 
     # builtins
     import builtins as cbuiltins
     from io import StringIO as CStringIO, BytesIO as CBytesIO
-    import urllib.request as curlrequest
+    curlrequest = _LazyModule('urllib.request')
 
     # imports
     import pickle
@@ -114,7 +130,7 @@ else:
     import cPickle as pickle
     from StringIO import StringIO as CStringIO
     from io import BytesIO as CBytesIO
-    import urllib2 as curlrequest
+    curlrequest = _LazyModule('urllib2')
 
     # range function
     crange = xrange
@@ -18,10 +18,18 @@
 
 # hooks to allow different datatypes to be imported
 
-from . import defn_standard, dialog_standard
-from . import defn_csv, dialog_csv
-from . import defn_twod, dialog_twod
-from . import defn_nd, dialog_nd
-from . import defn_hdf5, dialog_hdf5
-from . import dialog_fits, defn_fits
-from . import defn_plugin, dialog_plugin
+from . import defn_standard
+from . import defn_csv
+from . import defn_twod
+from . import defn_nd
+from . import defn_hdf5
+from . import defn_fits
+from . import defn_plugin
+
+def loadImportDialogs():
+    """Import the tabs of the import dialog for each datatype.
+
+    These are only imported when the import dialog is first shown, so
+    that they are not loaded when exporting or listening."""
+    from . import dialog_standard, dialog_csv, dialog_twod, dialog_nd
+    from . import dialog_hdf5, dialog_fits, dialog_plugin
@@ -179,18 +179,36 @@ class LinkedFileBase(object):
                 read.append(name)
         return read
 
-    def reloadLinks(self, document):
-        """Reload links using an operation"""
+    # can reloadRead be called in a worker thread?
+    threadedreload = True
 
-        # get the operation for reloading
-        op = self.createOperation()(self.params)
+    def reloadRead(self, tempdoc):
+        """Read the linked file into the temporary document tempdoc.
 
-        # load data into a temporary document
-        tempdoc = document.__class__()
+        This is the slow part of reloading, which does not modify the
+        real document, so can be run in a worker thread if
+        threadedreload is set.
 
+        Returns (op, None) if successful or (None, exception)
+        """
+
+        # get the operation for reloading
+        op = self.createOperation()(self.params)
         try:
             tempdoc.applyOperation(op)
         except Exception as ex:
+            return (None, ex)
+        return (op, None)
+
+    def reloadMerge(self, document, tempdoc, result):
+        """Merge datasets read by reloadRead into document.
+
+        result is the value returned by reloadRead
+        Returns (list of datasets read, dict of errors for datasets)
+        """
+
+        op, ex = result
+        if ex is not None:
             # if something breaks, record an error and return nothing
             document.log(cstr(ex))
 
@@ -210,11 +228,35 @@ class LinkedFileBase(object):
 
         return (read, errors)
 
+    def reloadLinks(self, document):
+        """Reload links using an operation"""
+
+        # load data into a temporary document
+        tempdoc = document.__class__()
+        result = self.reloadRead(tempdoc)
+        return self.reloadMerge(document, tempdoc, result)
+
 class OperationDataImportBase(object):
     """Default useful import class."""
 
+    # can readData be called in a background thread?
+    threadedread = True
+
     def __init__(self, params):
         self.params = params
+        self._initOutput()
+
+    def _initOutput(self):
+        """Clear the results of the import."""
+
+        # list of returned dataset names
+        self.outnames = []
+        # map of names to datasets
+        self.outdatasets = {}
+        # list of returned custom variables
+        self.outcustoms = []
+        # invalid conversions
+        self.outinvalids = {}
 
     def doImport(self, document):
         """Do import, override this.
@@ -256,21 +298,25 @@ class OperationDataImportBase(object):
 
     def do(self, document):
         """Do import."""
+        return self.mergeData(document, self.readData())
 
-        # list of returned dataset names
-        self.outnames = []
-        # map of names to datasets
-        self.outdatasets = {}
-        # list of returned custom variables
-        self.outcustoms = []
-        # invalid conversions
-        self.outinvalids = {}
+    def readData(self):
+        """Read the data without changing the document.
 
-        # remember datasets in document for undo
-        self.oldcustoms = None
+        This can be called in a background thread if threadedread is
+        set. Returns the value to pass to mergeData.
+        """
+
+        self._initOutput()
 
         # do actual import
-        retn = self.doImport()
+        return self.doImport()
+
+    def mergeData(self, document, retn):
+        """Add the data read by readData to the document."""
+
+        # remember datasets in document for undo
+        self.oldcustoms = None
 
         # these are custom values returned from the plugin
         if self.outcustoms:
@@ -315,3 +361,8 @@ class OperationDataImportBase(object):
             doceval.def_colors = self.oldcustoms[2]
             doceval.def_colormaps = self.oldcustoms[3]
             doceval.update()
+
+    def memoryUsage(self):
+        """Approximate number of bytes held by operation for undo."""
+        return sum([ds.memoryUsage() for name, ds in self.olddatasets
+                    if ds is not None])
@@ -269,3 +269,7 @@ class OperationDataCaptureSet(object):
             else:
                 # or delete datasets that weren't there before
                 doc.deleteData(name)
+
+    def memoryUsage(self):
+        """Approximate number of bytes held by operation for undo."""
+        return sum([ds.memoryUsage() for ds in self.olddata.values()])
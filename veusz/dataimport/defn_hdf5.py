@@ -358,15 +358,8 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                 raise base.ImportingError(
                     _("Could not interpret date-time syntax '%s'") % fmt)
 
-            dout = N.empty(len(data), dtype=N.float64)
-            for i, ditem in enumerate(data):
-                ditem = bconv(ditem)
-                try:
-                    match = datere.match(ditem)
-                    val = utils.dateREMatchToDate(match)
-                except ValueError:
-                    val = N.nan
-                dout[i] = val
+            dout = utils.dateREMatchesToFloats(
+                [datere.match(bconv(ditem)) for ditem in data])
 
             ds = datasets.DatasetDateTime(dout)
 
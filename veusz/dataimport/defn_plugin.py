@@ -59,6 +59,9 @@ class ImportParamsPlugin(base.ImportParamsBase):
 class LinkedFilePlugin(base.LinkedFileBase):
     """Represent a file linked using an import plugin."""
 
+    # plugins may not be thread safe
+    threadedreload = False
+
     def createOperation(self):
         """Return operation to recreate self."""
         return OperationDataImportPlugin
@@ -77,6 +80,9 @@ class OperationDataImportPlugin(base.OperationDataImportBase):
 
     descr = _('import using plugin')
 
+    # plugins may not be thread safe
+    threadedread = False
+
     def doImport(self):
         """Do import."""
 
@@ -297,8 +297,10 @@ class ReadCSV(object):
                 if not ok:
                     raise ValueError
             elif ctype == 'date':
-                m = self.datere.match(col)
-                v = utils.dateREMatchToDate(m)
+                # keep the match, to be converted all at once in setData
+                v = self.datere.match(col)
+                if v is None or v.lastindex is None:
+                    raise ValueError
             elif ctype == 'string':
                 v = col
             else:
@@ -377,6 +379,11 @@ class ReadCSV(object):
             for k in (name, name+'\0+-', name+'\0+', name+'\0-'):
                 data.append( self.data.get(k, None) )
 
+            dstype = self.nametypes[name]
+            if dstype == 'date':
+                # convert the date matches in one go
+                data[0] = utils.dateREMatchesToFloats(data[0])
+
             # make them have a maximum length by adding NaNs
             maxlen = max([len(x) for x in data if x is not None])
             for i in crange(len(data)):
@@ -385,7 +392,6 @@ class ReadCSV(object):
                         ( data[i], N.zeros(maxlen-len(data[i]))*N.nan ) )
 
             # create dataset
-            dstype = self.nametypes[name]
             if dstype == 'string':
                 ds = datasets.DatasetText(data=data[0], linked=linkedfile)
             elif dstype == 'date':
@@ -279,7 +279,8 @@ class DescriptorPart(object):
                         dat = val
 
                 elif self.datatype == 'date':
-                    dat = utils.dateStringToDate(val)
+                    # converted all at once in setOutput
+                    dat = val
 
                 # add data into dataset
                 dataset.append(dat)
@@ -334,8 +335,9 @@ class DescriptorPart(object):
                                            nerr = neg, perr = pos,
                                            linked = linkedfile )
                 elif self.datatype == 'date':
-                    ds = datasets.DatasetDateTime( data=vals,
-                                                   linked=linkedfile )
+                    ds = datasets.DatasetDateTime(
+                        data=utils.dateStringsToFloats(vals),
+                        linked=linkedfile )
                 elif self.datatype == 'string':
                     ds = datasets.DatasetText( data=vals,
                                                linked = linkedfile )
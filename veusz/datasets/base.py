@@ -20,7 +20,9 @@
 
 from __future__ import division
 
-from ..compat import cbasestr
+import numpy as N
+
+from ..compat import cbasestr, cvalues
 from .commonfn import _
 
 class DatasetException(Exception):
@@ -198,3 +200,13 @@ class DatasetConcreteBase(DatasetBase):
     def datasetAsText(self, fmt='%g', join='\t'):
         """Return dataset as text (for use by user)."""
         return ''
+
+    def memoryUsage(self):
+        """Return approximate number of bytes held by the dataset."""
+        total = 0
+        for val in cvalues(vars(self)):
+            if isinstance(val, N.ndarray):
+                total += val.nbytes
+            elif isinstance(val, list):
+                total += 64*len(val)
+        return total
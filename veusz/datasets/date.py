@@ -104,7 +104,7 @@ class DatasetDateTime(DatasetDateTimeBase):
         Returns deleted rows as a dict of {column:data, ...}
         """
         retn = {
-            'data': self.data[row:row+numrows],
+            'data': N.array(self.data[row:row+numrows]),
         }
         self.data = N.delete(self.data, N.s_[row:row+numrows])
         self.document.modifiedData(self)
@@ -128,7 +128,7 @@ class DatasetDateTime(DatasetDateTimeBase):
         if thetype != 'data':
             raise ValueError('invalid column %s' % thetype)
 
-        self.data = N.array(vals)
+        self.data = N.asarray(vals)
 
         # tell the document that we've changed
         self.document.modifiedData(self)
@@ -331,16 +331,20 @@ class DatasetExpression(Dataset1DBase):
         if self.docchangeset != self.document.changeset:
             # avoid infinite recursion!
             self.docchangeset = self.document.changeset
+            utils.profileCache('expression datasets', False)
 
             # zero out previous values
             for part in self.columns:
                 self.evaluated[part] = None
 
             # update all parts
-            for part in self.columns:
-                expr = self.expr[part]
-                if expr is not None and expr.strip() != '':
-                    ok = ok and self._evaluatePart(expr, part)
+            with utils.profilePhase(None, 'data'):
+                for part in self.columns:
+                    expr = self.expr[part]
+                    if expr is not None and expr.strip() != '':
+                        ok = ok and self._evaluatePart(expr, part)
+        else:
+            utils.profileCache('expression datasets', True)
 
         return ok
 
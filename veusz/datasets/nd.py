@@ -59,7 +59,7 @@ class DatasetNDBase(DatasetConcreteBase):
             if arr.ndim == 0:
                 return fmt % arr + '\n'
             elif arr.ndim == 1:
-                out = [fmt % v for v in arr]
+                out = [fmt % v for v in arr.tolist()]
                 return join.join(out)
             else:
                 out = []
@@ -120,10 +120,11 @@ class Dataset1DBase(DatasetConcreteBase):
         """Return data as text."""
 
         # work out which columns to write
+        # (python floats are formatted faster than numpy values)
         cols = []
         for c in (self.data, self.serr, self.perr, self.nerr):
             if c is not None:
-                cols.append(c)
+                cols.append(N.asarray(c).tolist())
 
         # format statement
         format = (fmt + join) * (len(cols)-1) + fmt + '\n'
@@ -229,7 +230,8 @@ class Dataset(Dataset1DBase):
         for col in self.columns:
             coldata = getattr(self, col)
             if coldata is not None:
-                retn[col] = coldata[row:row+numrows]
+                # copy so that the old column can be freed
+                retn[col] = N.array(coldata[row:row+numrows])
                 setattr(self, col, N.delete( coldata, N.s_[row:row+numrows] ))
 
         self.document.modifiedData(self)
@@ -144,7 +144,7 @@ class Dataset2DBase(DatasetConcreteBase):
 
         # write rows backwards, so lowest y comes first
         lines = []
-        for row in self.data[::-1]:
+        for row in self.data[::-1].tolist():
             line = format % tuple(row)
             lines.append(line)
         return ''.join(lines)
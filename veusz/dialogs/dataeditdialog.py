@@ -24,7 +24,7 @@ from __future__ import division
 
 import numpy as N
 
-from ..compat import cstr
+from ..compat import cstr, crange, czip
 from .. import qtall as qt4
 from .. import document
 from .. import datasets
@@ -36,6 +36,79 @@ def _(text, disambiguation=None, context="DataEditDialog"):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
+class _ColumnTextCache(object):
+    """Cache of the values shown for a dataset column.
+
+    Values are converted for a block of rows at a time when first
+    shown, with numbers formatted as text in the same way as the
+    view, so that scrolling through long datasets is quick.
+    """
+
+    blocksize = 256
+
+    def __init__(self):
+        self.blocks = {}
+
+    def value(self, ds, data, row):
+        """Get the value to show for row of column data of ds."""
+        block = row // self.blocksize
+        try:
+            vals = self.blocks[block]
+        except KeyError:
+            start = block*self.blocksize
+            vals = [ds.uiDataItemToData(v)
+                    for v in data[start:start+self.blocksize]]
+            locale = qt4.QLocale()
+            vals = [locale.toString(v, 'g', 6) if isinstance(v, float)
+                    else v for v in vals]
+            self.blocks[block] = vals
+        return vals[row % self.blocksize]
+
+    def invalidate(self, first, last):
+        """Forget the values of rows first to last."""
+        for block in crange(first // self.blocksize,
+                            last // self.blocksize + 1):
+            self.blocks.pop(block, None)
+
+def _columnsChanged(old, new):
+    """Are the (dataset, column data) pairs in old and new different
+    objects? Values changed in place are notified separately."""
+    return len(old) != len(new) or any(
+        o1 is not n1 or o2 is not n2
+        for (o1, o2), (n1, n2) in czip(old, new))
+
+def setValuesOperation(doc, items, descr):
+    """Return an operation setting blocks of values in dataset columns.
+
+    items is a list of (dataset name, column name, first row, texts),
+    where texts is a list of text values for consecutive rows. Missing
+    columns and rows are added to the datasets if necessary. Each block
+    is set with a single OperationDatasetSetRange.
+
+    Raises ValueError if a value is invalid for its dataset.
+    """
+
+    addcols = []
+    lengths = {}
+    setops = []
+    for dsname, colname, row, texts in items:
+        ds = doc.data[dsname]
+        vals = [ds.uiConvertToDataItem(t) for t in texts]
+        if getattr(ds, colname) is None and (dsname, colname) not in addcols:
+            addcols.append((dsname, colname))
+        lengths[dsname] = max(lengths.get(dsname, 0), row+len(vals))
+        setops.append(document.OperationDatasetSetRange(
+            dsname, colname, row, vals))
+
+    ops = [document.OperationDatasetAddColumn(dsname, colname)
+           for dsname, colname in addcols]
+    for dsname in sorted(lengths):
+        oldlength = len(doc.data[dsname].data)
+        if lengths[dsname] > oldlength:
+            ops.append(document.OperationDatasetInsertRow(
+                dsname, oldlength, lengths[dsname]-oldlength))
+    return document.OperationMultiple(ops+setops, descr=descr)
+
 class DatasetTableModel1D(qt4.QAbstractTableModel):
     """Provides access to editing and viewing of datasets."""
 
@@ -45,68 +118,90 @@ class DatasetTableModel1D(qt4.QAbstractTableModel):
         self.document = document
         self.dsname = datasetname
 
+        self.updateColumns()
         document.signalModified.connect(self.slotDocumentModified)
+        document.sigDataRangeChanged.connect(self.slotDataRangeChanged)
+
+    def updateColumns(self):
+        """Keep the dataset and columns shown, clearing the caches."""
+        ds = self.document.data.get(self.dsname)
+        if ds is None:
+            self.columns = []
+        else:
+            self.columns = [(ds, getattr(ds, col)) for col in ds.columns]
+        self.caches = [_ColumnTextCache() for c in self.columns]
+        self.rows = len(ds.data)+1 if ds is not None else 0
 
     def rowCount(self, parent):
         """Return number of rows."""
         if parent.isValid():
             # docs say we should return zero
             return 0
-
-        try:
-            return len(self.document.data[self.dsname].data)+1
-        except (KeyError, AttributeError):
-            return 0
+        return self.rows
 
     def slotDocumentModified(self):
         """Called when document modified."""
-        self.layoutChanged.emit()
+        ds = self.document.data.get(self.dsname)
+        columns = [] if ds is None else [
+            (ds, getattr(ds, col)) for col in ds.columns]
+        # values changed in place have already been updated
+        if _columnsChanged(self.columns, columns):
+            self.layoutAboutToBeChanged.emit()
+            self.updateColumns()
+            self.layoutChanged.emit()
+
+    def slotDataRangeChanged(self, dsname, colname, first, last):
+        """Update the rows of a column changed in place."""
+        if dsname != self.dsname or not self.columns:
+            return
+        ds = self.columns[0][0]
+        try:
+            column = ds.columns.index(colname)
+        except ValueError:
+            return
+        last = min(last, self.rows-2)
+        if first > last:
+            return
+        self.caches[column].invalidate(first, last)
+        self.dataChanged.emit(
+            self.index(first, column), self.index(last, column))
 
     def columnCount(self, parent):
         """Return number of columns."""
 
         if parent.isValid():
             return 0
-        try:
-            ds = self.document.data[self.dsname]
-        except KeyError:
-            return 0
-        return len( ds.column_descriptions )
+        return len(self.columns)
 
     def data(self, index, role):
         """Return data for index."""
-        # get dataset
-        ds = self.document.data[self.dsname]
-        if ds is not None:
-            # select correct part of dataset
-            data = getattr(ds, ds.columns[index.column()])
-        if ds is not None and data is not None and role in (
-            qt4.Qt.DisplayRole, qt4.Qt.EditRole):
-            # blank row at end of data
-            if index.row() == len(data):
-                return None
+        if role not in (qt4.Qt.DisplayRole, qt4.Qt.EditRole):
+            return None
 
-            # convert data to data
-            d = data[index.row()]
-            return ds.uiDataItemToData(d)
+        # select correct part of dataset
+        ds, data = self.columns[index.column()]
+        # blank row at end of data
+        if data is None or index.row() >= len(data):
+            return None
 
-        # empty entry
-        return None
+        if role == qt4.Qt.DisplayRole:
+            return self.caches[index.column()].value(ds, data, index.row())
+        # convert data to data
+        return ds.uiDataItemToData(data[index.row()])
 
     def headerData(self, section, orientation, role):
         """Return row numbers or column names."""
 
-        try:
-            ds = self.document.data[self.dsname]
-        except KeyError:
+        if not self.columns:
             return None
+        ds = self.columns[0][0]
 
         if role == qt4.Qt.DisplayRole:
             if orientation == qt4.Qt.Horizontal:
                 # column names
                 return ds.column_descriptions[section]
             else:
-                if section == len(ds.data):
+                if section == self.rows-1:
                     return "+"
                 # return row numbers
                 return section+1
@@ -123,6 +218,14 @@ class DatasetTableModel1D(qt4.QAbstractTableModel):
             return f
         return qt4.Qt.ItemIsEnabled
 
+    def columnTarget(self, column):
+        """Return (dataset name, column name) edited in column, or
+        None if it cannot be edited."""
+        ds = self.document.data.get(self.dsname)
+        if ds is None or not ds.editable:
+            return None
+        return self.dsname, ds.columns[column]
+
     def removeRows(self, row, count):
         """Remove rows."""
         self.document.applyOperation(
@@ -139,35 +242,20 @@ class DatasetTableModel1D(qt4.QAbstractTableModel):
         if not index.isValid() or role != qt4.Qt.EditRole:
             return False
 
-        row = index.row()
-        column = index.column()
         ds = self.document.data[self.dsname]
-        data = getattr(ds, ds.columns[index.column()])
-
-        # add new column if necessary
-        ops = document.OperationMultiple([], descr=_('set value'))
-        if data is None:
-            ops.addOperation(
-                document.OperationDatasetAddColumn(self.dsname,
-                                                   ds.columns[column]))
-
-        # add a row if necessary
-        if row == len(ds.data):
-            ops.addOperation(
-                document.OperationDatasetInsertRow(self.dsname, row, 1))
 
-        # update if conversion okay
+        # update if conversion okay, adding a row or column if necessary
         try:
-            val = ds.uiConvertToDataItem(value)
+            op = setValuesOperation(
+                self.document,
+                [(self.dsname, ds.columns[index.column()], index.row(),
+                  [value])],
+                _('set value'))
         except ValueError:
             return False
 
-        ops.addOperation(
-            document.OperationDatasetSetVal(self.dsname,
-                                            ds.columns[column],
-                                            row, val))
         try:
-            self.document.applyOperation(ops)
+            self.document.applyOperation(op)
         except RuntimeError:
             return False
         return True
@@ -181,14 +269,31 @@ class DatasetTableModelMulti(qt4.QAbstractTableModel):
         self.document = document
         self.dsnames = datasetnames
         document.signalModified.connect(self.slotDocumentModified)
+        document.sigDataRangeChanged.connect(self.slotDataRangeChanged)
 
         self.changeset = -1
         self.rows = 0
+        self.columns = []
+
+    def getColumns(self):
+        """Get list of (dataset, column data) for the datasets."""
+        columns = []
+        for name in self.dsnames:
+            dataset = self.document.data.get(name)
+            if (dataset is None or
+                not hasattr(dataset, 'data') or
+                not hasattr(dataset, 'columns') or
+                dataset.dimensions != 1):
+                continue
+            columns += [(dataset, getattr(dataset, col))
+                        for col in dataset.columns]
+        return columns
 
     def updateCounts(self):
         """Count rows and columns."""
 
         self.changeset = self.document.changeset
+        self.columns = self.getColumns()
 
         rows = 0
         rowcounts = self.rowcounts = []
@@ -217,37 +322,57 @@ class DatasetTableModelMulti(qt4.QAbstractTableModel):
             colattrs += attr
 
         self.rows = rows
+        self.caches = [_ColumnTextCache() for c in colattrs]
 
     def rowCount(self, parent):
         if parent.isValid():
             return 0
-        if self.changeset != self.document.changeset:
+        if self.changeset < 0:
             self.updateCounts()
         return self.rows
 
     def columnCount(self, parent):
         if parent.isValid():
             return 0
-        if self.changeset != self.document.changeset:
+        if self.changeset < 0:
             self.updateCounts()
         return len(self.colattrs)
 
     def slotDocumentModified(self):
-        self.updateCounts()
-        self.layoutChanged.emit()
+        # values changed in place have already been updated
+        if _columnsChanged(self.columns, self.getColumns()):
+            self.layoutAboutToBeChanged.emit()
+            self.updateCounts()
+            self.layoutChanged.emit()
+
+    def slotDataRangeChanged(self, dsname, colname, first, last):
+        """Update the rows of a column changed in place."""
+        if self.changeset < 0:
+            return
+        for column, attr in enumerate(self.colattrs):
+            if attr[0] == dsname and attr[1] == colname:
+                last = min(last, self.rowcounts[attr[2]]-2)
+                if first <= last:
+                    self.caches[column].invalidate(first, last)
+                    self.dataChanged.emit(
+                        self.index(first, column), self.index(last, column))
 
     def data(self, index, role):
         """Return data for index."""
 
+        if role not in (qt4.Qt.DisplayRole, qt4.Qt.EditRole):
+            return None
+
         dsname, colname, dsidx, colidx = self.colattrs[index.column()]
         ds = self.document.data[dsname]
         data = getattr(ds, colname)
 
-        if role == qt4.Qt.DisplayRole:
-            if index.row() < self.rowcounts[dsidx]-1:
-                # convert data to Data
-                d = data[index.row()]
-                return ds.uiDataItemToData(d)
+        if index.row() < self.rowcounts[dsidx]-1:
+            if role == qt4.Qt.DisplayRole:
+                return self.caches[index.column()].value(
+                    ds, data, index.row())
+            # convert data to Data
+            return ds.uiDataItemToData(data[index.row()])
 
         # empty entry
         return None
@@ -282,36 +407,33 @@ class DatasetTableModelMulti(qt4.QAbstractTableModel):
             return f
         return qt4.Qt.ItemIsEnabled
 
+    def columnTarget(self, column):
+        """Return (dataset name, column name) edited in column, or
+        None if it cannot be edited."""
+        dsname, colname, dsidx, colidx = self.colattrs[column]
+        ds = self.document.data.get(dsname)
+        if ds is None or not ds.editable:
+            return None
+        return dsname, colname
+
     def setData(self, index, value, role):
         """Validate and set data in dataset."""
 
         if not index.isValid() or role != qt4.Qt.EditRole:
             return False
 
-        row = index.row()
-        column = index.column()
-        dsname, colname, dsidx, colidx = self.colattrs[column]
-        ds = self.document.data[dsname]
-
-        ops = document.OperationMultiple([], descr=_('set value'))
-        if row >= self.rowcounts[dsidx]-1:
-            # add number of rows required to add new value below
-            ops.addOperation(
-                document.OperationDatasetInsertRow(
-                    dsname, self.rowcounts[dsidx]-1,
-                    row+1-self.rowcounts[dsidx]+1))
+        dsname, colname, dsidx, colidx = self.colattrs[index.column()]
 
-        # convert text to value
+        # convert text to value, adding rows to the dataset if needed
         try:
-            val = ds.uiConvertToDataItem(value)
+            op = setValuesOperation(
+                self.document, [(dsname, colname, index.row(), [value])],
+                _('set value'))
         except ValueError:
             return False
 
-        ops.addOperation(
-            document.OperationDatasetSetVal(dsname, colname, row, val))
-
         try:
-            self.document.applyOperation(ops)
+            self.document.applyOperation(op)
             return True
         except RuntimeError:
             return False
@@ -378,7 +500,7 @@ class DatasetTableModel2D(qt4.QAbstractTableModel):
             return 0
 
     def data(self, index, role):
-        if role == qt4.Qt.DisplayRole:
+        if role in (qt4.Qt.DisplayRole, qt4.Qt.EditRole):
             # get data (note y is reversed, sigh)
             try:
                 data = self.document.data[self.dsname].data
@@ -486,7 +608,7 @@ class DatasetTableModelND(qt4.QAbstractTableModel):
 
     def data(self, index, role):
         """Items in array."""
-        if role == qt4.Qt.DisplayRole:
+        if role in (qt4.Qt.DisplayRole, qt4.Qt.EditRole):
             try:
                 data = self.document.data[self.dsname].data
             except KeyError:
@@ -525,7 +647,7 @@ class ViewDelegate(qt4.QStyledItemDelegate):
     """
 
     def createEditor(self, parent, option, index):
-        if type(index.data()) is float:
+        if type(index.data(qt4.Qt.EditRole)) is float:
             return qt4.QLineEdit(parent)
         else:
             return qt4.QStyledItemDelegate.createEditor(
@@ -533,8 +655,9 @@ class ViewDelegate(qt4.QStyledItemDelegate):
 
     def setEditorData(self, editor, index):
         """Override setData to use correct formatting."""
-        if type(index.data()) is float:
-            txt = setting.ui_floattostring(index.data())
+        val = index.data(qt4.Qt.EditRole)
+        if type(val) is float:
+            txt = setting.ui_floattostring(val)
             editor.setText(txt)
         else:
             qt4.QStyledItemDelegate.setEditorData(self, editor, index)
@@ -558,6 +681,7 @@ class DataEditDialog(VeuszDialog):
         # actions for data table
         for text, slot in (
             (_('Copy'), self.slotCopy),
+            (_('Paste'), self.slotPaste),
             (_('Delete row'), self.slotDeleteRow),
             (_('Insert row'), self.slotInsertRow),
             ):
@@ -738,7 +862,7 @@ class DataEditDialog(VeuszDialog):
                     rowitems = []
                 lastrow = row
             rowitems.append(
-                cstr(model.createIndex(row, column).data()) )
+                cstr(model.createIndex(row, column).data(qt4.Qt.EditRole)) )
         if rowitems:
             lines.append( '\t'.join(rowitems) )
         lines.append('')  # blank line at end
@@ -747,6 +871,68 @@ class DataEditDialog(VeuszDialog):
         # put text on clipboard
         qt4.QApplication.clipboard().setText(lines)
 
+    def slotPaste(self):
+        """Paste tab separated text from the clipboard at the current
+        cell. A single value is copied to every selected cell."""
+
+        model = self.datatableview.model()
+        if not hasattr(model, 'columnTarget'):
+            return
+
+        text = qt4.QApplication.clipboard().text()
+        lines = text.split('\n')
+        if lines and not lines[-1]:
+            del lines[-1]
+        rows = [line.rstrip('\r').split('\t') for line in lines]
+        if not rows:
+            return
+
+        # list of (column, first row, values) to paste
+        blocks = []
+        selected = self.datatableview.selectionModel().selectedIndexes()
+        if len(rows) == 1 and len(rows[0]) == 1 and len(selected) > 1:
+            # fill selection, setting each run of rows in a column
+            cells = sorted([(i.column(), i.row()) for i in selected])
+            for column, row in cells:
+                if (blocks and blocks[-1][0] == column and
+                    blocks[-1][1]+len(blocks[-1][2]) == row):
+                    blocks[-1][2].append(rows[0][0])
+                else:
+                    blocks.append((column, row, [rows[0][0]]))
+        else:
+            current = self.datatableview.currentIndex()
+            if not current.isValid():
+                return
+            numcols = model.columnCount(qt4.QModelIndex())
+            for i in crange(max([len(r) for r in rows])):
+                column = current.column()+i
+                if column >= numcols:
+                    break
+                # a column stops at the first row without a value
+                vals = []
+                for r in rows:
+                    if i >= len(r):
+                        break
+                    vals.append(r[i])
+                blocks.append((column, current.row(), vals))
+
+        items = []
+        for column, row, vals in blocks:
+            target = model.columnTarget(column)
+            if target is not None:
+                items.append(target + (row, vals))
+        if not items:
+            return
+
+        try:
+            op = setValuesOperation(self.document, items, _('paste values'))
+        except ValueError:
+            qt4.QMessageBox.warning(
+                self, _("Paste failed"),
+                _("The text cannot be converted to values of the datasets"))
+            return
+        self.document.applyOperation(op)
+
     def slotDeleteRow(self):
         """Delete the current row."""
         self.datatableview.model().removeRows(
@@ -24,6 +24,7 @@ from .. import qtall as qt4
 from .. import setting
 from .. import utils
 from .. import document
+from ..document.export import PAGENUM, PAGENAME
 from ..compat import citems, cstrerror, cstr, cgetcwd
 from .veuszdialog import VeuszDialog
 
@@ -31,10 +32,6 @@ def _(text, disambiguation=None, context='ExportDialog'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-# used in filename to mark page number
-PAGENUM = '%PAGENUM%'
-PAGENAME = '%PAGENAME%'
-
 # formats which can have multiple pages
 multipageformats = set(('ps', 'pdf'))
 
@@ -125,6 +122,7 @@ class ExportDialog(VeuszDialog):
         self.exportSVGTextAsText.setChecked(setdb['export_SVG_text_as_text'])
         self.exportAntialias.setChecked(setdb['export_antialias'])
         self.exportQuality.setValue(setdb['export_quality'])
+        self.exportRasterThreshold.setValue(setdb['export_raster_threshold'])
 
         # validate and set DPIs
         dpis = ('75', '90', '100', '150', '200', '300')
@@ -179,6 +177,9 @@ class ExportDialog(VeuszDialog):
         for c in (self.exportSVGTextAsText, self.labelSVGTextAsText):
             c.setVisible(fmt == 'svg')
 
+        for c in (self.exportRasterThreshold, self.labelRasterThreshold):
+            c.setVisible(fmt in ('pdf', 'ps', 'eps', 'svg', 'emf'))
+
     def pageClicked(self, page):
         """If page type is set."""
         setting.settingdb['export_page'] = page
@@ -348,6 +349,7 @@ class ExportDialog(VeuszDialog):
         setdb['export_color'] = self.exportColor.currentIndex() == 0
         setdb['export_background'] = self.exportBackgroundButton.iconcolor
         setdb['export_SVG_text_as_text'] = self.exportSVGTextAsText.isChecked()
+        setdb['export_raster_threshold'] = self.exportRasterThreshold.value()
 
         # update dpi if possible
         # FIXME: requires some sort of visual notification of validator
@@ -372,6 +374,7 @@ class ExportDialog(VeuszDialog):
             quality=setdb['export_quality'],
             backcolor=setdb['export_background'],
             svgtextastext=setdb['export_SVG_text_as_text'],
+            rasterthreshold=setdb['export_raster_threshold'],
         )
 
         def _overwriteQuestion(filename):
@@ -98,6 +98,10 @@ class ImportDialog(VeuszDialog):
         VeuszDialog.__init__(self, parent, 'import.ui')
         self.document = document
 
+        # register the tabs, if not already done
+        from .. import dataimport
+        dataimport.loadImportDialogs()
+
         # whether file import looks likely to work
         self.filepreviewokay = False
 
@@ -62,6 +62,10 @@ class PreferencesDialog(VeuszDialog):
             setdb['plot_updatepolicy'])
         self.intervalCombo.setCurrentIndex(index)
         self.threadSpinBox.setValue( setdb['plot_numthreads'] )
+        self.undoMemorySpinBox.setValue( setdb['undo_memory_MB'] )
+        self.pluginCacheSpinBox.setValue( setdb['plugin_cache_MB'] )
+        self.imageCacheSpinBox.setValue( setdb['image_cache_MB'] )
+        self.expressionCacheSpinBox.setValue( setdb['expression_cache_MB'] )
         self.translationEdit.setText( setdb['translation_file'] )
         self.translationBrowseButton.clicked.connect(
             self.translationBrowseClicked)
@@ -189,6 +193,10 @@ class PreferencesDialog(VeuszDialog):
         setdb['plot_antialias'] = self.antialiasCheck.isChecked()
         setdb['ui_english'] = self.englishCheck.isChecked()
         setdb['plot_numthreads'] = self.threadSpinBox.value()
+        setdb['undo_memory_MB'] = self.undoMemorySpinBox.value()
+        setdb['plugin_cache_MB'] = self.pluginCacheSpinBox.value()
+        setdb['image_cache_MB'] = self.imageCacheSpinBox.value()
+        setdb['expression_cache_MB'] = self.expressionCacheSpinBox.value()
         setdb['translation_file'] = self.translationEdit.text()
 
         # use cwd
@@ -53,6 +53,10 @@ class ReloadData(VeuszDialog):
         # get a record of names, dates and sizes of files linked
         self.filestats = self.statLinkedFiles()
 
+        # timer to reload data
+        self.intervalTimer = qt4.QTimer()
+        self.intervalTimer.timeout.connect(self.reloadIfChanged)
+
         # actually reload the data (and show the user)
         self.reloadData()
 
@@ -60,10 +64,6 @@ class ReloadData(VeuszDialog):
         self.intervalCheck.clicked.connect(self.intervalUpdate)
         self.intervalTime.valueChanged[int].connect(self.intervalUpdate)
 
-        # timer to reload data
-        self.intervalTimer = qt4.QTimer()
-        self.intervalTimer.timeout.connect(self.reloadIfChanged)
-
         # manual reload
         self.reloadbutton = self.buttonBox.addButton(
             "&Reload again", qt4.QDialogButtonBox.ApplyRole)
@@ -102,24 +102,47 @@ class ReloadData(VeuszDialog):
             self.filestats = newstat
             self.reloadData()
 
+    def reloadProgress(self, numread, numfiles):
+        """Update progress bar while reloading."""
+        self.progressBar.setMaximum(numfiles)
+        self.progressBar.setValue(numread)
+        # keep the window updated, but do not allow the user to change
+        # anything during reloading
+        qt4.QCoreApplication.processEvents(qt4.QEventLoop.ExcludeUserInputEvents)
+
     def reloadData(self):
         """Reload linked data. Show the user what was done."""
 
         lines = []
         datasets = []
         errors = {}
+        fileerrors = {}
+        self.progressBar.setValue(0)
+        # events are processed while reloading, so stop the timer
+        # starting another reload
+        self.intervalTimer.stop()
         try:
             # try to reload the datasets
             datasets, errors = self.document.reloadLinkedDatasets(
-                self.filenames)
+                self.filenames, progress=self.reloadProgress,
+                fileerrors=fileerrors)
         except EnvironmentError as e:
             lines.append(_("Error reading file: %s") % cstr(e))
+        finally:
+            self.intervalUpdate()
 
         # header showing count
         if len(datasets) > 0:
             lines.append(_("Reloaded (%i)") % self.reloadct)
             self.reloadct += 1
 
+        # show files which could not be read
+        for filename in sorted(fileerrors):
+            lines.append(
+                _('Error reading file "%s": %s') %
+                (filename, fileerrors[filename])
+            )
+
         # show errors in read data
         for var, count in errors.items():
             if count:
@@ -148,7 +171,7 @@ class ReloadData(VeuszDialog):
                     lines.append( ' %s: %s' % (
                         var, ds.description()) )
 
-        if len(datasets) == 0:
+        if len(datasets) == 0 and not fileerrors:
             lines.append(_('Nothing to do. No linked datasets.'))
 
         self.outputedit.setPlainText('\n'.join(lines))
@@ -0,0 +1,109 @@
+#    Copyright (C) 2016 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""Dialog showing the time spent drawing each widget."""
+
+from __future__ import division
+
+from ..compat import citems
+from .. import qtall as qt4
+from .. import utils
+from ..document import export
+from .veuszdialog import VeuszDialog
+
+def _(text, disambiguation=None, context="RenderProfileDialog"):
+    """Translate text."""
+    return qt4.QCoreApplication.translate(context, text, disambiguation)
+
+class _NumberItem(qt4.QTreeWidgetItem):
+    """Tree item which sorts numerical columns by value."""
+
+    def __lt__(self, other):
+        col = self.treeWidget().sortColumn()
+        if col == 0:
+            return self.text(0) < other.text(0)
+        return self.data(col, qt4.Qt.UserRole) < other.data(
+            col, qt4.Qt.UserRole)
+
+class RenderProfileDialog(VeuszDialog):
+    """Dialog showing the profile of drawing the current page."""
+
+    def __init__(self, parent, document, page):
+        VeuszDialog.__init__(self, parent, 'renderprofile.ui')
+        self.document = document
+        self.page = page
+
+        self.phases = utils.renderprofile.phases
+        self.widgetTree.setHeaderLabels(
+            [_('Widget'), _('Total')] +
+            [descr for name, descr in self.phases] +
+            [_('Items')])
+
+        self.profilebutton = self.buttonBox.addButton(
+            _("&Profile again"), qt4.QDialogButtonBox.ApplyRole)
+        self.profilebutton.clicked.connect(self.profile)
+
+        self.buttonBox.button(qt4.QDialogButtonBox.Close).setDefault(True)
+
+        self.profile()
+
+    def profile(self):
+        """Draw the page and show the results."""
+
+        if self.page >= self.document.getNumberPages():
+            self.summaryLabel.setText(_('No page to profile'))
+            return
+
+        qt4.QApplication.setOverrideCursor(qt4.QCursor(qt4.Qt.WaitCursor))
+        try:
+            profile = export.profilePages(self.document, [self.page])
+        finally:
+            qt4.QApplication.restoreOverrideCursor()
+
+        self.summaryLabel.setText(
+            _('Time spent drawing each widget on page %i in seconds, '
+              'excluding the time drawing its children (%.3fs in total)') %
+            (self.page+1, profile.totaltime))
+
+        cols = ['total'] + [name for name, descr in self.phases] + ['items']
+        self.widgetTree.setSortingEnabled(False)
+        self.widgetTree.clear()
+        for path, entry in citems(profile.widgetResults()):
+            item = _NumberItem([path])
+            for i, col in enumerate(cols):
+                val = entry[col]
+                if col == 'items':
+                    item.setText(i+1, '%i' % val)
+                else:
+                    item.setText(i+1, '%.4f' % val)
+                item.setData(i+1, qt4.Qt.UserRole, val)
+                item.setTextAlignment(i+1, qt4.Qt.AlignRight)
+            self.widgetTree.addTopLevelItem(item)
+        self.widgetTree.setSortingEnabled(True)
+        self.widgetTree.sortItems(1, qt4.Qt.DescendingOrder)
+        for i in range(len(cols)+1):
+            self.widgetTree.resizeColumnToContents(i)
+
+        self.cacheTree.clear()
+        for name, (hits, misses, rate) in sorted(
+                citems(profile.cacheResults())):
+            item = qt4.QTreeWidgetItem(
+                [name, '%i' % hits, '%i' % misses, '%.1f%%' % (rate*100)])
+            self.cacheTree.addTopLevelItem(item)
+        for i in range(4):
+            self.cacheTree.resizeColumnToContents(i)
@@ -44,10 +44,15 @@ def _(text, disambiguation=None, context='CommandInterface'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
+def _lookupSetting(widget, path):
+    """Return setting with path relative to widget."""
+    return widget.prefLookup(path)
+
 def registerImportCommand(name, method):
     """Add command to command interface."""
     setattr(CommandInterface, name, method)
     CommandInterface.safe_commands.append(name)
+    CommandInterface.import_commands.append(name)
 
 class CommandInterface(qt4.QObject):
     """Class provides command interface."""
@@ -96,6 +101,9 @@ class CommandInterface(qt4.QObject):
         'WidgetType',
         ]
 
+    # commands added by registerImportCommand
+    import_commands = []
+
     # commands which can modify disk, etc
     unsafe_commands = (
         'Export',        
@@ -336,6 +344,16 @@ class CommandInterface(qt4.QObject):
         if self.verbose:
             print(_("Changed to widget '%s'") % self.currentwidget.path)
 
+    def _flushBulkUpdate(self):
+        """Make sure data are up to date if document in bulk update."""
+        if self.document.bulkupdate is not None:
+            self.document.bulkupdate.flush()
+
+    def _prefLookup(self, path):
+        """Get setting with path relative to the current widget."""
+        return self.document.cachedResolve(
+            _lookupSetting, self.currentwidget, path)
+
     def List(self, where='.'):
         """List the contents of a widget, by default the current widget."""
 
@@ -352,7 +370,7 @@ class CommandInterface(qt4.QObject):
 
     def Get(self, var):
         """Get the value of a setting."""
-        return self.currentwidget.prefLookup(var).val
+        return self._prefLookup(var).val
 
     def GetChildren(self, where='.'):
         """Return a list of widgets which are children of the widget of the
@@ -373,6 +391,7 @@ class CommandInterface(qt4.QObject):
 
     def GetDatasets(self):
         """Return a list of names of datasets."""
+        self._flushBulkUpdate()
         return sorted(self.document.data)
 
     def ResolveReference(self, setn):
@@ -382,7 +401,7 @@ class CommandInterface(qt4.QObject):
         If it is not a reference return None.
         """
 
-        pref = self.currentwidget.prefLookup(setn)
+        pref = self._prefLookup(setn)
         if pref.isReference():
             real = pref.getReference().resolve(pref)
             return real.path
@@ -400,7 +419,7 @@ class CommandInterface(qt4.QObject):
 
     def Set(self, var, val):
         """Set the value of a setting."""
-        pref = self.currentwidget.prefLookup(var)
+        pref = self._prefLookup(var)
 
         op = operations.OperationSettingSet(pref, val)
         self.document.applyOperation(op)
@@ -411,7 +430,7 @@ class CommandInterface(qt4.QObject):
     def SetToReference(self, var, val):
         """Set setting to a reference value."""
 
-        pref = self.currentwidget.prefLookup(var)
+        pref = self._prefLookup(var)
         op = operations.OperationSettingSet(pref, setting.Reference(val))
         self.document.applyOperation(op)
         
@@ -438,9 +457,14 @@ class CommandInterface(qt4.QObject):
 
     def SetDataDateTime(self, name, vals):
         """Set datetime dataset to be values given.
-        vals is a list of python datetime objects
+        vals is a list of python datetime objects, a numpy datetime64
+        array or a list of date strings
         """
-        v = [utils.datetimeToFloat(x) for x in vals]
+        vals = N.asarray(vals)
+        if vals.dtype.kind in 'US':
+            v = utils.dateStringsToFloats(vals.astype(N.str_))
+        else:
+            v = utils.datetime64ToFloat(vals)
         ds = datasets.DatasetDateTime(v)
         op = operations.OperationDatasetSet(name, ds)
         self.document.applyOperation(op)
@@ -659,7 +683,7 @@ class CommandInterface(qt4.QObject):
                       name, repr(data.data))
             )
 
-    def GetData(self, name):
+    def GetData(self, name, datetime64=False):
         """Return the data with the name.
 
         For a 1D dataset, returns a tuple (None if not defined)
@@ -669,14 +693,18 @@ class CommandInterface(qt4.QObject):
         For an nD dataset returns data array
         For a text dataset, return a list of text
         For a date dataset, return a list of python datetime objects
+         (or a numpy datetime64 array if datetime64 is set)
 
         Return copies, so that the original data can't be indirectly modified
         """
 
+        self._flushBulkUpdate()
         d = self.document.getData(name)
         if d.displaytype == 'text':
             return d.data[:]
         elif d.displaytype == 'date':
+            if datetime64:
+                return utils.floatToDatetime64(d.data)
             return [utils.floatToDateTime(x) for x in d.data]
         elif d.dimensions == 2:
             return (d.data.copy(), d.xrange, d.yrange)
@@ -704,6 +732,7 @@ class CommandInterface(qt4.QObject):
         For a datetime dataset, returns 'datetime'
         """
 
+        self._flushBulkUpdate()
         try:
             d = self.document.getData(name)
         except KeyError:
@@ -740,9 +769,38 @@ class CommandInterface(qt4.QObject):
         """Print document."""
         export.printDialog(None, self.document)
             
+    def ProfileRender(self, page=None, dpi=100, report=False):
+        """Draw pages, recording the time spent drawing each widget.
+
+        page is a page number or list of page numbers (all pages if None)
+        dpi is the resolution to draw at
+
+        Returns a dict with keys 'widgets' (a dict of widget paths to
+        dicts of times in seconds for each phase of drawing: 'draw',
+        'data', 'autorange', 'coords', 'paint' and 'text', plus the
+        'total' time and the number of 'items' drawn), 'caches' (a
+        dict of cache names to (hits, misses, hit rate)) and 'total'.
+
+        If report is True, return the results as a text table.
+        """
+
+        if page is None:
+            pages = list(range(self.document.getNumberPages()))
+        else:
+            try:
+                pages = [p for p in page]
+            except TypeError:
+                pages = [page]
+
+        profile = export.profilePages(self.document, pages, dpi=dpi)
+        if report:
+            return profile.report()
+        return profile.results()
+
     def Export(self, filename, color=True, page=[0], dpi=100,
                antialias=True, quality=85, backcolor='#ffffff00',
-               pdfdpi=150, svgtextastext=False):
+               pdfdpi=150, svgtextastext=False, rasterthreshold=0,
+               processes=1):
         """Export plot to filename.
 
         color is True or False if color is requested in output file
@@ -754,6 +812,21 @@ class CommandInterface(qt4.QObject):
          a #RRGGBBAA value (red, green, blue, alpha)
         pdfdpi is the dpi to use when exporting eps or pdf files
         svgtextastext: write text in SVG as text, rather than curves
+        rasterthreshold: in pdf, eps, svg and emf files, write plotters
+         drawing more than this number of items as bitmaps at pdfdpi,
+         if their exportAs setting is auto (0 disables this)
+        processes: number of processes to draw pages in when exporting
+         several pages (0 for one per CPU)
+
+        If several pages are exported to a bitmap format, the filename
+        should include %PAGENUM% or %PAGENAME%, which are replaced by
+        the page number or name, to write each page to a separate file.
+
+        filename can also be a list of filenames to write the same
+        pages to, which are only drawn once. Items in the list can be
+        (filename, options) tuples, where options is a dict of the
+        options above to use for that file, e.g. ('big.png',
+        {'bitmapdpi': 300}) (see Export.exportTargets).
         """
 
         # compatibility where page was a single number
@@ -762,12 +835,17 @@ class CommandInterface(qt4.QObject):
         except TypeError:
             pages = [page]
 
+        multiple = not isinstance(filename, cbasestr)
         e = export.Export(
-            self.document, filename, pages, color=color,
-            bitmapdpi=dpi, antialias=antialias,
+            self.document, None if multiple else filename, pages,
+            color=color, bitmapdpi=dpi, antialias=antialias,
             quality=quality, backcolor=backcolor,
-            pdfdpi=pdfdpi, svgtextastext=svgtextastext)
-        e.export()
+            pdfdpi=pdfdpi, svgtextastext=svgtextastext,
+            rasterthreshold=rasterthreshold, processes=processes)
+        if multiple:
+            e.exportTargets(filename)
+        else:
+            e.export()
 
     def Rename(self, widget, newname):
         """Rename the widget with the path given to the new name.
@@ -835,7 +913,7 @@ class CommandInterface(qt4.QObject):
         Raise a ValueError if path is not a setting
         """
 
-        setn = self.currentwidget.prefLookup(path)
+        setn = self._prefLookup(path)
         return setn.typename
 
     def TagDatasets(self, tag, datasets):
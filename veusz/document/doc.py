@@ -23,22 +23,25 @@
 
 from __future__ import division
 import codecs
+import copy
 import os.path
 import traceback
 import datetime
+import threading
+import time
 from collections import defaultdict
 
-try:
-    import h5py
-except ImportError:
-    h5py = None
+# imported when saving to HDF5, as it is slow to import
+h5py = None
 
-from ..compat import citems, cvalues, cstr, CStringIO, cexecfile
+from ..compat import citems, cvalues, cstr, czip, crange, CStringIO, \
+    cexecfile
 from .. import qtall as qt4
 
 from . import widgetfactory
 from . import painthelper
 from . import evaluate
+from . import imagecache
 
 from .. import datasets
 from .. import utils
@@ -69,11 +72,140 @@ class DocSuspend(object):
     def __exit__(self, type, value, traceback):
         self.doc.enableUpdates()
 
+class DocBulkUpdate(object):
+    """Context manager for building a document quickly (e.g. loading).
+
+    Operations are applied directly, without being recorded for undo
+    or sending updates for each one. The undo history is cleared at
+    the end. Updating the evaluation context after custom definitions
+    change is deferred until needed.
+
+    While the deferimports attribute is set, files imported are read
+    in background threads while the rest of the document is built.
+    Their datasets are added to the document in order, before any
+    operation which uses data, or at the end. The import operation
+    given is not changed, so this should only be set when its results
+    are not used (see loader.executeScript).
+
+    If timings is a dict, the time spent in each type of operation is
+    added to it (in seconds).
+    """
+
+    def __init__(self, doc, timings=None):
+        self.doc = doc
+        self.deferimports = False
+        self.timings = timings if timings is not None else {}
+        # list of (operation, thread, result list) for imports
+        self.pending = []
+        # limit number of reads at the same time
+        self.readlimit = threading.BoundedSemaphore(
+            utils.defaultNumThreads())
+        # whether evaluation context needs updating
+        self.evalupdate = False
+
+    def __enter__(self):
+        self.doc.suspendUpdates()
+        self.outer = self.doc.bulkupdate
+        if self.outer is not None:
+            self.outer.flush()
+        self.doc.bulkupdate = self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        try:
+            if type is None:
+                self.flush()
+            else:
+                self.join()
+        finally:
+            self.doc.bulkupdate = self.outer
+            if self.evalupdate:
+                self.doc.evaluate.update()
+            self.doc.clearHistory()
+            self.doc.changeset += 1
+            self.doc.enableUpdates()
+
+    def addTime(self, name, start):
+        """Add time since start to timing name."""
+        self.timings[name] = self.timings.get(name, 0.) + time.time()-start
+
+    def applyOperation(self, operation):
+        """Apply operation to the document."""
+
+        start = time.time()
+        name = operation.__class__.__name__
+        if self.deferimports and getattr(operation, 'threadedread', False) \
+                and getattr(operation.params, 'filename', None):
+            # read into a copy, which is not seen by the caller
+            operation = copy.copy(operation)
+            result = []
+            thread = threading.Thread(
+                target=self._read, args=(operation, result))
+            thread.daemon = True
+            thread.start()
+            self.pending.append((operation, thread, result))
+            self.addTime(name, start)
+            return None
+
+        if getattr(operation, 'usesdata', True):
+            self.flush()
+
+        retn = operation.do(self.doc)
+        self.addTime(name, start)
+        return retn
+
+    def _read(self, operation, result):
+        """Read data for operation (in a thread)."""
+        start = time.time()
+        with self.readlimit:
+            try:
+                result.append((operation.readData(), None))
+            except Exception as e:
+                result.append((None, e))
+        result.append(time.time()-start)
+
+    def join(self):
+        """Wait for any pending reads, discarding the results."""
+        for op, thread, result in self.pending:
+            thread.join()
+        del self.pending[:]
+
+    def flush(self):
+        """Add the results of pending reads to the document, and
+        update the evaluation context if required.
+
+        If a read failed, its exception is raised here.
+        """
+
+        if self.evalupdate:
+            start = time.time()
+            self.evalupdate = False
+            self.doc.evaluate.update(defer=False)
+            self.addTime('evaluate update', start)
+
+        while self.pending:
+            op, thread, result = self.pending.pop(0)
+            start = time.time()
+            thread.join()
+            self.addTime('waiting for reads', start)
+            self.timings['reading files (threads)'] = (
+                self.timings.get('reading files (threads)', 0.) + result[1])
+
+            retn, exc = result[0]
+            if exc is not None:
+                self.join()
+                raise exc
+            start = time.time()
+            op.mergeData(self.doc, retn)
+            self.addTime(op.__class__.__name__, start)
+
 class Document(qt4.QObject):
     """Document class for holding the graph data.
     """
 
     pluginsloaded = False
+    # plugin files loaded in addition to those in the settings
+    extraplugins = []
 
     # this is emitted when the document is modified
     signalModified = qt4.pyqtSignal(int)
@@ -83,17 +215,27 @@ class Document(qt4.QObject):
     sigWiped = qt4.pyqtSignal()
     # to ask whether the import is allowed (module name and symbol list)
     sigAllowedImports = qt4.pyqtSignal(cstr, list)
+    # emitted by widgets to ask views to redraw, without the document
+    # changing (e.g. after finishing a calculation in the background)
+    sigRedrawRequest = qt4.pyqtSignal()
+    # emitted when values of a dataset column are changed in place
+    # (dataset name, column name, first row, last row)
+    sigDataRangeChanged = qt4.pyqtSignal(cstr, cstr, int, int)
 
     def __init__(self):
         """Initialise the document."""
         qt4.QObject.__init__( self )
 
-        if not Document.pluginsloaded:
-            Document.loadPlugins()
-            Document.pluginsloaded = True
-
         # change tracking of document as a whole
         self.changeset = 0            # increased when the document changes
+        self.treechangeset = 0        # increased when the widget tree changes
+
+        # set to DocBulkUpdate object while in bulk update mode
+        self.bulkupdate = None
+
+        # cache of resolved paths, valid for a single treechangeset
+        self._resolvecache = {}
+        self._resolvecacheset = -1
 
         # map tags to dataset names
         self.datasettags = defaultdict(list)
@@ -108,6 +250,9 @@ class Document(qt4.QObject):
         # evaluation context
         self.evaluate = evaluate.Evaluate(self)
 
+        # decoded images shared by widgets
+        self.imagecache = imagecache.ImageCache(self)
+
         self.clearHistory()
         self.wipe()
 
@@ -117,6 +262,7 @@ class Document(qt4.QObject):
         self.basewidget = widgetfactory.thefactory.makeWidget(
             'document', None, None)
         self.basewidget.document = self
+        self.treechangeset += 1
         self.setModified(False)
         self.filename = ""
         self.evaluate.wipe()
@@ -146,6 +292,11 @@ class Document(qt4.QObject):
         """Return context manager for suspending updates."""
         return DocSuspend(self)
 
+    def bulkUpdate(self, timings=None):
+        """Return context manager for building the document quickly,
+        without undo. See DocBulkUpdate."""
+        return DocBulkUpdate(self, timings=timings)
+
     def makeDefaultDoc(self):
         """Add default widgets to create document."""
         page = widgetfactory.thefactory.makeWidget('page', self.basewidget)
@@ -167,6 +318,9 @@ class Document(qt4.QObject):
         Updates are suspended during the operation.
         """
 
+        if self.bulkupdate is not None:
+            return self.bulkupdate.applyOperation(operation)
+
         with DocSuspend(self):
             retn = operation.do(self)
             self.changeset += 1
@@ -176,11 +330,32 @@ class Document(qt4.QObject):
             self.historybatch[-1].addOperation(operation)
         else:
             # standard mode
-            self.historyundo = self.historyundo[-9:] + [operation]
+            self.historyundo.append(operation)
+            self.trimHistory()
         self.historyredo = []
 
         return retn
 
+    def trimHistory(self):
+        """Remove old undo operations to keep within the number of
+        undo levels and memory budget in the preferences.
+
+        The most recent operation is always kept.
+        """
+
+        levels = max(1, setting.settingdb['undo_levels'])
+        del self.historyundo[:-levels]
+
+        budget = setting.settingdb['undo_memory_MB'] * 1024 * 1024
+        sizes = [getattr(op, 'memoryUsage', lambda: 0)()
+                 for op in self.historyundo]
+        total = sum(sizes)
+        num = 0
+        while total > budget and num < len(sizes)-1:
+            total -= sizes[num]
+            num += 1
+        del self.historyundo[:num]
+
     def batchHistory(self, batch):
         """Enable/disable batch history mode.
 
@@ -223,13 +398,8 @@ class Document(qt4.QObject):
 
         widget = self.basewidget
         for p in [i for i in path.split('/') if i != '']:
-            for child in widget.children:
-                if p == child.name:
-                    widget = child
-                    break
-            else:
-                # break wasn't called
-                assert False
+            widget = widget.getChild(p)
+            assert widget is not None
         return widget
 
     def resolveFullSettingPath(self, path):
@@ -239,14 +409,11 @@ class Document(qt4.QObject):
         widget = self.basewidget
         parts = [i for i in path.split('/') if i != '']
         while len(parts) > 0:
-            for child in widget.children:
-                if parts[0] == child.name:
-                    widget = child
-                    del parts[0]
-                    break
-            else:
-                # no child with name
+            child = widget.getChild(parts[0])
+            if child is None:
                 break
+            widget = child
+            del parts[0]
 
         # get Setting object
         s = widget.settings
@@ -281,6 +448,12 @@ class Document(qt4.QObject):
         if dataset in self.data.values():
             self.setModified()
 
+    def modifiedDataRange(self, name, column, first, last):
+        """Notify that rows first to last of column of dataset name
+        were changed in place, so views can update just those rows.
+        modifiedData should also be called."""
+        self.sigDataRangeChanged.emit(name, column, first, last)
+
     def getLinkedFiles(self, filenames=None):
         """Get a list of LinkedFile objects used by the document.
         if filenames is a set, only get the objects with filenames given
@@ -292,32 +465,92 @@ class Document(qt4.QObject):
                 links.add(ds.linked)
         return list(links)
 
-    def reloadLinkedDatasets(self, filenames=None):
+    def reloadLinkedDatasets(self, filenames=None, progress=None,
+                             fileerrors=None):
         """Reload linked datasets from their files.
         If filenames is a set(), only reload from these filenames
 
+        The files are read in parallel in worker threads, then merged
+        into the document in a single update.
+
+        progress is an optional function called in this thread as
+        progress(numfilesread, numfiles) while reading.
+        If fileerrors is a dict, it is filled with the error message
+        for each file which could not be read.
+
         Returns a tuple of
         - List of datasets read
         - Dict of tuples containing dataset names and number of errors
         """
 
         links = self.getLinkedFiles(filenames=filenames)
+        links.sort(key=lambda l: l.filename)
 
         read = []
         errors = {}
 
         # load in the files, merging the vars read and errors
         if links:
+            tempdocs = [self.__class__() for lf in links]
+            results = self._readLinkedFiles(links, tempdocs, progress)
+
             with self.suspend():
-                for lf in links:
-                    nread, nerrors = lf.reloadLinks(self)
+                for lf, tempdoc, result in czip(links, tempdocs, results):
+                    nread, nerrors = lf.reloadMerge(self, tempdoc, result)
                     read += nread
                     errors.update(nerrors)
+                    if result[1] is not None and fileerrors is not None:
+                        fileerrors[lf.filename] = cstr(result[1])
                 self.setModified()
 
         read.sort()
         return (read, errors)
 
+    def _readLinkedFiles(self, links, tempdocs, progress):
+        """Read linked files into temporary documents.
+        Returns list of results from LinkedFileBase.reloadRead, which
+        is (None, exception) for a file if reading it failed."""
+
+        results = [None]*len(links)
+        numdone = [0]
+        lock = threading.Lock()
+
+        def readlink(idx):
+            try:
+                result = links[idx].reloadRead(tempdocs[idx])
+            except Exception as e:
+                result = (None, e)
+            with lock:
+                results[idx] = result
+                numdone[0] += 1
+
+        threaded = [i for i, lf in enumerate(links) if lf.threadedreload]
+        if len(threaded) < 2:
+            threaded = []
+        else:
+            # read in background, updating progress in this thread
+            thread = threading.Thread(
+                target=utils.parallelMap, args=(readlink, threaded))
+            thread.daemon = True
+            thread.start()
+            while thread.is_alive():
+                if progress is not None:
+                    with lock:
+                        n = numdone[0]
+                    progress(n, len(links))
+                thread.join(0.05)
+
+        threaded = set(threaded)
+        for idx in crange(len(links)):
+            if idx not in threaded:
+                if progress is not None:
+                    progress(numdone[0], len(links))
+                readlink(idx)
+
+        if progress is not None:
+            progress(len(links), len(links))
+        return results
+
     def datasetName(self, dataset):
         """Find name for given dataset, raising ValueError if missing."""
         for name, ds in citems(self.data):
@@ -360,6 +593,8 @@ class Document(qt4.QObject):
         """Load plugins and catch exceptions."""
         if pluginlist is None:
             pluginlist = setting.settingdb.get('plugins', [])
+        else:
+            kls.extraplugins = kls.extraplugins + list(pluginlist)
 
         for plugin in pluginlist:
             try:
@@ -369,9 +604,23 @@ class Document(qt4.QObject):
                     plugin, traceback.format_exc())
                 raise RuntimeError(err)
 
+    @classmethod
+    def loadUserPlugins(kls):
+        """Load the plugins in the settings, if not already loaded.
+
+        This is called when a plugin registry is first read."""
+        if not kls.pluginsloaded:
+            kls.pluginsloaded = True
+            kls.loadPlugins()
+
     def paintTo(self, painthelper, page):
         """Paint page specified to the paint helper."""
-        self.basewidget.draw(painthelper, page)
+        with utils.profilePhase(self.basewidget, 'draw'):
+            self.basewidget.draw(painthelper, page)
+
+        profile = utils.renderprofile.active
+        if profile is not None and painthelper.directpaint is None:
+            painthelper.countItems(profile)
 
     def getNumberPages(self):
         """Return the number of pages in the document."""
@@ -515,7 +764,10 @@ class Document(qt4.QObject):
             with codecs.open(filename, 'w', 'utf-8') as f:
                 self.saveToFile(f)
         elif mode == 'hdf5':
-            if h5py is None:
+            try:
+                global h5py
+                import h5py
+            except ImportError:
                 raise RuntimeError('Missing h5py module')
             with h5py.File(filename, 'w') as f:
                 self.saveToHDF5File(f)
@@ -524,14 +776,15 @@ class Document(qt4.QObject):
 
         self.filename = filename
 
-    def load(self, filename, mode='vsz', callbackunsafe=None):
+    def load(self, filename, mode='vsz', callbackunsafe=None, timings=None):
         """Load document from file.
 
         mode is 'vsz' or 'hdf5'
+        timings: optional dict to add breakdown of loading time to
         """
         from . import loader
         loader.loadDocument(self, filename, mode=mode,
-                            callbackunsafe=callbackunsafe)
+                            callbackunsafe=callbackunsafe, timings=timings)
 
     def exportStyleSheet(self, fileobj):
         """Export the StyleSheet to a file."""
@@ -572,10 +825,38 @@ class Document(qt4.QObject):
             self.basewidget,
             dpi=dpi, scaling=scaling, integer=integer)
 
+    def cachedResolve(self, resolver, fromwidget, where):
+        """Call resolver(fromwidget, where), caching the result.
+
+        Results are remembered until the structure of the widget tree
+        changes, so that scripts repeatedly using the same paths do
+        not have to walk the tree each time.
+        """
+
+        if self._resolvecacheset != self.treechangeset:
+            self._resolvecache.clear()
+            self._resolvecacheset = self.treechangeset
+
+        key = (resolver, fromwidget, where)
+        try:
+            return self._resolvecache[key]
+        except KeyError:
+            pass
+
+        obj = resolver(fromwidget, where)
+        if len(self._resolvecache) > 16384:
+            self._resolvecache.clear()
+        self._resolvecache[key] = obj
+        return obj
+
     def resolveItem(self, fromwidget, where):
         """Resolve item relative to fromwidget.
         Returns a widget, setting or settings as appropriate.
         """
+        return self.cachedResolve(self._resolveItem, fromwidget, where)
+
+    def _resolveItem(self, fromwidget, where):
+        """Resolve item relative to fromwidget (uncached)."""
         parts = where.split('/')
 
         if where[:1] == '/':
@@ -622,6 +903,10 @@ class Document(qt4.QObject):
         Allows unix-style specifiers, e.g. /graph1/x
         Returns widget
         """
+        return self.cachedResolve(self._resolve, fromwidget, where)
+
+    def _resolve(self, fromwidget, where):
+        """Resolve graph relative to the widget fromwidget (uncached)."""
 
         parts = where.split('/')
 
@@ -694,8 +979,7 @@ class Document(qt4.QObject):
         if displaydatatype == 'text':
             return vals
         elif displaydatatype == 'numeric':
-            return [ utils.formatNumber(val, '%Vg', locale=self.locale)
-                     for val in vals ]
+            return utils.formatArray(vals, '%Vg', locale=self.locale)
         elif displaydatatype == 'date':
             return [ utils.dateFloatToString(val) for val in vals ]
         else:
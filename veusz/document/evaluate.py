@@ -18,15 +18,20 @@
 
 from __future__ import division
 from collections import defaultdict
+import atexit
+import copy
 import os.path
 import re
+import sys
+import time
+import types
 import datetime
 
 import numpy as N
 
 from . import colors
 
-from ..compat import citems, cstr, cexec
+from ..compat import citems, cstr, cexec, czip, crange
 from .. import setting
 from .. import utils
 from .. import datasets
@@ -54,6 +59,118 @@ def _(text, disambiguation=None, context="Evaluate"):
     """Translate text."""
     return qt.QCoreApplication.translate(context, text, disambiguation)
 
+class _CompiledCache(object):
+    """Results of checking and compiling expressions, shared by all
+    documents in the process.
+
+    Results are ('ok', code object), ('unsafe', message) or ('error',
+    message). Expressions compiled without security checking are also
+    kept in an optional file in the cache directory (see the
+    expression_cache_MB preference), so they do not need to be compiled
+    again when Veusz is next run. Checked expressions are never taken
+    from the file, as other processes could write code into it which
+    has not been checked.
+    """
+
+    def __init__(self):
+        self.memory = utils.LRUCache(8192)
+        # utils.MarshalCache, if enabled
+        self.disk = None
+        self.diskchecked = False
+
+    def diskCache(self):
+        """Return the disk cache, or None if disabled."""
+        if not self.diskchecked:
+            self.diskchecked = True
+            size = setting.settingdb['expression_cache_MB']
+            if size > 0:
+                self.disk = utils.MarshalCache(
+                    'expressions-%s' % utils.version(), size*1024*1024)
+                atexit.register(self.save)
+        return self.disk
+
+    def get(self, expr, unsafe):
+        """Return compiled result for expr, compiling it if necessary."""
+        key = (expr, unsafe, sys.version_info[:2])
+        result = self.memory.get(key)
+        if result is not None:
+            utils.profileCache('shared compiled expressions', True)
+            return result
+
+        disk = self.diskCache() if unsafe else None
+        if disk is not None:
+            code = disk.get(expr)
+            if code is not None:
+                utils.profileCache('shared compiled expressions', True)
+                result = self.memory[key] = ('ok', code)
+                return result
+
+        utils.profileCache('shared compiled expressions', False)
+        try:
+            code = utils.compileChecked(expr, ignoresecurity=unsafe)
+        except utils.SafeEvalException as e:
+            result = ('unsafe', cstr(e))
+        except Exception as e:
+            result = ('error', cstr(e))
+        else:
+            result = ('ok', code)
+            if disk is not None:
+                disk.set(expr, code)
+        self.memory[key] = result
+        return result
+
+    def save(self):
+        """Write the disk cache, if enabled."""
+        if self.disk is not None:
+            self.disk.save()
+
+    def clear(self):
+        """Forget the compiled expressions held in memory."""
+        self.memory.clear()
+
+# shared by all documents
+compiledcache = _CompiledCache()
+
+# numpy names and safe functions in every evaluation context
+_basecontext = None
+
+def _baseContext():
+    """Return the base layer of the evaluation context, which is made
+    once and shared by all documents, so must not be modified."""
+    global _basecontext
+    if _basecontext is None:
+        c = {}
+
+        # add numpy things
+        # we try to avoid various bits and pieces for safety
+        for name, val in citems(N.__dict__):
+            if ( (callable(val) or type(val)==float) and
+                 name not in __builtins__ and
+                 name[:1] != '_' and name[-1:] != '_' ):
+                c[name] = val
+
+        # safe functions
+        c['os_path_join'] = os.path.join
+        c['os_path_dirname'] = os.path.dirname
+        c['veusz_markercodes'] = tuple(utils.MarkerCodes)
+        c['ESCAPE'] = utils.latexEscape
+
+        _basecontext = c
+    return _basecontext
+
+# marks names missing from the context
+_missing = object()
+_nonames = frozenset()
+
+def _codeNames(code):
+    """Return set of global names used by code, including by the
+    functions it defines."""
+    names = frozenset(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _codeNames(const)
+    return names
+
 class Evaluate:
     """Class to manage evaluation of expressions in a special environment."""
 
@@ -81,6 +198,21 @@ class Evaluate:
 
         # this is the context used to evaluate expressions
         self.context = {}
+        # the context without the custom definitions
+        self.importcontext = {}
+        # names used by each custom definition in the context
+        self.defdeps = {}
+        # names defined by the custom definitions in the context
+        self.defnames = []
+        # customs in the context: (imports, definitions, colors,
+        # colormaps), or None
+        self.applied = None
+
+        # number of updates of the context, time taken and number of
+        # custom definitions evaluated, for rebuilding the context
+        # ('full') or if only definitions changed ('definitions')
+        self.updatestats = {'full': [0, 0., 0], 'definitions': [0, 0., 0]}
+        self.numevaluated = 0
 
         # copy default colormaps
         self.colormaps = utils.ColorMaps()
@@ -90,6 +222,8 @@ class Evaluate:
 
         # copies of validated compiled expressions
         self.compiled = {}
+        # global names used by compiled definitions
+        self.codenames = {}
         self.compfailed = set()
         self.compfailedchangeset = -1
 
@@ -97,26 +231,72 @@ class Evaluate:
         self.exprdscache = {}
         self.exprdscachechangeset = None
 
-    def update(self):
+    def update(self, defer=True):
         """To be called after custom constants or functions are changed.
         This sets up a safe environment where things can be evaluated
+
+        If only custom definitions have changed, just those which
+        changed and the definitions using them are evaluated again.
+
+        If defer is set and the document is in bulk update mode, this
+        is done later when needed.
         """
 
-        c = self.context
-        c.clear()
+        if defer and self.doc.bulkupdate is not None:
+            # done when needed in bulk update
+            self.doc.bulkupdate.evalupdate = True
+            return
 
-        # add numpy things
-        # we try to avoid various bits and pieces for safety
-        for name, val in citems(N.__dict__):
-            if ( (callable(val) or type(val)==float) and
-                 name not in __builtins__ and
-                 name[:1] != '_' and name[-1:] != '_' ):
-                c[name] = val
+        start = time.time()
+        numevaluated = self.numevaluated
+        imports = [(n, v) for n, v in self.def_imports]
+        definitions = [(n, v) for n, v in self.def_definitions]
+        cols = [(n, v) for n, v in self.def_colors]
+        cmaps = copy.deepcopy(self.def_colormaps)
+        applied = self.applied
+        self.applied = (imports, definitions, cols, cmaps)
+
+        if applied is None or imports != applied[0]:
+            kind = 'full'
+            self._updateImports(imports)
+            self._setDefinitions(definitions)
+        else:
+            kind = 'definitions'
+            if definitions != applied[1]:
+                self._changeDefinitions(applied[1], definitions)
+
+        if applied is None or cols != applied[2]:
+            self.colors.wipe()
+            for name, val in cols:
+                self.colors.addColor(name, val)
+            self.colors.updateModel()
+
+        if applied is None or cmaps != applied[3]:
+            self.colormaps.wipe()
+            for name, val in cmaps:
+                self._updateColormap(name, val)
+
+        stats = self.updatestats[kind]
+        stats[0] += 1
+        stats[1] += time.time()-start
+        stats[2] += self.numevaluated-numevaluated
+
+    def updateReport(self):
+        """Return text describing the updates of the context."""
+        lines = ['%-24s %9s %9s %12s' % (
+            'Context update', 'count', 'time', 'definitions')]
+        for kind in ('full', 'definitions'):
+            count, t, numeval = self.updatestats[kind]
+            lines.append('%-24s %9i %9.4f %12i' % (kind, count, t, numeval))
+        return '\n'.join(lines)
+
+    def _updateImports(self, imports):
+        """Make the context from the base layer, the document
+        functions and the imports, without the custom definitions."""
 
-        # safe functions
-        c['os_path_join'] = os.path.join
-        c['os_path_dirname'] = os.path.dirname
-        c['veusz_markercodes'] = tuple(utils.MarkerCodes)
+        c = self.context
+        c.clear()
+        c.update(_baseContext())
 
         # helpful functions for expansion
         c['ENVIRON'] = dict(os.environ)
@@ -125,23 +305,141 @@ class Evaluate:
         c['DATA'] = self._evaldata
         c['FILENAME'] = self._evalfilename
         c['BASENAME'] = self._evalbasename
-        c['ESCAPE'] = utils.latexEscape
         c['SETTING'] = self._evalsetting
 
-        for name, val in self.def_imports:
+        for name, val in imports:
             self._updateImport(name, val)
 
-        for name, val in self.def_definitions:
-            self._updateDefinition(name, val)
+        self.importcontext = dict(c)
+
+    def _setDefinitions(self, definitions):
+        """Evaluate all the custom definitions in order."""
 
-        self.colors.wipe()
-        for name, val in self.def_colors:
-            self.colors.addColor(name, val)
-        self.colors.updateModel()
+        c = self.context
+        c.clear()
+        c.update(self.importcontext)
+        self.defdeps.clear()
+
+        self.defnames = []
+        for name, val in definitions:
+            ident, comp = self._compileDefinition(name, val)
+            self.defnames.append(ident)
+            self._evalDefinition(ident, comp)
+
+    def _changeDefinitions(self, old, new):
+        """Update the context for the custom definitions changing from
+        old to new, evaluating the changed definitions and those
+        which use them."""
+
+        oldnames = self.defnames
+        samenames = [n for n, v in old] == [n for n, v in new]
+        if samenames:
+            newnames = oldnames
+        else:
+            known = dict(czip([n for n, v in old], oldnames))
+            newnames = [known[n] if n in known else self._definitionName(n)
+                        for n, v in new]
+
+        # definitions are evaluated in order, so evaluate all of them
+        # if names are invalid or repeated, or the order has changed
+        valid = None not in newnames and len(set(newnames)) == len(newnames)
+        if valid and not samenames:
+            common = set(oldnames) & set(newnames)
+            valid = (
+                None not in oldnames and
+                len(set(oldnames)) == len(oldnames) and
+                [n for n in oldnames if n in common] ==
+                [n for n in newnames if n in common] )
+        if not valid:
+            self._setDefinitions(new)
+            return
+        self.defnames = newnames
+
+        # names of definitions which were added, removed or changed
+        if samenames:
+            dirty = set([n for n, o, v in czip(newnames, old, new) if o != v])
+        else:
+            oldvals = dict(czip(oldnames, old))
+            newvals = dict(czip(newnames, new))
+            dirty = set([n for n in set(oldnames) | set(newnames)
+                         if oldvals.get(n) != newvals.get(n)])
+
+        # add the definitions using these, directly or indirectly
+        # (usually definitions use earlier ones, so one pass finds
+        # them). It is quicker to evaluate all if most are affected.
+        limit = len(newnames) // 2
+        deps = self.defdeps
+        for npass in crange(4):
+            added = False
+            for name in newnames:
+                if ( name not in dirty and
+                     not deps.get(name, _nonames).isdisjoint(dirty) ):
+                    dirty.add(name)
+                    added = True
+            if not added or len(dirty) > limit:
+                break
+        if added or len(dirty) > limit:
+            self._setDefinitions(new)
+            return
 
-        self.colormaps.wipe()
-        for name, val in self.def_colormaps:
-            self._updateColormap(name, val)
+        for name in dirty:
+            deps.pop(name, None)
+        compiled = [(i, self._compileDefinition(*new[i]))
+                    for i, name in enumerate(newnames) if name in dirty]
+        first = compiled[0][0] if compiled else len(newnames)
+
+        # names used when evaluating the changed definitions, directly
+        # or by the functions they call
+        newdeps = dict([(ident, self._codeNames(comp))
+                        for i, (ident, comp) in compiled if comp is not None])
+        used = set()
+        for i, (ident, comp) in compiled:
+            if comp is not None:
+                used.update(comp.co_names)
+        todo = list(used)
+        while todo:
+            name = todo.pop()
+            for dep in newdeps.get(name, deps.get(name, ())):
+                if dep not in used:
+                    used.add(dep)
+                    todo.append(dep)
+
+        c = self.context
+        if used.isdisjoint(newnames[first:]):
+            # the changed definitions do not use themselves or
+            # definitions after them, so they can just be replaced
+            for name in dirty:
+                if name in self.importcontext:
+                    c[name] = self.importcontext[name]
+                else:
+                    c.pop(name, None)
+            for i, (ident, comp) in compiled:
+                self._evalDefinition(ident, comp)
+            return
+
+        # otherwise remove the definitions from the first changed one
+        # and add them again in order, so the changed definitions see
+        # only the definitions before them
+        saved = {}
+        for name in set(newnames[first:]) | dirty:
+            saved[name] = c.pop(name, _missing)
+            if name in self.importcontext:
+                c[name] = self.importcontext[name]
+        compiled = dict(compiled)
+        for i in crange(first, len(newnames)):
+            name = newnames[i]
+            if i in compiled:
+                self._evalDefinition(*compiled[i])
+            elif saved[name] is not _missing:
+                c[name] = saved[name]
+
+    def _codeNames(self, code):
+        """Return set of global names used by compiled code."""
+        try:
+            return self.codenames[code]
+        except KeyError:
+            names = self.codenames[code] = _codeNames(code)
+            return names
 
     def _updateImport(self, module, val):
         """Add an import statement to the eval function context."""
@@ -218,8 +516,20 @@ class Evaluate:
         else:
             self.colormaps[ cstr(name) ] = cmap
 
-    def _updateDefinition(self, name, val):
-        """Update a function or constant in eval function context."""
+    @staticmethod
+    def _definitionName(name):
+        """Return name defined by custom definition name (which may be
+        a function specification), or None if invalid."""
+        if identifier_re.match(name):
+            return name
+        m = function_re.match(name)
+        return m.group(1) if m else None
+
+    def _compileDefinition(self, name, val):
+        """Compile a function or constant custom definition.
+
+        Returns (name defined, compiled code), with the code None if
+        invalid."""
 
         if identifier_re.match(name):
             defn = val
@@ -229,15 +539,22 @@ class Evaluate:
                 self.doc.log(
                     _("Invalid function or constant specification '%s'") %
                     name)
-                return
+                return None, None
             name = m.group(1)
             args = m.group(2)
             defn = 'lambda %s: %s' % (args, val)
 
-        # evaluate, but we ignore any unsafe commands or exceptions
-        comp = self.compileCheckedExpression(defn)
+        # we ignore any unsafe commands
+        return name, self.compileCheckedExpression(defn)
+
+    def _evalDefinition(self, name, comp):
+        """Evaluate a compiled custom definition into the context."""
+
         if comp is None:
             return
+        self.defdeps[name] = self._codeNames(comp)
+        self.numevaluated += 1
+        # evaluate, but we ignore any exceptions
         try:
             self.context[name] = eval(comp, self.context)
         except Exception as e:
@@ -252,9 +569,12 @@ class Evaluate:
         """
 
         try:
-            return self.compiled[expr]
+            comp = self.compiled[expr]
         except KeyError:
-            pass
+            utils.profileCache('compiled expressions', False)
+        else:
+            utils.profileCache('compiled expressions', True)
+            return comp
 
         # track failed compilations, so we only print them once
         if self.compfailedchangeset != self.doc.changeset:
@@ -266,20 +586,18 @@ class Evaluate:
         if origexpr is None:
             origexpr = expr
 
-        try:
-            checked = utils.compileChecked(
-                expr,
-                ignoresecurity=setting.transient_settings['unsafe_mode'])
-        except utils.SafeEvalException as e:
+        status, checked = compiledcache.get(
+            expr, setting.transient_settings['unsafe_mode'])
+        if status == 'unsafe':
             if log:
                 self.doc.log(
-                    _("Unsafe expression '%s': %s") % (origexpr, cstr(e)))
+                    _("Unsafe expression '%s': %s") % (origexpr, checked))
             self.compfailed.add(expr)
             return None
-        except Exception as e:
+        elif status == 'error':
             if log:
                 self.doc.log(
-                    _("Error in expression '%s': %s") % (origexpr, cstr(e)))
+                    _("Error in expression '%s': %s") % (origexpr, checked))
             return None
         else:
             self.compiled[expr] = checked
@@ -337,10 +655,14 @@ class Evaluate:
             self.exprdscachechangeset = self.doc.changeset
             self.exprdscache.clear()
         elif key in self.exprdscache:
+            utils.profileCache('dataset expressions', True)
             return self.exprdscache[key]
 
-        self.exprdscache[key] = ds = datasets.evalDatasetExpression(
-            self.doc, expr, part=part, datatype=datatype, dimensions=dimensions)
+        utils.profileCache('dataset expressions', False)
+        with utils.profilePhase(None, 'data'):
+            self.exprdscache[key] = ds = datasets.evalDatasetExpression(
+                self.doc, expr, part=part, datatype=datatype,
+                dimensions=dimensions)
         return ds
 
     def _processSafeImports(self, module, symbols):
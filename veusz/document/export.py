@@ -25,39 +25,74 @@ import math
 import codecs
 import re
 import sys
+import copy
 import subprocess
 
-from ..compat import crange
+from ..compat import crange, citems, cbasestr
 from .. import qtall as qt4
 from .. import setting
 from .. import utils
 
-try:
-    from . import emf_export
-    hasemf = True
-except ImportError:
-    hasemf = False
+# the output format modules are imported when used
+hasemf = utils.moduleAvailable('pyemf')
 
-from . import svg_export
-from . import selftest_export
 from . import painthelper
+from . import exportworkers
 
 # 1m in inch
 m_inch = 39.370079
 
+# used in filenames to mark the page number or name
+PAGENUM = '%PAGENUM%'
+PAGENAME = '%PAGENAME%'
+
 def _(text, disambiguation=None, context="Export"):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-def printPages(doc, printer, pages, scaling=1., antialias=False, setsizes=False):
+def numProcesses(processes, numpages):
+    """Number of worker processes to draw numpages pages in, given the
+    processes option (0 for one per CPU). 1 means no workers."""
+    if processes == 0:
+        processes = utils.defaultNumThreads()
+    return max(1, min(processes, numpages))
+
+def printPages(doc, printer, pages, scaling=1., antialias=False, setsizes=False,
+               recorded=None, rasterdpi=None, rasterthreshold=0, processes=1):
     """Print onto printing device.
     Returns list of page sizes
     setsizes: Set page size on printer to page sizes
+    recorded: optional dict of page numbers to PaintHelpers containing
+      the pages already drawn, which are replayed instead of drawing
+    rasterdpi, rasterthreshold: if rasterdpi is set, draw dense
+      plotters as bitmaps (see replayPage)
+    processes: number of worker processes to draw the pages in
+      (0 for one per CPU), which are then printed in order
     """
 
     if not pages:
         return
 
+    numworkers = numProcesses(processes, len(pages))
+    if recorded is None and numworkers > 1:
+        dpi = printer.logicalDpiX()
+        with exportworkers.WorkerPool(doc, numworkers) as pool:
+            pictures = pool.run([
+                ('Picture', (page, dpi, rasterdpi, rasterthreshold))
+                for page in pages])
+            _printPages(doc, printer, pages, antialias, setsizes,
+                        pictures=pictures)
+    else:
+        _printPages(doc, printer, pages, antialias, setsizes,
+                    recorded=recorded, rasterdpi=rasterdpi,
+                    rasterthreshold=rasterthreshold)
+
+def _printPages(doc, printer, pages, antialias, setsizes, recorded=None,
+                rasterdpi=None, rasterthreshold=0, pictures=None):
+    """Print pages, drawing them, replaying them from recorded, or
+    drawing picture data from the iterator pictures (see
+    exportworkers)."""
+
     dpi = (printer.logicalDpiX(), printer.logicalDpiY())
 
     def getUpdateSize(page):
@@ -83,9 +118,20 @@ def printPages(doc, printer, pages, scaling=1., antialias=False, setsizes=False)
         painter.save()
         painter.setClipRect(qt4.QRectF(
             qt4.QPointF(0,0), qt4.QPointF(*size)))
-        helper = painthelper.PaintHelper(
-            doc, size, dpi=dpi, directpaint=painter)
-        doc.paintTo(helper, page)
+        if pictures is not None:
+            data, picdpi = next(pictures)
+            exportworkers.drawPictureData(painter, data, picdpi)
+        elif recorded is not None or rasterdpi is not None:
+            if recorded is not None:
+                helper = recorded[page]
+            else:
+                helper = recordPage(doc, page, dpi[0])
+            replayPage(helper, dpi, painter, rasterdpi=rasterdpi,
+                       rasterthreshold=rasterthreshold)
+        else:
+            helper = painthelper.PaintHelper(
+                doc, size, dpi=dpi, directpaint=painter)
+            doc.paintTo(helper, page)
         painter.restore()
 
         # start new pages between each page
@@ -96,6 +142,109 @@ def printPages(doc, printer, pages, scaling=1., antialias=False, setsizes=False)
 
     painter.end()
 
+def recordPage(doc, page, dpi):
+    """Draw page into a PaintHelper which records the output at dpi,
+    so it can be replayed into several outputs with replayPage."""
+    if painthelper.recordscaled:
+        # the fallback recording device has a fixed resolution
+        pic = qt4.QPicture()
+        dpi = (pic.logicalDpiX(), pic.logicalDpiY())
+    else:
+        dpi = (dpi, dpi)
+    size = doc.pageSize(page, dpi=dpi, integer=False)
+    helper = painthelper.PaintHelper(doc, size, dpi=dpi)
+    doc.paintTo(helper, page)
+    return helper
+
+def profilePages(doc, pages, dpi=100):
+    """Draw pages into recordings, returning a RenderProfile of the
+    time spent drawing each widget."""
+    profile = utils.RenderProfile()
+    with profile:
+        for page in pages:
+            recordPage(doc, page, dpi)
+    return profile
+
+def replayPage(helper, dpi, painter, rasterdpi=None, rasterthreshold=0):
+    """Replay page recorded in PaintHelper helper to painter, which
+    has a resolution of dpi (x, y).
+
+    If rasterdpi is set, plotters with exportAs set to bitmap, or set
+    to auto and drawing more than rasterthreshold items (if not 0),
+    are drawn as bitmaps at rasterdpi.
+    """
+    painter.save()
+    scale = (dpi[0]/helper.dpi[0], dpi[1]/helper.dpi[1])
+    if not painthelper.recordscaled:
+        painter.scale(*scale)
+
+    if rasterdpi is None:
+        helper.renderToPainter(painter)
+    else:
+        _replayStateHybrid(
+            helper, helper.rootstate, painter, scale,
+            rasterdpi, rasterthreshold)
+
+    painter.restore()
+
+def _useBitmap(state, rasterthreshold):
+    """Should the state be drawn as a bitmap?"""
+    settings = state.widget.settings
+    if 'exportAs' not in settings:
+        return False
+    mode = settings.exportAs
+    return mode == 'bitmap' or (
+        mode == 'auto' and rasterthreshold > 0 and
+        state.itemCount() > rasterthreshold)
+
+def _replayStateHybrid(helper, state, painter, scale, rasterdpi,
+                       rasterthreshold):
+    """Replay state and its children to painter, using bitmaps for
+    dense plotters."""
+
+    if _useBitmap(state, rasterthreshold):
+        # area to render in recorded coordinates
+        if state.clip is not None:
+            rect = qt4.QRectF(state.clip)
+        else:
+            rect = qt4.QRectF(0, 0, helper.pagesize[0], helper.pagesize[1])
+        rect = rect.intersected(qt4.QRectF(
+            0, 0, helper.pagesize[0], helper.pagesize[1]))
+        if rect.isEmpty():
+            return
+
+        # draw into image at rasterdpi
+        imgscale = rasterdpi / helper.dpi[1]
+        image = qt4.QImage(
+            max(1, int(math.ceil(rect.width()*imgscale))),
+            max(1, int(math.ceil(rect.height()*imgscale))),
+            qt4.QImage.Format_ARGB32_Premultiplied)
+        image.setDotsPerMeterX(int(rasterdpi*m_inch))
+        image.setDotsPerMeterY(int(rasterdpi*m_inch))
+        image.fill(qt4.qRgba(0,0,0,0))
+        imgpainter = qt4.QPainter(image)
+        imgpainter.setRenderHint(qt4.QPainter.Antialiasing, True)
+        imgpainter.setRenderHint(qt4.QPainter.TextAntialiasing, True)
+        imgpainter.translate(-rect.left()*imgscale, -rect.top()*imgscale)
+        if not painthelper.recordscaled:
+            imgpainter.scale(imgscale, imgscale)
+        helper.renderToPainter(imgpainter, state=state)
+        imgpainter.end()
+
+        painter.save()
+        if painthelper.recordscaled:
+            painter.scale(*scale)
+        painter.drawImage(rect, image)
+        painter.restore()
+        return
+
+    painter.save()
+    state.record.play(painter)
+    painter.restore()
+    for child in state.children:
+        _replayStateHybrid(
+            helper, child, painter, scale, rasterdpi, rasterthreshold)
+
 class Export(object):
     """Class to do the document exporting.
 
@@ -184,7 +333,8 @@ class Export(object):
 
     def __init__(self, doc, filename, pagenumbers, color=True, bitmapdpi=100,
                  antialias=True, quality=85, backcolor='#ffffff00',
-                 pdfdpi=150, svgtextastext=False):
+                 pdfdpi=150, svgtextastext=False, rasterthreshold=0,
+                 processes=1):
         """Initialise export class. Parameters are:
         doc: document to write
         filename: output filename
@@ -196,6 +346,11 @@ class Export(object):
         backcolor: background color default for bitmaps (default transparent).
         pdfdpi: dpi for pdf and eps files
         svgtextastext: write text in SVG as text, rather than curves
+        rasterthreshold: in PDF, SVG and EMF files, write plotters
+          drawing more items than this as bitmaps at pdfdpi (if
+          their exportAs setting is auto). 0 disables this.
+        processes: number of worker processes to draw pages in when
+          exporting several pages (0 for one per CPU)
         """
 
         self.doc = doc
@@ -208,6 +363,14 @@ class Export(object):
         self.backcolor = backcolor
         self.pdfdpi = pdfdpi
         self.svgtextastext = svgtextastext
+        self.rasterthreshold = rasterthreshold
+        self.processes = processes
+
+        # if set, a dict of page numbers to recorded pages to replay
+        # (see exportTargets)
+        self.recorded = None
+        # if set, the name of a PDF file of the pages already written
+        self.pdfsource = None
 
     def export(self):
         """Export the figure to the filename."""
@@ -221,7 +384,10 @@ class Export(object):
             self.exportPS(self.filename, ext)
 
         elif ext in ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.xpm'):
-            self.exportBitmap(self.filename, ext)
+            if len(self.pagenumbers) > 1:
+                self.exportBitmapPages(self.filename, ext)
+            else:
+                self.exportBitmap(self.filename, ext)
 
         elif ext == '.svg':
             self.exportSVG(self.filename)
@@ -238,10 +404,102 @@ class Export(object):
         else:
             raise RuntimeError("File type '%s' not supported" % ext)
 
-    def renderPage(self, page, size, dpi, painter):
+    def outputDPI(self):
+        """Resolution the output file is drawn at."""
+        ext = os.path.splitext(self.filename)[1].lower()
+        if ext in ('.pdf', '.eps', '.ps'):
+            return self.pdfdpi
+        elif ext in ('.svg', '.selftest', '.emf'):
+            from . import svg_export
+            return svg_export.dpi
+        else:
+            return self.bitmapdpi
+
+    def exportTargets(self, targets):
+        """Export the pages to several files, drawing each page once.
+
+        targets is a list of filenames, or (filename, options) tuples,
+        where options is a dict of attributes of this object to use
+        for that file, e.g. ('big.png', {'bitmapdpi': 300}).
+
+        The pages are drawn into recordings at the highest resolution
+        required, which are replayed into each output file.
+        """
+
+        exports = []
+        for target in targets:
+            if isinstance(target, cbasestr):
+                filename, options = target, {}
+            else:
+                filename, options = target
+            e = copy.copy(self)
+            e.filename = filename
+            for name, val in citems(options):
+                if name not in self.__dict__:
+                    raise ValueError("Unknown export option '%s'" % name)
+                setattr(e, name, val)
+            exports.append(e)
+
+        if len(exports) > 1:
+            dpi = max([e.outputDPI() for e in exports])
+            recorded = {}
+            for page in self.pagenumbers:
+                recorded[page] = recordPage(self.doc, page, dpi)
+            for e in exports:
+                e.recorded = recorded
+
+        # write PDF files first, so Postscript can be converted from them
+        pdfs = {}
+        for e in exports:
+            if os.path.splitext(e.filename)[1].lower() == '.pdf':
+                e.export()
+                pdfs[(e.color, e.pdfdpi)] = e.filename
+        for e in exports:
+            ext = os.path.splitext(e.filename)[1].lower()
+            if ext in ('.eps', '.ps'):
+                e.pdfsource = pdfs.get((e.color, e.pdfdpi))
+            if ext != '.pdf':
+                e.export()
+
+    def vectorRasterDPI(self):
+        """Return resolution to write bitmaps at if some plotters
+        should be written as bitmaps in vector formats, else None."""
+
+        def needsraster(widget):
+            if 'exportAs' in widget.settings:
+                mode = widget.settings.exportAs
+                if mode == 'bitmap' or (
+                        mode == 'auto' and self.rasterthreshold > 0):
+                    return True
+            for c in widget.children:
+                if needsraster(c):
+                    return True
+            return False
+
+        pages = self.doc.basewidget.children
+        for page in self.pagenumbers:
+            if 0 <= page < len(pages) and needsraster(pages[page]):
+                return self.pdfdpi
+        return None
+
+    def renderPage(self, page, size, dpi, painter, rasterdpi=None):
         """Render page using paint helper to painter.
         This first renders to the helper, then to the painter
+
+        If rasterdpi is set, dense plotters are drawn as bitmaps
         """
+        if self.recorded is not None or rasterdpi is not None:
+            if self.recorded is not None:
+                helper = self.recorded[page]
+            else:
+                helper = recordPage(self.doc, page, dpi[0])
+            painter.setClipRect( qt4.QRectF(
+                    qt4.QPointF(0,0), qt4.QPointF(*size)) )
+            replayPage(helper, dpi, painter, rasterdpi=rasterdpi,
+                       rasterthreshold=self.rasterthreshold)
+            painter.end()
+            return
+
         helper = painthelper.PaintHelper(self.doc, size, dpi=dpi, directpaint=painter)
         painter.setClipRect( qt4.QRectF(
                 qt4.QPointF(0,0), qt4.QPointF(*size)) )
@@ -259,14 +517,15 @@ class Export(object):
                 'Can only export a single page in this format')
         return self.pagenumbers[0]
 
-    def exportBitmap(self, filename, ext):
+    def exportBitmap(self, filename, ext, page=None):
         """Export to a bitmap format."""
 
         fmt = ext.lstrip('.') # setFormat() doesn't want the leading '.'
         if fmt == 'jpeg':
             fmt = 'jpg'
 
-        page = self.getSinglePage()
+        if page is None:
+            page = self.getSinglePage()
 
         # get size for bitmap's dpi
         dpi = self.bitmapdpi
@@ -322,20 +581,60 @@ class Export(object):
 
         writer.write(image)
 
+    def pageFilename(self, filename, page):
+        """Filename to write page to, replacing %PAGENUM% and
+        %PAGENAME% in filename."""
+        return filename.replace(PAGENUM, str(page+1)).replace(
+            PAGENAME, self.doc.getPage(page).name)
+
+    def exportBitmapPages(self, filename, ext):
+        """Export several pages to bitmap files.
+
+        filename should include %PAGENUM% or %PAGENAME%, which are
+        replaced by the page number or name of each page. The pages
+        are drawn in several processes, if requested."""
+
+        if PAGENUM not in filename and PAGENAME not in filename:
+            raise RuntimeError(
+                'Filename must contain %s or %s to export several pages '
+                'to bitmap files' % (PAGENUM, PAGENAME))
+
+        numworkers = numProcesses(self.processes, len(self.pagenumbers))
+        if self.recorded is not None or numworkers == 1:
+            for page in self.pagenumbers:
+                self.exportBitmap(self.pageFilename(filename, page), ext,
+                                  page=page)
+            return
+
+        options = {}
+        for name in ('color', 'bitmapdpi', 'antialias', 'quality',
+                     'backcolor'):
+            options[name] = getattr(self, name)
+        with exportworkers.WorkerPool(self.doc, numworkers) as pool:
+            # wait for the pages to be written
+            list(pool.run([
+                ('Export', (page, self.pageFilename(filename, page), options))
+                for page in self.pagenumbers]))
+
     def exportPDF(self, filename):
         """Export to PDF format."""
 
+        from PyQt5.QtPrintSupport import QPrinter
+
         # setup printer with requested parameters
-        printer = qt4.QPrinter()
+        printer = QPrinter()
         printer.setResolution(self.pdfdpi)
         printer.setFullPage(True)
         printer.setColorMode(
-            qt4.QPrinter.Color if self.color else qt4.QPrinter.GrayScale)
-        printer.setOutputFormat(qt4.QPrinter.PdfFormat)
+            QPrinter.Color if self.color else QPrinter.GrayScale)
+        printer.setOutputFormat(QPrinter.PdfFormat)
         printer.setOutputFileName(filename)
         printer.setCreator('Veusz %s' % utils.version())
 
-        printPages(self.doc, printer, self.pagenumbers, setsizes=True)
+        printPages(self.doc, printer, self.pagenumbers, setsizes=True,
+                   recorded=self.recorded, rasterdpi=self.vectorRasterDPI(),
+                   rasterthreshold=self.rasterthreshold,
+                   processes=self.processes)
 
     def exportPS(self, filename, ext):
         """Export to PS/EPS via conversion with Ghostscript.
@@ -351,14 +650,16 @@ class Export(object):
         if not self.gs_exe:
             raise RuntimeError("Cannot write Postscript with Ghostscript")
 
-        # write to pdf file first
-        tmpfilepdf = "%s.tmp.%i.pdf" % (
-            filename, random.randint(0,1000000))
+        # write to pdf file first, unless it has already been written
+        if self.pdfsource:
+            tmpfilepdf = self.pdfsource
+        else:
+            tmpfilepdf = "%s.tmp.%i.pdf" % (
+                filename, random.randint(0,1000000))
+            self.exportPDF(tmpfilepdf)
         tmpfileps = "%s.tmp.%i%s" % (
             filename, random.randint(0,1000000), ext)
 
-        self.exportPDF(tmpfilepdf)
-
         # run ghostscript to covert from pdf to postscript
         cmd = [
             self.gs_exe,
@@ -375,7 +676,8 @@ class Export(object):
         if not os.path.isfile(tmpfileps):
             raise RuntimeError("Ghostscript failed to create %s" % tmpfileps)
 
-        os.remove(tmpfilepdf)
+        if not self.pdfsource:
+            os.remove(tmpfilepdf)
         try:
             os.remove(filename)
         except OSError:
@@ -384,6 +686,7 @@ class Export(object):
 
     def exportSVG(self, filename):
         """Export document as SVG"""
+        from . import svg_export
 
         page = self.getSinglePage()
 
@@ -394,10 +697,12 @@ class Export(object):
             paintdev = svg_export.SVGPaintDevice(
                 f, size[0]/dpi, size[1]/dpi, writetextastext=self.svgtextastext)
             painter = painthelper.DirectPainter(paintdev)
-            self.renderPage(page, size, (dpi,dpi), painter)
+            self.renderPage(page, size, (dpi,dpi), painter,
+                            rasterdpi=self.vectorRasterDPI())
 
     def exportSelfTest(self, filename):
         """Export document for testing"""
+        from . import svg_export, selftest_export
 
         page = self.getSinglePage()
 
@@ -426,6 +731,7 @@ class Export(object):
 
     def exportEMF(self, filename):
         """Export document as EMF."""
+        from . import emf_export
 
         page = self.getSinglePage()
 
@@ -433,28 +739,31 @@ class Export(object):
         size = self.doc.pageSize(page, dpi=(dpi,dpi), integer=False)
         paintdev = emf_export.EMFPaintDevice(size[0]/dpi, size[1]/dpi, dpi=dpi)
         painter = painthelper.DirectPainter(paintdev)
-        self.renderPage(page, size, (dpi,dpi), painter)
+        self.renderPage(page, size, (dpi,dpi), painter,
+                        rasterdpi=self.vectorRasterDPI())
         paintdev.paintEngine().saveFile(filename)
 
 def printDialog(parentwindow, document, filename=None):
     """Open a print dialog and print document."""
+    from PyQt5.QtPrintSupport import (
+        QPrinter, QPrintDialog, QAbstractPrintDialog)
 
     if document.getNumberPages() == 0:
         qt4.QMessageBox.warning(
             parentwindow, _("Error - Veusz"), _("No pages to print"))
         return
 
-    prnt = qt4.QPrinter(qt4.QPrinter.HighResolution)
-    prnt.setColorMode(qt4.QPrinter.Color)
+    prnt = QPrinter(QPrinter.HighResolution)
+    prnt.setColorMode(QPrinter.Color)
     prnt.setCreator(_('Veusz %s') % utils.version())
     if filename:
         prnt.setDocName(filename)
 
-    dialog = qt4.QPrintDialog(prnt, parentwindow)
+    dialog = QPrintDialog(prnt, parentwindow)
     dialog.setMinMax(1, document.getNumberPages())
     if dialog.exec_():
         # get page range
-        if dialog.printRange() == qt4.QAbstractPrintDialog.PageRange:
+        if dialog.printRange() == QAbstractPrintDialog.PageRange:
             # page range
             minval, maxval = dialog.fromPage(), dialog.toPage()
         else:
@@ -466,7 +775,7 @@ def printDialog(parentwindow, document, filename=None):
         maxval -= 1
 
         # reverse or forward order
-        if prnt.pageOrder() == qt4.QPrinter.FirstPageFirst:
+        if prnt.pageOrder() == QPrinter.FirstPageFirst:
             pages = list(crange(minval, maxval+1))
         else:
             pages = list(crange(maxval, minval-1, -1))
@@ -0,0 +1,282 @@
+#    Copyright (C) 2017 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""Draw the pages of a document in worker processes.
+
+The pages of a document are independent, so exporting many pages is
+faster if they are drawn in parallel. Drawing is mostly done in
+Python, so processes are used rather than threads. Each worker runs
+"veusz --export-worker", loads a copy of the document and draws the
+pages it is sent, writing the results back to its standard output.
+"""
+
+from __future__ import division, print_function
+import os
+import os.path
+import sys
+import subprocess
+import traceback
+from collections import defaultdict
+
+from ..compat import citems, crange, pickle, CStringIO, cexceptionuser
+from .. import qtall as qt4
+from .. import setting
+
+def _workerCommand():
+    """Command to start a worker."""
+    if getattr(sys, 'frozen', False):
+        # the frozen executable is veusz itself
+        return [sys.executable, '--export-worker']
+    return [sys.executable, '-m', 'veusz.veusz_main', '--export-worker']
+
+def _workerEnvironment():
+    """Environment for workers, so they import this copy of veusz."""
+    env = dict(os.environ)
+    thisdir = os.path.dirname(os.path.abspath(__file__))
+    path = [os.path.dirname(os.path.dirname(thisdir))]
+    if env.get('PYTHONPATH'):
+        path.append(env['PYTHONPATH'])
+    env['PYTHONPATH'] = os.pathsep.join(path)
+    return env
+
+def _documentSource(doc):
+    """How workers should load the document: from its file if it is
+    unchanged, otherwise from its saved text."""
+
+    if doc.filename and not doc.isModified() and os.path.isfile(doc.filename):
+        mode = 'hdf5' if doc.filename.lower().endswith('.vszh5') else 'vsz'
+        return {'filename': doc.filename, 'mode': mode}
+
+    modified = doc.isModified()
+    f = CStringIO()
+    doc.saveToFile(f)
+    doc.setModified(modified)
+    filename = doc.filename or os.path.join(os.getcwd(), 'untitled.vsz')
+    return {'filename': filename, 'script': f.getvalue()}
+
+def _safetySettings():
+    """Expression safety settings of this process, for the workers to
+    evaluate the document in the same way."""
+
+    def _copy(imports):
+        return dict((mod, set(syms)) for mod, syms in citems(imports))
+
+    ts = setting.transient_settings
+    return {
+        'unsafe_mode': ts['unsafe_mode'],
+        'import_allowed': _copy(ts.get('import_allowed', {})),
+        'import_notallowed': _copy(ts.get('import_notallowed', {})),
+        'import_allowed_saved': dict(
+            (mod, dict(syms)) for mod, syms in citems(
+                setting.settingdb.get('import_allowed', {}))),
+        }
+
+def _applySafetySettings(safety):
+    """Use the safety settings of the process starting the worker."""
+
+    ts = setting.transient_settings
+    ts['unsafe_mode'] = safety['unsafe_mode']
+    for name in ('import_allowed', 'import_notallowed'):
+        ts[name] = defaultdict(set)
+        ts[name].update(safety[name])
+    setting.settingdb['import_allowed'] = safety['import_allowed_saved']
+
+def pictureToData(pic):
+    """Convert QPicture to bytes."""
+    data = qt4.QByteArray()
+    buf = qt4.QBuffer(data)
+    buf.open(qt4.QIODevice.WriteOnly)
+    pic.save(buf)
+    buf.close()
+    return bytes(data)
+
+def drawPictureData(painter, data, dpi):
+    """Draw picture saved by pictureToData with resolution dpi to
+    painter."""
+    buf = qt4.QBuffer()
+    buf.setData(data)
+    buf.open(qt4.QIODevice.ReadOnly)
+    pic = qt4.QPicture()
+    pic.load(buf)
+
+    painter.save()
+    # pictures are scaled to the painter from the default resolution,
+    # which could be different in the worker
+    scale = qt4.QPicture().logicalDpiX() / dpi
+    if scale != 1:
+        painter.scale(scale, scale)
+    painter.drawPicture(0, 0, pic)
+    painter.restore()
+
+class WorkerPool(object):
+    """Worker processes which draw pages of a document.
+
+    Each worker loads the document when started. Tasks are shared
+    between the workers in turn and their results returned in order.
+    """
+
+    def __init__(self, doc, numworkers):
+        init = {
+            'source': _documentSource(doc),
+            'cwd': os.getcwd(),
+            'plugins': doc.extraplugins,
+            'safety': _safetySettings(),
+            }
+
+        cmd = _workerCommand()
+        env = _workerEnvironment()
+        self.workers = []
+        try:
+            for i in crange(numworkers):
+                worker = subprocess.Popen(
+                    cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    env=env)
+                self.workers.append(worker)
+                self._send(worker, init)
+        except Exception:
+            self.close()
+            raise
+
+    def _send(self, worker, obj):
+        try:
+            pickle.dump(obj, worker.stdin, pickle.HIGHEST_PROTOCOL)
+            worker.stdin.flush()
+        except EnvironmentError:
+            raise RuntimeError('Export worker process failed')
+
+    def _receive(self, worker):
+        try:
+            status, result = pickle.load(worker.stdout)
+        except EOFError:
+            raise RuntimeError('Export worker process failed')
+        if status == 'error':
+            raise RuntimeError(result)
+        return result
+
+    def run(self, tasks):
+        """Run the tasks, yielding their results in order.
+
+        Each task is (function name, arguments) for a function in
+        this module named "task" + function name."""
+        tasks = list(tasks)
+        for i, task in enumerate(tasks):
+            self._send(self.workers[i % len(self.workers)], task)
+        for i in crange(len(tasks)):
+            yield self._receive(self.workers[i % len(self.workers)])
+
+    def close(self):
+        """Stop the workers."""
+        for worker in self.workers:
+            try:
+                worker.stdin.close()
+            except EnvironmentError:
+                pass
+        for worker in self.workers:
+            if worker.poll() is None:
+                worker.terminate()
+            worker.wait()
+            worker.stdout.close()
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def taskPicture(doc, page, dpi, rasterdpi, rasterthreshold):
+    """Draw page at dpi, returning (picture data, picture resolution).
+    Dense plotters are drawn as bitmaps if rasterdpi is set (see
+    export.replayPage)."""
+    from . import export
+    from . import painthelper
+
+    pic = qt4.QPicture()
+    painter = painthelper.DirectPainter(pic)
+    picdpi = (pic.logicalDpiX(), pic.logicalDpiY())
+    if rasterdpi is None:
+        # draw directly into the picture
+        size = doc.pageSize(page, dpi=picdpi, integer=False)
+        helper = painthelper.PaintHelper(
+            doc, size, dpi=picdpi, directpaint=painter)
+        painter.save()
+        doc.paintTo(helper, page)
+        painter.restore()
+    else:
+        helper = export.recordPage(doc, page, dpi)
+        export.replayPage(helper, picdpi, painter, rasterdpi=rasterdpi,
+                          rasterthreshold=rasterthreshold)
+    painter.end()
+    return pictureToData(pic), picdpi[0]
+
+def taskExport(doc, page, filename, options):
+    """Export page to filename, with options a dict of attributes of
+    export.Export."""
+    from . import export
+
+    e = export.Export(doc, filename, [page])
+    for name, val in options.items():
+        setattr(e, name, val)
+    e.export()
+
+def runWorker():
+    """Run a worker, reading the document and tasks from standard
+    input (veusz --export-worker)."""
+
+    # keep standard output for results, sending any other output to
+    # standard error
+    out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    inp = getattr(sys.stdin, 'buffer', sys.stdin)
+
+    # register the widgets and import commands
+    from .. import widgets
+    from .. import dataimport
+    from .doc import Document
+    from . import loader
+
+    app = qt4.QApplication([])
+
+    init = pickle.load(inp)
+    os.chdir(init['cwd'])
+    if init['plugins']:
+        Document.loadPlugins(pluginlist=init['plugins'])
+
+    _applySafetySettings(init['safety'])
+    doc = Document()
+    source = init['source']
+    if 'script' in source:
+        doc.filename = source['filename']
+        loader.executeScript(doc, source['filename'], source['script'])
+    else:
+        loader.loadDocument(doc, source['filename'], mode=source['mode'])
+
+    while True:
+        try:
+            name, args = pickle.load(inp)
+        except EOFError:
+            break
+        try:
+            result = ('ok', globals()['task'+name](doc, *args))
+        except Exception as e:
+            traceback.print_exc()
+            result = ('error', cexceptionuser(e))
+        pickle.dump(result, out, pickle.HIGHEST_PROTOCOL)
+        out.flush()
+
+    del app
@@ -0,0 +1,256 @@
+#    Copyright (C) 2017 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""A cache of decoded images shared by the widgets of a document.
+
+Images are identified by their file (path, modification time, size
+and inode) or by a hash of their embedded data, so widgets showing
+the same image share it. Besides the full resolution image, versions
+reduced by powers of two are kept for drawing on the screen, which
+are decoded directly at the smaller size where the image format
+allows it (e.g. JPEG). The least recently used images are removed
+when the total is larger than the image_cache_MB preference.
+"""
+
+from __future__ import division
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import time
+
+from ..compat import crange
+from .. import qtall as qt4
+from .. import setting
+from .. import utils
+
+# maximum number of times an image is halved in size
+_maxlevel = 8
+
+class _Source(object):
+    """Information about an image and how to read it."""
+
+    def __init__(self, source):
+        # ('file', filename) or ('data', base64 text)
+        self.source = source
+        # full size of image (QSize), or None if not read yet
+        self.size = None
+        # levels being decoded in the background
+        self.pending = set()
+
+    def makeReader(self):
+        """Return a QImageReader for the image, and any buffer which
+        must be kept while reading."""
+        kind, val = self.source
+        if kind == 'file':
+            return qt4.QImageReader(val), None
+        buf = qt4.QBuffer()
+        buf.setData(qt4.QByteArray.fromBase64(val.encode('utf-8')))
+        buf.open(qt4.QIODevice.ReadOnly)
+        return qt4.QImageReader(buf), buf
+
+    def levelSize(self, level):
+        """Size of image with level (number of halvings)."""
+        scale = 2**level
+        return qt4.QSize(
+            max(1, -(-self.size.width()//scale)),
+            max(1, -(-self.size.height()//scale)))
+
+def _imageBytes(img):
+    """Memory used by QImage."""
+    return img.bytesPerLine()*img.height()
+
+class ImageCache(object):
+    """Decoded images shared between the widgets of a document.
+
+    Widgets get a key for their image with fileKey or dataKey, then
+    call getImage with the key and source of the image, which is
+    ('file', filename) or ('data', base64 text).
+    """
+
+    # minimum interval in seconds between checking files for changes
+    statinterval = 1.
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.lock = threading.Lock()
+        # key -> _Source
+        self.sources = {}
+        # (key, level) -> QImage, least recently used first
+        self.images = OrderedDict()
+        self.totalbytes = 0
+        # filename -> (time checked, key)
+        self.filekeys = {}
+        # limit the number of images decoded at the same time
+        self.decodelimit = threading.BoundedSemaphore(
+            utils.defaultNumThreads())
+
+    def fileKey(self, filename):
+        """Return key for the image in filename, or None if it is not
+        a file. The file is checked for changes at most once every
+        statinterval seconds."""
+        now = time.time()
+        checked = self.filekeys.get(filename)
+        if checked is not None and now-checked[0] < self.statinterval:
+            return checked[1]
+
+        key = None
+        try:
+            st = os.stat(filename)
+        except EnvironmentError:
+            pass
+        else:
+            if os.path.isfile(filename):
+                key = ('file', os.path.abspath(filename), st.st_mtime,
+                       st.st_size, st.st_ino)
+        self.filekeys[filename] = (now, key)
+        return key
+
+    @staticmethod
+    def dataKey(data):
+        """Return key for the image in base64 encoded text data."""
+        return ('data', hashlib.sha1(data.encode('utf-8')).hexdigest())
+
+    def _source(self, key, source):
+        """Get _Source for key (call with lock held)."""
+        src = self.sources.get(key)
+        if src is None:
+            src = self.sources[key] = _Source(source)
+        return src
+
+    def imageSize(self, key, source):
+        """Return the full size of the image (QSize), reading it from
+        the image header if necessary. The size is invalid if the
+        image cannot be read."""
+        with self.lock:
+            src = self._source(key, source)
+            if src.size is None:
+                reader, buf = src.makeReader()
+                src.size = reader.size()
+            return src.size
+
+    def getImage(self, key, source, targetsize=None, background=False):
+        """Get a QImage for the image with key.
+
+        If targetsize (QSizeF) is given, the image may be reduced in
+        size to at least this size. If background is set, images
+        which have not been decoded yet are decoded in another
+        thread, the document sigRedrawRequest signal being emitted
+        when done. Another size of the image is returned while
+        waiting, if available, or None.
+        """
+
+        size = self.imageSize(key, source)
+        level = 0
+        if targetsize is not None and size.isValid():
+            while ( level < _maxlevel and
+                    size.width() >= targetsize.width()*2**(level+1) and
+                    size.height() >= targetsize.height()*2**(level+1) ):
+                level += 1
+
+        with self.lock:
+            img = self._lookup(key, level)
+            if img is not None:
+                return img
+
+            src = self._source(key, source)
+            if background:
+                if level not in src.pending:
+                    src.pending.add(level)
+                    thread = threading.Thread(
+                        target=self._decodeBackground,
+                        args=(key, src, level))
+                    thread.daemon = True
+                    thread.start()
+
+                # show another size while waiting, preferring larger ones
+                for other in sorted(
+                        crange(_maxlevel+1),
+                        key=lambda lev: (lev > level, abs(lev-level))):
+                    img = self._lookup(key, other)
+                    if img is not None:
+                        return img
+                return None
+
+        img = self._decode(key, src, level)
+        with self.lock:
+            self._store(key, level, img)
+        return img
+
+    def _lookup(self, key, level):
+        """Return image for key at level, marking as recently used
+        (call with lock held)."""
+        img = self.images.pop((key, level), None)
+        if img is not None:
+            self.images[(key, level)] = img
+        return img
+
+    def _decode(self, key, src, level):
+        """Decode image at level."""
+        if level > 0:
+            # scale down a larger version if there is one
+            larger = None
+            with self.lock:
+                for lev in crange(level-1, -1, -1):
+                    larger = self.images.get((key, lev))
+                    if larger is not None:
+                        break
+            if larger is not None:
+                return larger.scaled(
+                    src.levelSize(level), qt4.Qt.IgnoreAspectRatio,
+                    qt4.Qt.SmoothTransformation)
+
+        reader, buf = src.makeReader()
+        if level > 0:
+            # some formats can be read directly at a smaller size
+            reader.setScaledSize(src.levelSize(level))
+        return reader.read()
+
+    def _decodeBackground(self, key, src, level):
+        """Decode image in a thread, asking for the document to be
+        redrawn when done."""
+        with self.decodelimit:
+            img = self._decode(key, src, level)
+        with self.lock:
+            src.pending.discard(level)
+            self._store(key, level, img)
+        self.doc.sigRedrawRequest.emit()
+
+    def _store(self, key, level, img):
+        """Add image to the cache, removing the least recently used
+        images if over the memory budget (call with lock held)."""
+        old = self.images.pop((key, level), None)
+        if old is not None:
+            self.totalbytes -= _imageBytes(old)
+        self.images[(key, level)] = img
+        self.totalbytes += _imageBytes(img)
+
+        maxbytes = setting.settingdb['image_cache_MB']*1024*1024
+        removed = False
+        while self.totalbytes > maxbytes and len(self.images) > 1:
+            oldkey, oldimg = self.images.popitem(last=False)
+            self.totalbytes -= _imageBytes(oldimg)
+            removed = True
+
+        if removed:
+            # forget images without any decoded versions, as embedded
+            # images keep their data
+            used = set([k for k, l in self.images])
+            for k in list(self.sources):
+                if k not in used and not self.sources[k].pending:
+                    del self.sources[k]
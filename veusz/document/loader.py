@@ -18,10 +18,12 @@
 
 # note: no future statements here for backward compatibility
 
+import ast
 import sys
 import os.path
 import traceback
 import io
+import time
 import numpy as N
 
 from .. import qtall as qt4
@@ -52,7 +54,25 @@ def bconv(s):
         return s.decode('utf-8')
     return s
 
-def executeScript(thedoc, filename, script, callbackunsafe=None):
+class _DeferImportsTransformer(ast.NodeTransformer):
+    """Change statements calling an import command, where the return
+    value is not used, to call the command wrapped by
+    _deferred_import_(). The file can then be read in the background
+    while the rest of the script runs."""
+
+    def visit_Expr(self, node):
+        call = node.value
+        if ( isinstance(call, ast.Call) and
+             isinstance(call.func, ast.Name) and
+             call.func.id in CommandInterface.import_commands ):
+            wrapper = ast.Call(
+                func=ast.Name(id='_deferred_import_', ctx=ast.Load()),
+                args=[call.func], keywords=[])
+            call.func = ast.copy_location(wrapper, call.func)
+        return node
+
+def executeScript(thedoc, filename, script, callbackunsafe=None,
+                  timings=None):
     """Execute a script for the document.
 
     This handles setting up the environment and checking for unsafe
@@ -62,10 +82,16 @@ def executeScript(thedoc, filename, script, callbackunsafe=None):
     script: text to execute
     callbackunsafe: should be set to a function to ask the user whether it is
       ok to execute any unsafe commands found. Return True if ok.
+    timings: if a dict, the time taken in each part of loading is
+      added to it (see DocBulkUpdate)
 
-    User should wipe docment before calling this.
+    User should wipe docment before calling this. The document is
+    built in bulk update mode, so the undo history is cleared.
     """
 
+    if timings is None:
+        timings = {}
+
     def genexception(exc):
         info = sys.exc_info()
         backtrace = ''.join(traceback.format_exception(*info))
@@ -73,11 +99,13 @@ def executeScript(thedoc, filename, script, callbackunsafe=None):
 
     # compile script and check for security (if reqd)
     unsafe = [setting.transient_settings['unsafe_mode']]
+    start = time.time()
     while True:
         try:
             compiled = utils.compileChecked(
                 script, mode='exec', filename=filename,
-                ignoresecurity=unsafe[0])
+                ignoresecurity=unsafe[0],
+                transformer=_DeferImportsTransformer())
             break
         except utils.SafeEvalException:
             if callbackunsafe is None or not callbackunsafe():
@@ -86,6 +114,8 @@ def executeScript(thedoc, filename, script, callbackunsafe=None):
             unsafe[0] = True
         except Exception as e:
             raise genexception(e)
+    timings['compiling script'] = (
+        timings.get('compiling script', 0.) + time.time()-start)
 
     env = thedoc.evaluate.context.copy()
     interface = CommandInterface(thedoc)
@@ -114,14 +144,37 @@ def executeScript(thedoc, filename, script, callbackunsafe=None):
     # allow import to happen relative to loaded file
     interface.AddImportPath( os.path.dirname(os.path.abspath(filename)) )
 
-    with thedoc.suspend():
+    start = time.time()
+    with thedoc.bulkUpdate(timings=timings) as bulk:
+
+        # read files in the background for imports whose results are
+        # not used by the script
+        importcmds = [getattr(interface, n)
+                      for n in interface.import_commands]
+        def _deferred(func):
+            if func not in importcmds:
+                # name redefined by script
+                return func
+            def wrapped(*args, **argsk):
+                bulk.deferimports = True
+                try:
+                    func(*args, **argsk)
+                finally:
+                    bulk.deferimports = False
+            return wrapped
+        env['_deferred_import_'] = _deferred
+
         try:
             # actually run script text
             cexec(compiled, env)
+            # finish reading any files
+            bulk.flush()
         except LoadError:
             raise
         except Exception as e:
             raise genexception(e)
+    timings['total executing script'] = (
+        timings.get('total executing script', 0.) + time.time()-start)
 
 def loadHDF5Dataset1D(datagrp):
     args = {}
@@ -177,7 +230,7 @@ def tagHDF5Datasets(thedoc, hdffile):
             dsname = name.decode('utf-8')
             thedoc.data[dsname].tags.add(vsztag)
 
-def loadHDF5Doc(thedoc, filename, callbackunsafe=None):
+def loadHDF5Doc(thedoc, filename, callbackunsafe=None, timings=None):
     """Load an HDF5 of the name given."""
 
     try:
@@ -209,7 +262,8 @@ def loadHDF5Doc(thedoc, filename, callbackunsafe=None):
 
         # load document
         script = hdffile['Veusz']['Document']['document'][0].decode('utf-8')
-        executeScript(thedoc, filename, script, callbackunsafe=callbackunsafe)
+        executeScript(thedoc, filename, script, callbackunsafe=callbackunsafe,
+                      timings=timings)
 
         # then load datasets
         loadHDF5Datasets(thedoc, hdffile)
@@ -218,10 +272,13 @@ def loadHDF5Doc(thedoc, filename, callbackunsafe=None):
 
         hdffile.close()
 
-def loadDocument(thedoc, filename, mode='vsz', callbackunsafe=None):
+def loadDocument(thedoc, filename, mode='vsz', callbackunsafe=None,
+                 timings=None):
     """Load document from file.
 
     mode is 'vsz' or 'hdf5'
+    timings: if a dict, the time taken in each part of loading is
+      added to it, e.g. for each type of operation
     """
 
     if mode == 'vsz':
@@ -237,10 +294,12 @@ def loadDocument(thedoc, filename, mode='vsz', callbackunsafe=None):
 
         thedoc.wipe()
         thedoc.filename = filename
-        executeScript(thedoc, filename, script, callbackunsafe=callbackunsafe)
+        executeScript(thedoc, filename, script, callbackunsafe=callbackunsafe,
+                      timings=timings)
 
     elif mode == 'hdf5':
-        loadHDF5Doc(thedoc, filename, callbackunsafe=callbackunsafe)
+        loadHDF5Doc(thedoc, filename, callbackunsafe=callbackunsafe,
+                    timings=timings)
 
     else:
         raise RuntimeError('Invalid load mode')
@@ -18,9 +18,14 @@
 
 from __future__ import division
 from itertools import count
+import json
+import struct
 
-from ..compat import czip, CStringIO
+import numpy as N
+
+from ..compat import czip, CStringIO, cstr
 from .. import qtall as qt4
+from .. import datasets as dsmod
 
 from . import doc
 from . import operations
@@ -62,41 +67,163 @@ def generateWidgetsMime(widgets):
     mimedata.setData(widgetmime, qt4.QByteArray(text))
     return mimedata
 
-def generateDatasetsMime(datasets, document):
-    """Generate mime for the list of dataset names given in the document.
+# binary dataset mime
+databinarymime = 'application/x-vnd.veusz-data-binary-1'
+
+# start of binary dataset mime data
+_binarymagic = b'\x93VEUSZDATA\x01\x00'
+
+# dataset types in binary mime data and the arguments to construct them
+_binaryparts = {
+    'Dataset': ('data', 'serr', 'perr', 'nerr'),
+    'Dataset2D': ('data', 'xrange', 'yrange', 'xedge', 'yedge',
+                  'xcent', 'ycent'),
+    'DatasetND': ('data',),
+    'DatasetDateTime': ('data',),
+    'DatasetText': ('data',),
+}
+
+def datasetsToBinary(dsitems):
+    """Convert a list of (name, dataset) to binary mime data.
 
     Format is:
-    repr of names
-    text to recreate dataset 1
-    ...
-    """
+    magic string
+    uint32: length of header
+    header: JSON object, encoded as UTF-8, listing the datasets, their
+      types, the arrays which make them and other values
+    contents of the arrays (in the order given in the header)
 
-    mimedata = qt4.QMimeData()
+    The datasets should be unlinked copies of types in _binaryparts.
+    """
 
-    # just plain text format
-    output = []
-    for name in datasets:
-        output.append( document.data[name].datasetAsText() )
-    text = ('\n'.join(output)).encode('utf-8')
-    mimedata.setData('text/plain', qt4.QByteArray(text))
+    header = []
+    arrays = []
+    for name, ds in dsitems:
+        entry = {
+            'name': name, 'type': ds.__class__.__name__,
+            'arrays': [], 'values': {}}
+        for part in _binaryparts[entry['type']]:
+            val = getattr(ds, part)
+            if val is None:
+                continue
+            if isinstance(val, N.ndarray) and val.dtype.kind in 'biuf':
+                val = N.ascontiguousarray(val)
+                entry['arrays'].append(
+                    [part, {'dtype': val.dtype.str, 'shape': val.shape}])
+                arrays.append(val)
+            else:
+                if isinstance(val, N.ndarray):
+                    val = val.tolist()
+                entry['values'][part] = val
+        header.append(entry)
+
+    hdr = json.dumps({'datasets': header}).encode('utf-8')
+    out = [_binarymagic, struct.pack('<I', len(hdr)), hdr]
+    for a in arrays:
+        out.append(a.tobytes())
+    return b''.join(out)
+
+def datasetsFromBinary(data):
+    """Convert binary mime data to a list of (name, dataset)."""
+
+    if data[:len(_binarymagic)] != _binarymagic:
+        raise ValueError('Invalid binary dataset data')
+    start = len(_binarymagic)
+    hdrlen = struct.unpack('<I', data[start:start+4])[0]
+    start += 4
+    header = json.loads(data[start:start+hdrlen].decode('utf-8'))
+    offset = start + hdrlen
+
+    out = []
+    for entry in header['datasets']:
+        args = dict( (str(k), v) for k, v in entry['values'].items() )
+        for part, descr in entry['arrays']:
+            dtype = N.dtype(str(descr['dtype']))
+            shape = tuple(descr['shape'])
+            size = dtype.itemsize
+            for dim in shape:
+                size *= dim
+            if offset + size > len(data):
+                raise ValueError('Invalid binary dataset data')
+            # copy, as arrays using data directly are read only
+            args[str(part)] = N.array(N.frombuffer(
+                data, dtype=dtype, count=size // dtype.itemsize,
+                offset=offset).reshape(shape))
+            offset += size
+
+        klass = entry['type']
+        if klass not in _binaryparts:
+            raise ValueError('Unknown dataset type in data')
+        if klass == 'DatasetText':
+            args['data'] = [cstr(x) for x in args['data']]
+        out.append( (cstr(entry['name']), getattr(dsmod, klass)(**args)) )
+    return out
+
+class DatasetsMimeData(qt4.QMimeData):
+    """Mime data for datasets, which are only converted to the format
+    requested when they are asked for.
+
+    Formats are:
+     databinarymime: see datasetsToBinary
+     datamime: text to recreate the datasets
+     text/plain: the datasets as text
+    """
 
-    textfile = CStringIO()
-    for name in datasets:
-        # get unlinked copy of dataset
-        ds = document.data[name].returnCopy()
+    def __init__(self, dsitems):
+        """dsitems is a list of (name, unlinked dataset copy)."""
+        qt4.QMimeData.__init__(self)
+        self.dsitems = dsitems
+        self.converted = {}
+
+    def formats(self):
+        return [databinarymime, datamime, 'text/plain']
+
+    def hasFormat(self, mimetype):
+        return mimetype in self.formats()
+
+    def convert(self, mimetype):
+        """Return the data in the mimetype as bytes."""
+        if mimetype == databinarymime:
+            return datasetsToBinary(self.dsitems)
+
+        elif mimetype == datamime:
+            textfile = CStringIO()
+            for name, ds in self.dsitems:
+                # write into a string file
+                ds.saveToFile(textfile, name)
+            return textfile.getvalue().encode('utf-8')
+
+        else:
+            output = [ds.datasetAsText() for name, ds in self.dsitems]
+            return ('\n'.join(output)).encode('utf-8')
+
+    def retrieveData(self, mimetype, preferredtype):
+        """Convert data when it is requested."""
+        if mimetype not in self.formats():
+            return qt4.QMimeData.retrieveData(self, mimetype, preferredtype)
+
+        if mimetype not in self.converted:
+            self.converted[mimetype] = self.convert(mimetype)
+        data = self.converted[mimetype]
+        if mimetype == 'text/plain' and preferredtype == qt4.QVariant.String:
+            return data.decode('utf-8')
+        return qt4.QByteArray(data)
 
-        # write into a string file
-        ds.saveToFile(textfile, name)
+def generateDatasetsMime(datasets, document):
+    """Generate mime for the list of dataset names given in the document.
 
-    rawdata = textfile.getvalue().encode('utf-8')
-    mimedata.setData(datamime, rawdata)
+    The data are only converted to the formats given in
+    DatasetsMimeData when requested.
+    """
 
-    return mimedata
+    # unlinked copies of the datasets
+    return DatasetsMimeData(
+        [(name, document.data[name].returnCopy()) for name in datasets])
 
 def isClipboardDataMime():
     """Returns whether data available on clipboard."""
-    mimedata = qt4.QApplication.clipboard().mimeData()
-    return datamime in mimedata.formats()
+    formats = qt4.QApplication.clipboard().mimeData().formats()
+    return databinarymime in formats or datamime in formats
 
 def getWidgetMime(mimedata):
     """Given mime data, return decoded python string."""
@@ -209,7 +336,7 @@ class OperationWidgetPaste(operations.OperationMultiple):
                     raise RuntimeError("Cannot find suitable parent for pasting")
 
                 # override name if it exists already
-                if name in thisparent.childnames:
+                if thisparent.hasChild(name):
                     name = None
 
                 # make new widget
@@ -260,11 +387,19 @@ class OperationDataPaste(operations.Operation):
     descr = 'paste data'
 
     def __init__(self, mimedata):
-        """Paste datasets into document."""
-        self.data = mimedata.data(datamime).data().decode('utf-8')
+        """Paste datasets into document.
 
-    def do(self, thisdoc):
-        """Do the data paste."""
+        The binary format is used if available, otherwise the text
+        to recreate the datasets."""
+        if databinarymime in mimedata.formats():
+            self.binary = True
+            self.data = mimedata.data(databinarymime).data()
+        else:
+            self.binary = False
+            self.data = mimedata.data(datamime).data().decode('utf-8')
+
+    def _textDatasets(self):
+        """Return list of (name, dataset) from the text format."""
 
         from . import commandinterpreter
 
@@ -273,12 +408,21 @@ class OperationDataPaste(operations.Operation):
         # interpreter to create datasets
         interpreter = commandinterpreter.CommandInterpreter(tempdoc)
         interpreter.runFile(CStringIO(self.data))
+        return tempdoc.data.items()
+
+    def do(self, thisdoc):
+        """Do the data paste."""
+
+        if self.binary:
+            dsitems = datasetsFromBinary(self.data)
+        else:
+            dsitems = self._textDatasets()
 
         # list of pasted datasets
         self.newds = []
 
         # now transfer datasets to existing document
-        for name, ds in sorted(tempdoc.data.items()):
+        for name, ds in sorted(dsitems, key=lambda x: x[0]):
 
             # get new name
             if name not in thisdoc.data:
@@ -51,16 +51,29 @@ class Operation(object):
 
     descr = 'REPLACE THIS'
 
+    # whether operation depends on the datasets or evaluation context
+    # (see DocBulkUpdate)
+    usesdata = True
+
     def do(self, document):
         """Apply operation to document."""
 
     def undo(self, document):
         """Undo operation."""
 
+    def memoryUsage(self):
+        """Approximate number of bytes held by operation for undo."""
+        return 0
+
+def _datasetMemory(ds):
+    """Memory used by dataset (or None) for undo purposes."""
+    return 0 if ds is None else ds.memoryUsage()
+
 class OperationSettingSet(Operation):
     """Set a variable to a value."""
 
     descr = _('change setting')
+    usesdata = False
     
     def __init__(self, setting, value):
         """Set the setting to value.
@@ -221,7 +234,7 @@ class OperationWidgetDelete(Operation):
         self.oldwidget.parent = None
         self.oldparentpath = oldparent.path
         self.oldindex = oldparent.children.index(self.oldwidget)
-        oldparent.removeChild(self.oldwidget.name)
+        oldparent.popChild(self.oldindex)
         
     def undo(self, document):
         """Restore deleted widget."""
@@ -266,7 +279,7 @@ class OperationWidgetsDelete(Operation):
             oldparent = self.oldwidgets[-1].parent
             self.oldparentpaths.append( oldparent.path )
             self.oldindexes.append( oldparent.children.index(self.oldwidgets[-1]) )
-            oldparent.removeChild(self.oldwidgets[-1].name)
+            oldparent.popChild(self.oldindexes[-1])
 
     def undo(self, document):
         """Restore deleted widget."""
@@ -334,26 +347,26 @@ class OperationWidgetMove(Operation):
         if oldparent is newparent:
             # moving within same parent
             self.movemode = 'sameparent'
-            del oldparent.children[self.oldchildindex]
+            oldparent.popChild(self.oldchildindex)
             if self.newindex > self.oldchildindex:
                 self.newindex -= 1
-            oldparent.children.insert(self.newindex, child)
+            oldparent.addChild(child, index=self.newindex)
         else:
             # moving to different parent
             self.movemode = 'differentparent'
 
             # remove from old parent
-            del oldparent.children[self.oldchildindex]
+            oldparent.popChild(self.oldchildindex)
 
-            # current names of children
-            childnames = newparent.childnames
+            # whether name is already used in new parent
+            existingname = newparent.hasChild(child.name)
 
             # record previous parent and position
-            newparent.children.insert(self.newindex, child)
             child.parent = newparent
+            newparent.addChild(child, index=self.newindex)
 
             # set a new name, if required
-            if child.name in childnames:
+            if existingname:
                 self.oldname = child.name
                 child.name = child.chooseName()
 
@@ -367,10 +380,10 @@ class OperationWidgetMove(Operation):
         oldparent = document.resolveFullWidgetPath(self.oldparentpath)
 
         # remove from new parent
-        del newparent.children[self.newindex]
+        newparent.popChild(self.newindex)
         # restore parent
-        oldparent.children.insert(self.oldchildindex, child)
         child.parent = oldparent
+        oldparent.addChild(child, index=self.oldchildindex)
 
         # restore name
         if self.oldname is not None:
@@ -380,6 +393,7 @@ class OperationWidgetAdd(Operation):
     """Add a widget of specified type to parent."""
 
     descr = _('add')
+    usesdata = False
     
     def __init__(self, parent, type, autoadd=True, name=None,
                  index=-1, **defaultvals):
@@ -447,6 +461,9 @@ class OperationDatasetSet(Operation):
         else:
             document.setData(self.datasetname, self.olddata)
 
+    def memoryUsage(self):
+        return _datasetMemory(self.olddata)
+
 class OperationDatasetDelete(Operation):
     """Delete a dateset."""
 
@@ -464,6 +481,9 @@ class OperationDatasetDelete(Operation):
         """Put dataset back"""
         document.setData(self.datasetname, self.olddata)
 
+    def memoryUsage(self):
+        return _datasetMemory(self.olddata)
+
 class OperationDatasetRename(Operation):
     """Rename the dataset.
 
@@ -539,6 +559,9 @@ class OperationDatasetDuplicate(Operation):
             document.deleteData(self.duplname)
         else:
             document.setData(self.duplname, self.olddata)
+
+    def memoryUsage(self):
+        return _datasetMemory(self.olddata)
         
 class OperationDatasetUnlinkFile(Operation):
     """Remove association between dataset and file."""
@@ -573,6 +596,9 @@ class OperationDatasetUnlinkRelation(Operation):
         
     def undo(self, document):
         document.setData(self.datasetname, self.olddataset)
+
+    def memoryUsage(self):
+        return _datasetMemory(self.olddataset)
         
 class OperationDatasetCreate(Operation):
     """Create dataset base class."""
@@ -594,6 +620,9 @@ class OperationDatasetCreate(Operation):
         if self.olddataset is not None:
             document.setData(self.datasetname, self.olddataset)
 
+    def memoryUsage(self):
+        return _datasetMemory(self.olddataset)
+
 class OperationDatasetCreateRange(OperationDatasetCreate):
     """Create a dataset in a specfied range."""
 
@@ -1007,6 +1036,8 @@ class OperationDatasetSetVal(Operation):
         self.oldval = datacol[self.row]
         datacol[self.row] = self.val
         ds.changeValues(self.columnname, datacol)
+        document.modifiedDataRange(
+            self.datasetname, self.columnname, self.row, self.row)
 
     def undo(self, document):
         """Restore the value."""
@@ -1014,6 +1045,48 @@ class OperationDatasetSetVal(Operation):
         datacol = getattr(ds, self.columnname)
         datacol[self.row] = self.oldval
         ds.changeValues(self.columnname, datacol)
+        document.modifiedDataRange(
+            self.datasetname, self.columnname, self.row, self.row)
+
+class OperationDatasetSetRange(Operation):
+    """Set a range of rows in a dataset column.
+
+    Only the old values of the rows changed are kept for undo.
+    """
+
+    descr = _('change dataset values')
+
+    def __init__(self, datasetname, columnname, row, vals):
+        """Set rows starting at row in column columnname to vals."""
+        self.datasetname = datasetname
+        self.columnname = columnname
+        self.row = row
+        self.vals = vals
+
+    def do(self, document):
+        """Set the values."""
+        ds = document.data[self.datasetname]
+        datacol = getattr(ds, self.columnname)
+        rows = slice(self.row, self.row+len(self.vals))
+        self.oldvals = datasets.copyOrNone(datacol[rows])
+        datacol[rows] = self.vals
+        ds.changeValues(self.columnname, datacol)
+        document.modifiedDataRange(
+            self.datasetname, self.columnname,
+            self.row, self.row+len(self.oldvals)-1)
+
+    def undo(self, document):
+        """Restore the values."""
+        ds = document.data[self.datasetname]
+        datacol = getattr(ds, self.columnname)
+        datacol[self.row:self.row+len(self.oldvals)] = self.oldvals
+        ds.changeValues(self.columnname, datacol)
+        document.modifiedDataRange(
+            self.datasetname, self.columnname,
+            self.row, self.row+len(self.oldvals)-1)
+
+    def memoryUsage(self):
+        return 16*len(self.vals)
     
 class OperationDatasetSetVal2D(Operation):
     """Set a value in a 2D dataset."""
@@ -1061,6 +1134,9 @@ class OperationDatasetDeleteRow(Operation):
         ds = document.data[self.datasetname]
         ds.insertRows(self.row, self.numrows, self.saveddata)
 
+    def memoryUsage(self):
+        return 8*self.numrows*len(self.saveddata)
+
 class OperationDatasetInsertRow(Operation):
     """Insert a row or several in the dataset."""
 
@@ -1089,6 +1165,7 @@ class OperationSetCustom(Operation):
     """Set custom objects, such as constants."""
 
     descr = _('set a custom definition')
+    usesdata = False
 
     # translate ctype below into attribute of evaluate
     type_to_attr = {
@@ -1155,6 +1232,9 @@ class OperationMultiple(Operation):
         for op in self.operations[::-1]:
             op.undo(document)
 
+    def memoryUsage(self):
+        return sum([op.memoryUsage() for op in self.operations])
+
 class OperationLoadStyleSheet(OperationMultiple):
     """An operation to load a stylesheet."""
 
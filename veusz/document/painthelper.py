@@ -22,13 +22,18 @@
 from __future__ import division
 from .. import qtall as qt4
 from .. import setting
+from ..utils import renderprofile
 
 try:
     from ..helpers.recordpaint import RecordPaintDevice
+    # recordings are played back without scaling
+    recordscaled = False
 except ImportError:
     # fallback to this if we don't get the native recorded
     def RecordPaintDevice(width, height, dpix, dpiy):
         return qt4.QPicture()
+    # QPicture scales by the ratio of the output and its resolution
+    recordscaled = True
 
 class DrawState(object):
     """Each widget plotted has a recorded state in this object."""
@@ -51,9 +56,22 @@ class DrawState(object):
         # list of child widgets states
         self.children = []
 
+    def itemCount(self):
+        """Approximate number of items drawn in the recording."""
+        try:
+            return self.record.drawItemCount()
+        except AttributeError:
+            # QPicture fallback: estimate from the size of its data
+            return self.record.size() // 64
+
 class PainterRoot(qt4.QPainter):
     """Base class for painting of widgets."""
 
+    # widget being painted
+    widget = None
+    # profile recording painting, if any
+    profile = None
+
     def updateMetaData(self, helper):
         """Update metadeta from helper
 
@@ -77,9 +95,13 @@ class PainterRoot(qt4.QPainter):
         return self.colors.getIndex(index+1)
 
     def __enter__(self):
-        pass
+        self.profile = renderprofile.active
+        if self.profile is not None:
+            self.profile.begin(self.widget, 'paint')
     def __exit__(self, exc_type, exc_value, traceback):
-        pass
+        if self.profile is not None:
+            self.profile.end()
+            self.profile = None
 
 class DirectPainter(PainterRoot):
     """Painter class for direct painting with PaintHelper below.
@@ -96,8 +118,10 @@ class RecordPainter(PainterRoot):
     def __enter__(self):
         #print ' '*len(self.helper.widgetstack), self.widget
         self.helper.widgetstack.append(self.widget)
+        PainterRoot.__enter__(self)
 
     def __exit__(self, exc_type, exc_value, traceback):
+        PainterRoot.__exit__(self, exc_type, exc_value, traceback)
         self.helper.widgetstack.pop()
 
 class PaintHelper(object):
@@ -112,7 +136,8 @@ class PaintHelper(object):
     """
 
     def __init__(self, document, pagesize,
-                 scaling=1., dpi=(100, 100), directpaint=None):
+                 scaling=1., dpi=(100, 100), directpaint=None,
+                 interactive=False):
         """Initialise using page size (tuple of pixelw, pixelh).
 
         If directpaint is set to a painter, use this directly rather
@@ -120,6 +145,10 @@ class PaintHelper(object):
         case the painter must be a DirectPainter object, and
         save()/restore() must be placed around doing the rendering to
         the painter.
+
+        interactive should be set if the output is shown on the
+        screen, where widgets may draw partial results and ask for a
+        redraw later.
         """
 
         self.document = document
@@ -139,6 +168,9 @@ class PaintHelper(object):
         # whether to directly render to a painter or make new layers
         self.directpaint = directpaint
 
+        # is this for display on the screen?
+        self.interactive = interactive
+
         # state for root widget
         self.rootstate = None
 
@@ -186,6 +218,7 @@ class PaintHelper(object):
         else:
             # only paint to one output painter
             p = self.directpaint
+            p.widget = widget
             # make sure we get the same state each time
             p.restore()
             p.save()
@@ -208,10 +241,19 @@ class PaintHelper(object):
         except KeyError:
             return None
 
-    def renderToPainter(self, painter):
+    def countItems(self, profile):
+        """Add the number of items drawn by each widget to profile."""
+        for state in self.states.values():
+            profile.addItems(state.widget, state.itemCount())
+
+    def renderToPainter(self, painter, state=None):
         """Render saved output to painter.
+
+        If state (a DrawState) is given, only it and its children
+        are rendered.
         """
-        self._renderState(self.rootstate, painter)
+        self._renderState(
+            self.rootstate if state is None else state, painter)
 
     def _renderState(self, state, painter, indent=0):
         """Render state to painter."""
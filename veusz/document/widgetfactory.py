@@ -55,8 +55,8 @@ class WidgetFactory(object):
 
         # move around child afterwards, yuck
         if index != -1:
-            del parent.children[-1]
-            parent.children.insert(index, w)
+            parent.popChild(-1)
+            parent.addChild(w, index=index)
 
         return w
 
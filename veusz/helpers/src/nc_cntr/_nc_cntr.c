@@ -1456,35 +1456,28 @@ build_cntr_list_v2(long *np, double *xp, double *yp, int nparts, long ntotal)
 
 
 
-/* cntr_trace is called once per contour level or level pair.
-   If nlevels is 1, a set of contour lines will be returned; if nlevels
-   is 2, the set of polygons bounded by the levels will be returned.
-   If points is True, the lines will be returned as a list of list
-   of points; otherwise, as a list of tuples of vectors.
+/* Run the two tracing passes, filling in the output arrays.
+
+   This does not use the Python API, so it can be run with the GIL
+   released. The output arrays are allocated with malloc() and must be
+   freed by the caller. Returns 0 on success, otherwise an error
+   code (TRACE_ERR_*).
 */
 
-static PyObject *
-cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
+#define TRACE_ERR_NOMEM 1
+#define TRACE_ERR_PASS2 2
+#define TRACE_ERR_NEGN 3
+
+static int
+cntr_trace_passes(Csite *site, long nchunk, double **xp0, double **yp0,
+                  long **nseg0, long *nparts_out, long *ntotal_out)
 {
-    PyObject *c_list;
-    double *xp0;
-    double *yp0;
-    long *nseg0;
     int iseg;
-
-    /* long nchunk = 30; was hardwired */
     long n;
     long nparts = 0;
     long ntotal = 0;
-    long nparts2 = 0;
     long ntotal2 = 0;
 
-    site->zlevel[0] = levels[0];
-    site->zlevel[1] = levels[0];
-    if (nlevels == 2)
-    {
-        site->zlevel[1] = levels[1];
-    }
     site->n = site->count = 0;
     data_init (site, 0, nchunk);
 
@@ -1505,64 +1498,105 @@ cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
             ntotal -= n;
         }
     }
-    xp0 = (double *) PyMem_Malloc(ntotal * sizeof(double));
-    yp0 = (double *) PyMem_Malloc(ntotal * sizeof(double));
-    nseg0 = (long *) PyMem_Malloc(nparts * sizeof(long));
-    if (xp0 == NULL || yp0 == NULL || nseg0 == NULL)
-    {
-	PyErr_NoMemory();
-	goto error;
-    }
+    *nparts_out = nparts;
+    *ntotal_out = ntotal;
+
+    /* allocate at least one element, so that NULL means failure */
+    *xp0 = (double *) malloc((ntotal+1) * sizeof(double));
+    *yp0 = (double *) malloc((ntotal+1) * sizeof(double));
+    *nseg0 = (long *) malloc((nparts+1) * sizeof(long));
+    if (*xp0 == NULL || *yp0 == NULL || *nseg0 == NULL)
+        return TRACE_ERR_NOMEM;
 
     /* second pass */
-    site->xcp = xp0;
-    site->ycp = yp0;
+    site->xcp = *xp0;
+    site->ycp = *yp0;
     iseg = 0;
     for (;;iseg++)
     {
         n = curve_tracer (site, 1);
         if (ntotal2 + n > ntotal)
-        {
-            PyErr_SetString(PyExc_RuntimeError,
-                "curve_tracer: ntotal2, pass 2 exceeds ntotal, pass 1");
-            goto error;
-        }
+            return TRACE_ERR_PASS2;
         if (n == 0)
             break;
         if (n > 0)
         {
             /* could add array bounds checking */
-            nseg0[iseg] = n;
+            (*nseg0)[iseg] = n;
             site->xcp += n;
             site->ycp += n;
             ntotal2 += n;
-            nparts2++;
         }
         else
         {
-            PyErr_SetString(PyExc_RuntimeError,
-                "Negative n from curve_tracer in pass 2");
-            goto error;
+            return TRACE_ERR_NEGN;
         }
     }
 
+    return 0;
+}
+
+/* cntr_trace is called once per contour level or level pair.
+   If nlevels is 1, a set of contour lines will be returned; if nlevels
+   is 2, the set of polygons bounded by the levels will be returned.
+   If points is True, the lines will be returned as a list of list
+   of points; otherwise, as a list of tuples of vectors.
 
-    if (points)
+   The GIL is released while tracing, so that several Cntr objects
+   can trace levels in parallel threads.
+*/
+
+static PyObject *
+cntr_trace(Csite *site, double levels[], int nlevels, int points, long nchunk)
+{
+    PyObject *c_list = NULL;
+    double *xp0 = NULL;
+    double *yp0 = NULL;
+    long *nseg0 = NULL;
+    long nparts = 0;
+    long ntotal = 0;
+    int err;
+
+    site->zlevel[0] = levels[0];
+    site->zlevel[1] = levels[0];
+    if (nlevels == 2)
     {
-        c_list = build_cntr_list_p(nseg0, xp0, yp0, nparts, ntotal);
+        site->zlevel[1] = levels[1];
     }
-    else
+
+    Py_BEGIN_ALLOW_THREADS
+    err = cntr_trace_passes(site, nchunk, &xp0, &yp0, &nseg0,
+                            &nparts, &ntotal);
+    Py_END_ALLOW_THREADS
+
+    switch(err)
     {
-        c_list = build_cntr_list_v2(nseg0, xp0, yp0, nparts, ntotal);
+    case 0:
+        if (points)
+        {
+            c_list = build_cntr_list_p(nseg0, xp0, yp0, nparts, ntotal);
+        }
+        else
+        {
+            c_list = build_cntr_list_v2(nseg0, xp0, yp0, nparts, ntotal);
+        }
+        break;
+    case TRACE_ERR_NOMEM:
+        PyErr_NoMemory();
+        break;
+    case TRACE_ERR_PASS2:
+        PyErr_SetString(PyExc_RuntimeError,
+            "curve_tracer: ntotal2, pass 2 exceeds ntotal, pass 1");
+        break;
+    default:
+        PyErr_SetString(PyExc_RuntimeError,
+            "Negative n from curve_tracer in pass 2");
+        break;
     }
-    PyMem_Free(xp0); PyMem_Free(yp0); PyMem_Free(nseg0);
-    site->xcp = NULL; site->ycp = NULL;
-    return c_list;
 
-    error:
-    PyMem_Free(xp0); PyMem_Free(yp0); PyMem_Free(nseg0);
+    free(xp0); free(yp0); free(nseg0);
     site->xcp = NULL; site->ycp = NULL;
-    return NULL;
+    return c_list;
 }
 
 /******* Make an extension type.  Based on the tutorial.************/
@@ -1576,6 +1610,9 @@ typedef struct {
     PyObject_HEAD
     PyArrayObject *xpa, *ypa, *zpa, *mpa;
     Csite *site;
+    /* set while tracing with the GIL released, as the site state
+       cannot be shared between threads */
+    int busy;
 } Cntr;
 
 
@@ -1631,6 +1668,7 @@ Cntr_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
         self->ypa = NULL;
         self->zpa = NULL;
         self->mpa = NULL;
+        self->busy = 0;
     }
 
     return (PyObject *)self;
@@ -1723,6 +1761,7 @@ Cntr_trace(Cntr *self, PyObject *args, PyObject *kwds)
     int nlevels = 2;
     int points = 0;
     long nchunk = 0L;
+    PyObject *retn;
     static char *kwlist[] = {"level0", "level1", "points", "nchunk", NULL};
 
     if (! PyArg_ParseTupleAndKeywords(args, kwds, "d|dil", kwlist,
@@ -1732,7 +1771,17 @@ Cntr_trace(Cntr *self, PyObject *args, PyObject *kwds)
     }
     if (levels[1] == -1e100 || levels[1] <= levels[0])
         nlevels = 1;
-    return cntr_trace(self->site, levels, nlevels, points, nchunk);
+    if (self->busy)
+    {
+        PyErr_SetString(PyExc_RuntimeError,
+            "Cntr object is already tracing in another thread");
+        return NULL;
+    }
+
+    self->busy = 1;
+    retn = cntr_trace(self->site, levels, nlevels, points, nchunk);
+    self->busy = 0;
+    return retn;
 }
 
 static PyMethodDef Cntr_methods[] = {
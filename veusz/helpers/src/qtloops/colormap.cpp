@@ -0,0 +1,269 @@
+//    Copyright (C) 2017 Jeremy S. Sanders
+//    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+//
+//    This program is free software; you can redistribute it and/or modify
+//    it under the terms of the GNU General Public License as published by
+//    the Free Software Foundation; either version 2 of the License, or
+//    (at your option) any later version.
+//
+//    This program is distributed in the hope that it will be useful,
+//    but WITHOUT ANY WARRANTY; without even the implied warranty of
+//    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//    GNU General Public License for more details.
+//
+//    You should have received a copy of the GNU General Public License along
+//    with this program; if not, write to the Free Software Foundation, Inc.,
+//    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+/////////////////////////////////////////////////////////////////////////////
+
+#include "colormap.h"
+#include "isnan.h"
+
+#include <math.h>
+
+#include <QRunnable>
+#include <QThread>
+#include <QThreadPool>
+#include <QVector>
+
+namespace
+{
+  template <class T> inline T clipval(T val, T minv, T maxv)
+  {
+    if( val < minv ) return minv;
+    if( val > maxv ) return maxv;
+    return val;
+  }
+
+  // don't use threads for images smaller than this number of pixels
+  const int MIN_THREADED_PIXELS = 65536;
+
+  // work shared by the threads drawing rows of the image
+  struct ColorMapJob
+  {
+    const Numpy2DObj* data;
+    const Numpy2DIntObj* colors;
+    const Numpy2DObj* transdata;
+    int scaling;
+    double minval, maxval;
+    // precalculated values for log scaling
+    double logmin, invlogrange;
+
+    uchar* bits;
+    int bytesperline;
+  };
+
+  // scale value into the range 0 to 1
+  // (these match applyScaling in colormap.py)
+  inline double scaleValue(const ColorMapJob& job, double val)
+  {
+    switch(job.scaling)
+      {
+      case SCALING_SQRT:
+	{
+	  const double frac = (val - job.minval) / (job.maxval - job.minval);
+	  return frac < 0. ? 0. : sqrt(frac);
+	}
+      case SCALING_LOG:
+	{
+	  // non-finite values are made transparent by the caller
+	  return (log(val) - job.logmin) * job.invlogrange;
+	}
+      case SCALING_SQUARED:
+	{
+	  if( val < job.minval )
+	    return 0.;
+	  const double delta = val - job.minval;
+	  const double range = job.maxval - job.minval;
+	  return (delta*delta) / (range*range);
+	}
+      default:
+	return (val - job.minval) / (job.maxval - job.minval);
+      }
+  }
+
+  // convert rows y1 to y2-1 of the data, returning whether any
+  // pixels are transparent
+  bool convertRows(const ColorMapJob& job, int y1, int y2)
+  {
+    const Numpy2DObj& data = *job.data;
+    const Numpy2DIntObj& colors = *job.colors;
+    const int numcolors = colors.dims[0];
+    const int numbands = numcolors-1;
+    const int xw = data.dims[1];
+    const int yw = data.dims[0];
+
+    // if the first value in the color is -1 then switch to jumping mode
+    const bool jumps = colors(0,0) == -1;
+
+    bool hasalpha = false;
+    for(int y=y1; y<y2; ++y)
+      {
+	// direction of images is different for qt and numpy image
+	QRgb* scanline = reinterpret_cast<QRgb*>
+	  (job.bits + (yw-y-1)*job.bytesperline);
+	for(int x=0; x<xw; ++x)
+	  {
+	    double val = scaleValue(job, data(x, y));
+
+	    // output color
+	    int b, g, r, a;
+
+	    if( ! isFinite(val) )
+	      {
+		// transparent
+		b = g = r = a = 0;
+	      }
+	    else
+	      {
+		val = clipval(val, 0., 1.);
+
+		if( jumps )
+		  {
+		    // jumps between colours in discrete mode
+		    // (ignores 1st color, which signals this mode)
+		    const int band = clipval(int(val*(numcolors-1))+1, 1,
+					     numcolors-1);
+
+		    b = colors(0, band);
+		    g = colors(1, band);
+		    r = colors(2, band);
+		    a = colors(3, band);
+		  }
+		else
+		  {
+		    // do linear interpolation between bands
+		    const int band = clipval(int(val*numbands), 0, numbands-1);
+		    const double delta = val*numbands - band;
+
+		    // ensure we don't read beyond where we should
+		    const int band2 = band + 1 < numbands ? band + 1 : numbands;
+		    const double delta1 = 1.-delta;
+
+		    // we add 0.5 before truncating to round to nearest int
+		    b = int(delta1*colors(0, band) +
+			    delta *colors(0, band2) + 0.5);
+		    g = int(delta1*colors(1, band) +
+			    delta *colors(1, band2) + 0.5);
+		    r = int(delta1*colors(2, band) +
+			    delta *colors(2, band2) + 0.5);
+		    a = int(delta1*colors(3, band) +
+			    delta *colors(3, band2) + 0.5);
+		  }
+
+		if( job.transdata != 0 )
+		  a = int(a*clipval((*job.transdata)(x, y), 0., 1.));
+	      }
+
+	    if(a != 255)
+	      hasalpha = true;
+
+	    *(scanline+x) = qRgba(r, g, b, a);
+	  }
+      }
+
+    return hasalpha;
+  }
+
+  // converts a range of rows in a thread
+  class ColorMapRunnable : public QRunnable
+  {
+  public:
+    ColorMapRunnable(const ColorMapJob& job, int y1, int y2)
+      : _job(job), _y1(y1), _y2(y2), hasalpha(false)
+    {
+      setAutoDelete(false);
+    }
+
+    void run()
+    {
+      hasalpha = convertRows(_job, _y1, _y2);
+    }
+
+  private:
+    const ColorMapJob& _job;
+    int _y1, _y2;
+
+  public:
+    bool hasalpha;
+  };
+}
+
+QImage scaledNumpyToQImage(const Numpy2DObj& data, const Numpy2DIntObj& colors,
+			   int scaling, double minval, double maxval,
+			   const Numpy2DObj* transdata)
+{
+  if( colors.dims[1] != 4 )
+    throw "4 columns required in colors array";
+  if( colors.dims[0] < 1 )
+    throw "at least 1 color required";
+  if( scaling < SCALING_LINEAR || scaling > SCALING_SQUARED )
+    throw "invalid scaling mode";
+  if( transdata != 0 && (transdata->dims[0] != data.dims[0] ||
+			 transdata->dims[1] != data.dims[1]) )
+    throw "transparency data must have the same shape as the data";
+
+  const int xw = data.dims[1];
+  const int yw = data.dims[0];
+
+  QImage img(xw, yw, QImage::Format_ARGB32);
+
+  ColorMapJob job;
+  job.data = &data;
+  job.colors = &colors;
+  job.transdata = transdata;
+  job.scaling = scaling;
+  job.minval = minval;
+  job.maxval = maxval;
+  job.logmin = log(minval);
+  job.invlogrange = 1./(log(maxval)-log(minval));
+  // get the pointer once, as detaching the image is not thread safe
+  job.bits = img.bits();
+  job.bytesperline = img.bytesPerLine();
+
+  // split the rows between threads, this thread doing the first part
+  int numthreads = 1;
+  if( double(xw)*yw >= MIN_THREADED_PIXELS )
+    numthreads = clipval(QThread::idealThreadCount(), 1, yw);
+
+  bool hasalpha;
+  if( numthreads <= 1 )
+    {
+      hasalpha = convertRows(job, 0, yw);
+    }
+  else
+    {
+      QThreadPool pool;
+      pool.setMaxThreadCount(numthreads-1);
+      QVector<ColorMapRunnable*> runnables;
+      for(int i=1; i<numthreads; ++i)
+	{
+	  ColorMapRunnable* runnable = new ColorMapRunnable
+	    (job, int(double(yw)*i/numthreads),
+	     int(double(yw)*(i+1)/numthreads));
+	  runnables.append(runnable);
+	  pool.start(runnable);
+	}
+
+      hasalpha = convertRows(job, 0, int(double(yw)/numthreads));
+      pool.waitForDone();
+
+      for(int i=0; i<runnables.size(); ++i)
+	{
+	  hasalpha = hasalpha || runnables[i]->hasalpha;
+	  delete runnables[i];
+	}
+    }
+
+  if(!hasalpha)
+    {
+      // return image without transparency for speed / space improvements
+#if QT_VERSION >= QT_VERSION_CHECK(5, 9, 0)
+      img.reinterpretAsFormat(QImage::Format_RGB32);
+#else
+      return img.convertToFormat(QImage::Format_RGB32);
+#endif
+    }
+
+  return img;
+}
@@ -0,0 +1,41 @@
+//    Copyright (C) 2017 Jeremy S. Sanders
+//    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+//
+//    This program is free software; you can redistribute it and/or modify
+//    it under the terms of the GNU General Public License as published by
+//    the Free Software Foundation; either version 2 of the License, or
+//    (at your option) any later version.
+//
+//    This program is distributed in the hope that it will be useful,
+//    but WITHOUT ANY WARRANTY; without even the implied warranty of
+//    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//    GNU General Public License for more details.
+//
+//    You should have received a copy of the GNU General Public License along
+//    with this program; if not, write to the Free Software Foundation, Inc.,
+//    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+/////////////////////////////////////////////////////////////////////////////
+
+#ifndef COLORMAP_HH
+#define COLORMAP_HH
+
+#include "qtloops_helpers.h"
+
+#include <QImage>
+
+// scaling modes for scaledNumpyToQImage
+enum ColorScaling
+  {
+    SCALING_LINEAR=0, SCALING_SQRT, SCALING_LOG, SCALING_SQUARED
+  };
+
+// Scale data between minval and maxval using scaling and convert it
+// to an image with colors (rows of BGRA), in a single pass. If
+// transdata is set, it scales the alpha of each pixel (0 to 1) and
+// must have the same shape as data. Rows are split between threads
+// for large images.
+QImage scaledNumpyToQImage(const Numpy2DObj& data, const Numpy2DIntObj& colors,
+			   int scaling, double minval, double maxval,
+			   const Numpy2DObj* transdata = 0);
+
+#endif
@@ -21,25 +21,29 @@
 """Plugins for creating datasets."""
 
 from __future__ import division, print_function
+import hashlib
 import re
+import time
 import numpy as N
 from . import field
 
-from ..compat import czip, citems, cstr
+from ..compat import czip, citems, cstr, pickle
 from .. import utils
 from .. import datasets
+from .. import setting
 try:
     from ..helpers import qtloops
 except ImportError:
     pass
 from .. import qtall as qt4
+from .registry import PluginRegistry
 
 def _(text, disambiguation=None, context='DatasetPlugin'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
 # add an instance of your class to this list to be registered
-datasetpluginregistry = []
+datasetpluginregistry = PluginRegistry()
 
 class DatasetPluginException(RuntimeError):
     """Raise this to report an error.
@@ -270,6 +274,26 @@ class Function(_DatasetBase):
     def _customs(self):
         return [['function', self.name, self.val]]
 
+def fingerprint(val):
+    """Return a fingerprint of the contents of val, a value read by a
+    plugin from DatasetPluginHelper, for checking whether it has
+    changed. Arrays are represented by a hash of their data."""
+
+    if isinstance(val, N.ndarray):
+        if val.dtype.hasobject:
+            return ('array', repr(val.tolist()))
+        digest = hashlib.sha1(N.ascontiguousarray(val)).hexdigest()
+        return ('array', val.dtype.str, val.shape, digest)
+    elif isinstance(val, (list, tuple)):
+        return tuple(fingerprint(v) for v in val)
+    elif isinstance(val, _DatasetBase):
+        return (val.__class__.__name__,) + tuple(
+            (k, fingerprint(v)) for k, v in sorted(citems(vars(val))))
+    elif isinstance(val, qt4.QLocale):
+        return ('locale', val.name())
+    else:
+        return repr(val)
+
 # class to pass to plugin to give parameters
 class DatasetPluginHelper(object):
     """Helpers to get existing datasets for plugins."""
@@ -277,34 +301,86 @@ class DatasetPluginHelper(object):
     def __init__(self, doc):
         """Construct helper object to pass to DatasetPlugins."""
         self._doc = doc
+        # fingerprints of values read, if recording
+        self._reads = None
+
+    def _read(self, method, *args):
+        """Call the method with name method with args, recording a
+        fingerprint of the result if recording."""
+        try:
+            result = getattr(self, method)(*args)
+        except DatasetPluginException as ex:
+            if self._reads is not None:
+                self._reads[(method,)+args] = ('error', cstr(ex))
+            raise
+        if self._reads is not None:
+            self._reads[(method,)+args] = fingerprint(result)
+        return result
+
+    def _startRecording(self):
+        """Start recording the values read by a plugin."""
+        self._reads = {}
+
+    def _stopRecording(self):
+        """Stop recording, returning the fingerprints of the values read
+        as a tuple."""
+        reads = tuple(sorted(citems(self._reads)))
+        self._reads = None
+        return reads
+
+    def _readsUnchanged(self, reads):
+        """Are the values read given by _stopRecording unchanged?"""
+        for read, fp in reads:
+            try:
+                newfp = fingerprint(getattr(self, read[0])(*read[1:]))
+            except DatasetPluginException as ex:
+                newfp = ('error', cstr(ex))
+            if newfp != fp:
+                return False
+        return True
 
     @property
     def datasets1d(self):
         """Return list of existing 1D numeric datasets"""
+        return self._read('_datasets1d')
+
+    def _datasets1d(self):
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 1 and ds.datatype == 'numeric')]
 
     @property
     def datasets2d(self):
         """Return list of existing 2D numeric datasets"""
+        return self._read('_datasets2d')
+
+    def _datasets2d(self):
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 2 and ds.datatype == 'numeric')]
 
     @property
     def datasetstext(self):
         """Return list of existing 1D text datasets"""
+        return self._read('_datasetstext')
+
+    def _datasetstext(self):
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 1 and ds.datatype == 'text')]
 
     @property
     def datasetsdatetime(self):
         """Return list of existing date-time datesets"""
+        return self._read('_datasetsdatetime')
+
+    def _datasetsdatetime(self):
         return [name for name, ds in citems(self._doc.data) if
                 isinstance(ds, datasets.DatasetDateTime)]
 
     @property
     def locale(self):
         """Return Qt locale."""
+        return self._read('_locale')
+
+    def _locale(self):
         return self._doc.locale
 
     def evaluateExpression(self, expr, part='data'):
@@ -314,6 +390,9 @@ class DatasetPluginHelper(object):
 
         Returns None if expression could not be evaluated.
         """
+        return self._read('_evaluateExpression', expr, part)
+
+    def _evaluateExpression(self, expr, part):
         ds = datasets.evalDatasetExpression(self._doc, expr, part=part)
         return None if ds is None else ds.data
 
@@ -327,6 +406,9 @@ class DatasetPluginHelper(object):
         name not found: raise a DatasetPluginException
         dimensions not right: raise a DatasetPluginException
         """
+        return self._read('_getDataset', name, dimensions)
+
+    def _getDataset(self, name, dimensions):
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -363,7 +445,9 @@ class DatasetPluginHelper(object):
 
         name not found: raise a DatasetPluginException
         """
+        return self._read('_getTextDataset', name)
 
+    def _getTextDataset(self, name):
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -389,6 +473,8 @@ class DatasetPluginManager(object):
         self.helper = DatasetPluginHelper(doc)
         self.fields = dict(fields)
         self.changeset = -1
+        # fingerprints of values read by the plugin on the last update
+        self.reads = None
 
         self.fixMissingFields()
         self.setupDatasets()
@@ -450,10 +536,23 @@ class DatasetPluginManager(object):
             return
         self.changeset = self.document.changeset
 
-        # run the plugin with its parameters
+        if self.plugin.memoize:
+            # no need to run the plugin if what it read is unchanged
+            if self.reads is not None:
+                if self.helper._readsUnchanged(self.reads):
+                    return
+            elif self.loadFromDiskCache():
+                return
+
+        # run the plugin with its parameters, recording what it reads
+        self.reads = None
+        self.helper._startRecording()
+        start = time.time()
         try:
             self.plugin.updateDatasets(self.fields, self.helper)
         except DatasetPluginException as ex:
+            self.reads = self.helper._stopRecording()
+
             # this is for immediate notification
             if raiseerrors:
                 raise
@@ -461,6 +560,67 @@ class DatasetPluginManager(object):
             # otherwise if there's an error, then log and null outputs
             self.document.log( cstr(ex) )
             self.nullDatasets()
+        else:
+            self.reads = self.helper._stopRecording()
+            if ( self.plugin.memoize and
+                 time.time()-start >= self.diskcachetime ):
+                self.saveToDiskCache()
+        finally:
+            self.helper._reads = None
+
+    # plugins taking longer than this in seconds are cached on disk
+    diskcachetime = 0.2
+
+    def _diskCache(self):
+        """Return the disk cache (see utils.DiskCache) if enabled."""
+        size = setting.settingdb['plugin_cache_MB']
+        if size <= 0:
+            return None
+        return utils.DiskCache('datasetplugins', size*1024*1024)
+
+    def _diskCacheKey(self):
+        return utils.cacheKey(
+            utils.version(), self.plugin.name, sorted(citems(self.fields)),
+            self.datasetnames)
+
+    def saveToDiskCache(self):
+        """Save the values read and the outputs of the plugin to the
+        disk cache, if enabled."""
+        cache = self._diskCache()
+        if cache is None:
+            return
+        outputs = [vars(ds) for ds in self.datasets]
+        try:
+            data = pickle.dumps(
+                (self.reads, outputs), pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # plugin datasets may contain values which cannot be saved
+            return
+        cache.set(self._diskCacheKey(), data)
+
+    def loadFromDiskCache(self):
+        """If the values read by the plugin when it was saved to the disk
+        cache are unchanged, set the outputs from the cache.
+
+        Returns whether this was done."""
+        cache = self._diskCache()
+        if cache is None:
+            return False
+        data = cache.get(self._diskCacheKey())
+        if data is None:
+            return False
+        try:
+            reads, outputs = pickle.loads(data)
+        except Exception:
+            return False
+        if ( len(outputs) != len(self.datasets) or
+             not self.helper._readsUnchanged(reads) ):
+            return False
+
+        for ds, output in czip(self.datasets, outputs):
+            vars(ds).update(output)
+        self.reads = reads
+        return True
 
 class DatasetPlugin(object):
     """Base class for defining dataset plugins."""
@@ -477,6 +637,11 @@ class DatasetPlugin(object):
     # if the plugin takes no parameters, set this to False
     has_parameters = True
 
+    # the plugin is only run again when the values it reads from the
+    # helper change. Set this to False if the outputs depend on
+    # anything else.
+    memoize = True
+
     def __init__(self):
         """Override this to declare a list of input fields if required."""
         self.fields = []
@@ -1924,8 +2089,7 @@ class ConvertNumbersToText(DatasetPlugin):
         ds_in = helper.getDataset(fields['ds_in'])
         f = fields['format']
 
-        data = [ utils.formatNumber(n, f, locale=helper.locale)
-                 for n in ds_in.data ]
+        data = utils.formatArray(ds_in.data, f, locale=helper.locale)
 
         self.dsout.update(data=data)
 
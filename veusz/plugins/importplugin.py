@@ -28,13 +28,14 @@ from .. import qtall as qt4
 
 from . import field
 from . import datasetplugin
+from .registry import PluginRegistry
 
 def _(text, disambiguation=None, context='ImportPlugin'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
 # add an instance of your class to this list to get it registered
-importpluginregistry = []
+importpluginregistry = PluginRegistry()
 
 class ImportPluginParams(object):
     """Parameters to plugin are passed in this object."""
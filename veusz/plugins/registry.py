@@ -0,0 +1,53 @@
+#    Copyright (C) 2017 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""Lists of registered plugins."""
+
+from __future__ import division
+
+class PluginRegistry(list):
+    """A list of plugin classes.
+
+    The plugins given in the user's settings are loaded when a registry
+    is first read, rather than when Veusz starts. Adding to the list
+    does not load them.
+    """
+
+    def _loadUserPlugins(self):
+        from ..document.doc import Document
+        Document.loadUserPlugins()
+
+    def __iter__(self):
+        self._loadUserPlugins()
+        return list.__iter__(self)
+
+    def __len__(self):
+        self._loadUserPlugins()
+        return list.__len__(self)
+
+    def __getitem__(self, idx):
+        self._loadUserPlugins()
+        return list.__getitem__(self, idx)
+
+    def __contains__(self, item):
+        self._loadUserPlugins()
+        return list.__contains__(self, item)
+
+    def index(self, *args):
+        self._loadUserPlugins()
+        return list.index(self, *args)
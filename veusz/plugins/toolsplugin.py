@@ -29,13 +29,14 @@ from ..compat import cbasestr
 from .. import qtall as qt4
 from .. import utils
 from . import field
+from .registry import PluginRegistry
 
 def _(text, disambiguation=None, context='ToolsPlugin'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
 # add an instance of your class to this list to be registered
-toolspluginregistry = []
+toolspluginregistry = PluginRegistry()
 
 class ToolsPluginException(RuntimeError):
     """Raise this to report an error doing what was requested.
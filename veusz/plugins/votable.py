@@ -18,17 +18,20 @@
 from __future__ import division, print_function
 
 from ..compat import CStringIO, CBytesIO, curlrequest
+from .. import utils
 from .importplugin import ImportPlugin, importpluginregistry
 from .datasetplugin import Dataset1D, DatasetText
 
-try:
+def _votableParse():
+    """Return the astropy VO table parser, importing it on first use."""
     import astropy.version
     if [int(x) for x in astropy.version.version.split('.')] >= [0, 2]:
         from astropy.io.votable.table import parse
     else:
         from astropy.io.vo.table import parse
+    return parse
 
-except ImportError:
+if not utils.moduleAvailable('astropy'):
     print('VO table import: astropy module not available')
 
 else:
@@ -38,6 +41,7 @@ else:
         description = 'Reads datasets from VO tables'
 
         def _load_votable(self, params):
+            parse = _votableParse()
             if 'url' in params.field_results:
                 try:
                     buff = CStringIO(curlrequest.urlopen(
@@ -23,6 +23,14 @@ from __future__ import print_function, division, absolute_import
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
-from PyQt5.QtSvg import *
-from PyQt5.QtPrintSupport import *
-from PyQt5.uic import loadUi
+
+# PyQt5.QtSvg and PyQt5.QtPrintSupport are imported where they are
+# used, as they are not needed for most output formats
+
+def loadUi(*args, **argsv):
+    """Load a Qt Designer .ui file.
+
+    PyQt5.uic is only imported when the first user interface file is
+    loaded, as it is slow to import and not needed when exporting."""
+    from PyQt5 import uic
+    return uic.loadUi(*args, **argsv)
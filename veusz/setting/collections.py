@@ -398,6 +398,12 @@ class PointLabel(Text):
             descr = _('Horizontal position of label'),
             usertext = _('Horz position'),
             formatting = True), 0 )
+        self.add( setting.Bool(
+            'avoidOverlap', False,
+            descr = _('Do not draw labels which would overlap labels '
+                      'already drawn'),
+            usertext = _('Avoid overlap'),
+            formatting = True) )
 
 class MarkerColor(Settings):
     """Settings for a coloring points using data values."""
@@ -39,6 +39,10 @@ class ReferenceBase(object):
     def setOnModified(self, setn, fn):
         """Set on modified on settings pointed to by this reference."""
 
+    def copy(self):
+        """Return a new (unresolved) reference with the same value."""
+        return self.__class__(self.value)
+
 class Reference(ReferenceBase):
     """A value a setting can have to point to another setting.
 
@@ -29,6 +29,7 @@ s.fromText('42')
 from __future__ import division
 import re
 import sys
+import weakref
 
 import numpy as N
 
@@ -41,18 +42,48 @@ from .reference import ReferenceBase, Reference
 from .. import utils
 from .. import datasets
 
-class OnModified(qt4.QObject):
-    """onmodified is emitted from an object contained in each setting."""
-    onModified = qt4.pyqtSignal()
+try:
+    from PyQt5 import sip
+except ImportError:
+    import sip
+
+def _makeCallback(fn):
+    """Return a function returning fn, or None if fn was a method of
+    an object which has since been deleted.
+
+    Bound methods are weakly referenced, so that controls do not
+    have to be disconnected from settings when destroyed.
+    """
+    obj = getattr(fn, '__self__', None)
+    if obj is None:
+        return lambda: fn
+
+    objref = weakref.ref(obj)
+    func = fn.__func__
+    def callback():
+        o = objref()
+        if o is None or (isinstance(o, qt4.QObject) and sip.isdeleted(o)):
+            return None
+        return func.__get__(o, o.__class__)
+    return callback
 
 class Setting(object):
-    """A class to store a value with a particular type."""
+    """A class to store a value with a particular type.
+
+    Settings made by clone() are lightweight: they only store their
+    value, parent and any attributes which are changed, looking up
+    other attributes on the setting they were cloned from.
+    """
 
     # differentiate widgets, settings and setting
     nodetype = 'setting'
 
     typename = 'setting'
 
+    # list of callbacks for functions passed to setOnModified. This is
+    # only created for settings which have something listening.
+    _onmodified = None
+
     def __init__(self, name, value, descr='', usertext='',
                  formatting=False, hidden=False):
         """Initialise the values.
@@ -72,16 +103,47 @@ class Setting(object):
         self.formatting = formatting
         self.hidden = hidden
         self.default = value
-        self.onmodified = OnModified()
         self._val = None
 
         # calls the set function for the val property
         self.val = value
 
+    def __getattr__(self, name):
+        # attributes not set on a lightweight copy come from the
+        # setting it was cloned from
+        proto = self.__dict__.get('_proto')
+        if proto is None or name[:2] == '__':
+            raise AttributeError(name)
+        return getattr(proto, name)
+
     def isWidget(self):
         """Is this object a widget?"""
         return False
 
+    def clone(self):
+        """Make a lightweight copy of this setting (without parent)."""
+
+        obj = object.__new__(self.__class__)
+        if '_proto' in self.__dict__:
+            # copy of a copy: take its changes
+            d = dict(self.__dict__)
+            d.pop('_onmodified', None)
+        else:
+            d = {'_proto': self, '_val': self._val}
+        d['parent'] = None
+
+        # references cache what they resolve to, so cannot be shared
+        val = d['_val']
+        if isinstance(val, ReferenceBase):
+            d['_val'] = val.copy()
+        if self.default is val:
+            d['default'] = d['_val']
+        elif isinstance(self.default, ReferenceBase):
+            d['default'] = self.default.copy()
+
+        obj.__dict__.update(d)
+        return obj
+
     def _copyHelper(self, before, after, optional):
         """Help copy an object.
 
@@ -132,7 +194,7 @@ class Setting(object):
             # this also removes the linked value if there is one set
             self._val = self.convertTo(v)
 
-        self.onmodified.onModified.emit()
+        self.emitModified()
 
     val = property(get, set, None,
                    'Get or modify the value of the setting')
@@ -196,19 +258,14 @@ class Setting(object):
     def readDefaults(self, root, widgetname):
         """Check whether the user has a default for this setting."""
 
-        deftext = None
+        # avoid raising exceptions, as there are rarely defaults
+        db = settingdb.database
         unnamedpath = '%s/%s' % (root, self.name)
-        try:
-            deftext = settingdb[unnamedpath]
-        except KeyError:
-            pass
+        deftext = db.get(unnamedpath)
 
         # named defaults supersedes normal defaults
         namedpath = '%s_NAME:%s' % (widgetname, unnamedpath)
-        try:
-            deftext = settingdb[namedpath]
-        except KeyError:
-            pass
+        deftext = db.get(namedpath, deftext)
 
         if deftext is not None:
             self.val = self.fromText(deftext)
@@ -268,8 +325,10 @@ class Setting(object):
             return ''
 
     def setOnModified(self, fn):
-        """Set the function to be called on modification (passing True)."""
-        self.onmodified.onModified.connect(fn)
+        """Set the function to be called on modification."""
+        if self._onmodified is None:
+            self._onmodified = []
+        self._onmodified.append(_makeCallback(fn))
 
         if isinstance(self._val, ReferenceBase):
             # tell references to notify us if they are modified
@@ -277,7 +336,21 @@ class Setting(object):
 
     def removeOnModified(self, fn):
         """Remove the function from the list of function to be called."""
-        self.onmodified.onModified.disconnect(fn)
+        if self._onmodified:
+            self._onmodified = [
+                c for c in self._onmodified if c() != fn ]
+
+    def emitModified(self):
+        """Call the functions registered with setOnModified."""
+        if not self._onmodified:
+            return
+        for callback in list(self._onmodified):
+            fn = callback()
+            if fn is None:
+                # owner of method has gone
+                self._onmodified.remove(callback)
+            else:
+                fn()
 
     def newDefault(self, value):
         """Update the default and the value."""
@@ -38,12 +38,28 @@ defaultValues = {
     'export_quality': 85,
     'export_background': '#ffffff00',
     'export_SVG_text_as_text': False,
+    # write plotters drawing more items than this as bitmaps in
+    # vector formats (0 to disable)
+    'export_raster_threshold': 0,
 
     # plot options
     'plot_updatepolicy': -1, # update on document changed
     'plot_antialias': True,
     'plot_numthreads': 2,
 
+    # undo history: maximum number of levels and memory to use
+    'undo_levels': 10,
+    'undo_memory_MB': 512,
+
+    # size of the disk cache of slow dataset plugin results (0 to disable)
+    'plugin_cache_MB': 0,
+
+    # memory used by decoded images shown by image file widgets
+    'image_cache_MB': 256,
+
+    # size of the disk cache of compiled expressions (0 to disable)
+    'expression_cache_MB': 0,
+
     # recent files list
     'main_recentfiles': [],
 
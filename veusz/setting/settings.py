@@ -60,6 +60,22 @@ class Settings(object):
             s.add( self.setdict[name].copy() )
         return s
 
+    def clone(self):
+        """Make a lightweight copy of the settings and its subsettings,
+        where each setting only stores what is changed from the
+        original (see Setting.clone)."""
+
+        s = object.__new__(self.__class__)
+        d = s.__dict__
+        d.update(self.__dict__)
+        d['parent'] = None
+        d['setnames'] = list(self.setnames)
+        setdict = d['setdict'] = {}
+        for name in self.setnames:
+            child = setdict[name] = self.setdict[name].clone()
+            child.parent = s
+        return s
+
     def isWidget(self):
         """Is this object a widget?"""
         return False
@@ -231,10 +247,11 @@ class Settings(object):
         for s in list(self.setdict.values()):
             s.readDefaults(root, widgetname)
 
-    def linkToStylesheet(self, _root=None):
+    def linkToStylesheet(self, _root=None, _sheet=None):
         """Link the settings within this Settings to a stylesheet.
         
-        _root is an internal parameter as this function is recursive."""
+        _root and _sheet are internal parameters as this function is
+        recursive."""
 
         # build up root part of pathname to reference
         if _root is None:
@@ -246,21 +263,31 @@ class Settings(object):
             path = ['', 'StyleSheet', obj.parent.typename] + path + ['']
             _root = '/'.join(path)
 
+            # find the stylesheet settings corresponding to self, by
+            # looking from the root widget
+            widget = obj.parent
+            while widget.parent is not None:
+                widget = widget.parent
+            _sheet = widget.settings
+            for p in path[1:-1]:
+                _sheet = _sheet.setdict.get(p)
+                if not isinstance(_sheet, Settings):
+                    # nothing to link to
+                    return
+
         # iterate over subsettings
         for name, setn in citems(self.setdict):
             thispath = _root + name
+            sheetsetn = _sheet.setdict.get(name)
             if isinstance(setn, Settings):
                 # call recursively if this is a Settings
-                setn.linkToStylesheet(_root=thispath+'/')
+                if isinstance(sheetsetn, Settings):
+                    setn.linkToStylesheet(
+                        _root=thispath+'/', _sheet=sheetsetn)
             else:
-                # check that reference resolves
-                ref = Reference(thispath)
-                try:
-                    ref.resolve(setn)
-                except Reference.ResolveException:
-                    # leave it as it was
-                    pass
-                else:
+                # check that the reference would resolve
+                if sheetsetn is not None:
+                    ref = Reference(thispath)
                     if setn.isReference() and setn.getReference().split[0] == '..':
                         # convert a relative path to multiple references
                         paths = [thispath, setn.getReference().value]
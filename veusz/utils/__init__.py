@@ -19,9 +19,11 @@
 ###############################################################################
 
 from .version import version
-from .textrender import Renderer, FontMetrics, latexEscape
+from .textrender import Renderer, FontMetrics, latexEscape, renderLabels
 from .safe_eval import compileChecked, SafeEvalException
 from .fitlm import fitLM
+from .renderprofile import RenderProfile, profilePhase, profileCache
+from .diskcache import DiskCache, MarshalCache, cacheKey
 
 from .utilfuncs import *
 from .points import *
@@ -25,7 +25,8 @@ from .. import qtall as qt4
 # use fast or slow helpers
 slowfuncs = False
 try:
-    from ..helpers.qtloops import numpyToQImage, applyImageTransparancy
+    from ..helpers.qtloops import numpyToQImage, applyImageTransparancy, \
+        scaledNumpyToQImage
 except ImportError:
     slowfuncs = True
     from .slowfuncs import slowNumpyToQImage
@@ -426,6 +427,9 @@ class ColorMaps(object):
         ])
         return iter(items)
 
+# scaling modes, numbered as in the C++ helpers
+_scalingmodes = {'linear': 0, 'sqrt': 1, 'log': 2, 'squared': 3}
+
 def applyScaling(data, mode, minval, maxval):
     """Apply a scaling transformation on the data.
     data is a numpy array
@@ -504,6 +508,16 @@ def applyColorMap(cmap, scaling, datain, minval, maxval,
         cmap[:,3] = (cmap[:,3].astype(N.float32) * (100-trans) /
                      100.).astype(N.intc)
 
+    if not slowfuncs and (transimg is None or
+                          N.shape(transimg) == N.shape(datain)):
+        # scale, apply the colormap and transparency in a single pass
+        if scaling not in _scalingmodes:
+            raise RuntimeError('Invalid scaling mode "%s"' % scaling)
+        if minval == maxval:
+            minval, maxval = 0., 1.
+        return scaledNumpyToQImage(
+            datain, cmap, _scalingmodes[scaling], minval, maxval, transimg)
+
     # apply scaling of data
     fracs = applyScaling(datain, scaling, minval, maxval)
 
@@ -20,6 +20,7 @@ from __future__ import division
 import math
 import datetime
 import re
+import warnings
 
 import numpy as N
 
@@ -101,6 +102,103 @@ def dateStringToDate(datestr):
     else:
         return N.nan
 
+# offset date as a numpy datetime64 in microseconds
+offsetdate64 = N.datetime64(offsetdate, 'us')
+_us_per_day = 24*60*60*1000000
+
+def _microsecToFloat(us):
+    """Convert int64 array of microseconds since offset to Veusz floats.
+
+    This is arranged to give the same results as dateStringToDate."""
+    days = us // _us_per_day
+    rem = us - days*_us_per_day
+    secs = rem // 1000000
+    return (days*(24*60*60) + secs) + (rem - secs*1000000)*1e-6
+
+def datetime64ToFloat(vals):
+    """Convert numpy datetime64 array (or sequence of datetime
+    objects) to an array of Veusz float dates. NaT values give nan."""
+    vals = N.asarray(vals, dtype='datetime64[us]')
+    out = _microsecToFloat(
+        (vals - offsetdate64).astype(N.int64)).astype(N.float64)
+    out[N.isnat(vals)] = N.nan
+    return out
+
+def floatToDatetime64(vals):
+    """Convert array of Veusz float dates to numpy datetime64[us].
+    Non finite values give NaT."""
+    vals = N.asarray(vals, dtype=N.float64)
+    finite = N.isfinite(vals)
+    f = N.where(finite, vals, 0.)
+    # split into days and remainder as in floatToDateTime to keep precision
+    days = N.trunc(f / (24*60*60))
+    us = ( days.astype(N.int64)*_us_per_day +
+           N.round((f - days*(24*60*60))*1e6).astype(N.int64) )
+    out = offsetdate64 + us.astype('timedelta64[us]')
+    out[~finite] = N.datetime64('NaT')
+    return out
+
+def _isoCandidates(strs):
+    """Return boolean array of strings which numpy can parse in the
+    same way as _isoDataStringToDate
+    (YYYY-MM-DD, optionally followed by T or space, hh:mm:ss[.ffff]).
+
+    strs is a numpy unicode array."""
+    width = strs.dtype.itemsize // 4
+    if width < 21:
+        width = 21
+        strs = strs.astype('U%i' % width)
+    # strings are padded with empty characters in the array
+    c = strs.view('U1').reshape(len(strs), width)
+    dateonly = (c[:,9] != '') & (c[:,10] == '')
+    timeok = (
+        ((c[:,10] == 'T') | (c[:,10] == ' ')) &
+        (c[:,13] == ':') & (c[:,16] == ':') & (c[:,18] != '') &
+        ((c[:,19] == '') | ((c[:,19] == '.') & (c[:,20] != ''))) )
+    return (c[:,4] == '-') & (c[:,7] == '-') & (dateonly | timeok)
+
+def dateStringsToFloats(strs):
+    """Convert a sequence of date strings to an array of Veusz dates.
+
+    This is a vectorized version of dateStringToDate. ISO format dates
+    are converted by numpy in one go, only falling back to
+    dateStringToDate for other values.
+    """
+    strs = N.asarray(strs, dtype=N.str_).ravel()
+    out = N.empty(len(strs), dtype=N.float64)
+    if len(strs) == 0:
+        return out
+
+    isiso = _isoCandidates(strs)
+    isoidx = N.nonzero(isiso)[0]
+    if len(isoidx) > 0:
+        isostrs = strs[isoidx]
+        try:
+            with warnings.catch_warnings():
+                # stop numpy interpreting time zones
+                warnings.simplefilter('error')
+                out[isoidx] = datetime64ToFloat(
+                    isostrs.astype('datetime64[us]'))
+        except (ValueError, Warning):
+            # some value was invalid (or had a time zone), so try
+            # individually
+            for i, s in zip(isoidx, isostrs):
+                try:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('error')
+                        v = N.datetime64(s, 'us')
+                except (ValueError, Warning):
+                    out[i] = dateStringToDate(s)
+                else:
+                    out[i] = _microsecToFloat(
+                        int((v - offsetdate64).astype(N.int64)))
+
+    # slow path for anything else
+    for i in N.nonzero(~isiso)[0]:
+        out[i] = dateStringToDate(strs[i])
+
+    return out
+
 def floatUnixToVeusz(f):
     """Convert unix float to veusz float."""
     delta = datetime.datetime(1970,1,1) - offsetdate
@@ -297,3 +395,83 @@ def dateREMatchToDate(match):
 
     # return to veusz float time
     return datetimeToFloat(d)
+
+_match_type = type(re.match('', ''))
+_monthlengths = N.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+def _daysFromCivil(year, month, day):
+    """Number of days from 1970-01-01 for (arrays of) year, month, day
+    in the proleptic Gregorian calendar."""
+    year = year - (month <= 2)
+    era = year // 400
+    yoe = year - era*400
+    doy = (153*(month + N.where(month > 2, -3, 9)) + 2)//5 + day - 1
+    doe = yoe*365 + yoe//4 - yoe//100 + doy
+    return era*146097 + doe - 719468
+
+def dateREMatchesToFloats(matches):
+    """Take a sequence of match objects for the regular expression
+    returned by dateStrToRegularExpression, converting to an array of
+    float date values.
+
+    This is a vectorized version of dateREMatchToDate. Items which
+    are not matches, or which do not give a valid date, are nan.
+    """
+
+    num = len(matches)
+    valid = N.array([
+        isinstance(m, _match_type) and m.lastindex is not None
+        for m in matches], dtype=bool)
+
+    names = []
+    for m, v in zip(matches, valid):
+        if v:
+            names = sorted(m.re.groupindex)
+            break
+
+    # collect all the matched strings in one pass, then convert columns
+    if num == 0 or not names:
+        groups = N.empty((num, 0), dtype=N.object_)
+    else:
+        empty = (None,)*len(names)
+        groups = N.array(
+            [m.group(*names) if v else empty for m, v in zip(matches, valid)],
+            dtype=N.object_).reshape(num, len(names))
+
+    def getgroup(name, default, dtype=N.int64):
+        """Get array of group values, using default if missing."""
+        if name not in names:
+            return N.full(num, default, dtype=dtype)
+        col = groups[:, names.index(name)]
+        col[N.equal(col, None)] = default
+        return col.astype(dtype)
+
+    year = getgroup('YYYY', offsetdate.year)
+    if 'YY' in names:
+        yy = getgroup('YY', -1)
+        year = N.where(
+            yy < 0, year, N.where(yy >= 70, 1900+yy, 2000+yy))
+    month = getgroup('MM', offsetdate.month)
+    day = getgroup('DD', offsetdate.day)
+    hour = getgroup('hh', offsetdate.hour)
+    minute = getgroup('mm', offsetdate.minute)
+    fsec = getgroup('ss', offsetdate.second, dtype=N.float64)
+    sec = fsec.astype(N.int64)
+    microsec = (1e6*(fsec-sec)).astype(N.int64)
+
+    # check values would make a valid datetime
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    monthok = (month >= 1) & (month <= 12)
+    monthlen = _monthlengths[N.where(monthok, month-1, 0)] + (
+        leap & (month == 2))
+    valid &= ( (year >= 1) & (year <= 9999) & monthok &
+               (day >= 1) & (day <= monthlen) &
+               (hour >= 0) & (hour < 24) & (minute >= 0) & (minute < 60) &
+               (sec >= 0) & (sec < 60) )
+
+    days = _daysFromCivil(year, month, day) - _daysFromCivil(
+        offsetdate.year, offsetdate.month, offsetdate.day)
+    secs = hour*3600 + minute*60 + sec
+    out = days*(24*60*60) + (secs + microsec*1e-6)
+    out[~valid] = N.nan
+    return out
@@ -0,0 +1,219 @@
+#    Copyright (C) 2017 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+###############################################################################
+
+"""Caches of data in files, limited in total size."""
+
+from __future__ import division
+from collections import OrderedDict
+import hashlib
+import marshal
+import os
+import os.path
+import sys
+import tempfile
+import threading
+
+from .. import qtall as qt4
+
+def cacheDirectory():
+    """Return the directory for Veusz's cache files."""
+    base = qt4.QStandardPaths.writableLocation(
+        qt4.QStandardPaths.GenericCacheLocation)
+    if not base:
+        base = tempfile.gettempdir()
+    return os.path.join(base, 'veusz')
+
+def _replaceFile(src, dst):
+    """Rename file src to dst, replacing dst if it exists."""
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:
+        # os.rename does not replace files on Windows
+        if os.path.exists(dst) and sys.platform == 'win32':
+            os.unlink(dst)
+        os.rename(src, dst)
+
+def cacheKey(*parts):
+    """Make a key for the cache from the repr of parts."""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+class DiskCache(object):
+    """Cache of bytes in files in a subdirectory of the cache directory.
+
+    The least recently used files are deleted when the total size is
+    more than maxbytes. Errors reading or writing the files are
+    ignored, so the cache simply misses.
+    """
+
+    def __init__(self, name, maxbytes):
+        self.directory = os.path.join(cacheDirectory(), name)
+        self.maxbytes = maxbytes
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Return the bytes stored for key (see cacheKey) or None."""
+        filename = self._filename(key)
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+            # mark as recently used
+            os.utime(filename, None)
+        except EnvironmentError:
+            return None
+        return data
+
+    def set(self, key, data):
+        """Store bytes data for key."""
+        if len(data) > self.maxbytes:
+            return
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # write to a temporary file first, so other processes
+            # never see partial files
+            fd, tempname = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except EnvironmentError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            _replaceFile(tempname, self._filename(key))
+        except EnvironmentError:
+            try:
+                os.unlink(tempname)
+            except EnvironmentError:
+                pass
+            return
+        self.trim()
+
+    def trim(self):
+        """Delete the least recently used files until the cache is
+        within its size."""
+        try:
+            files = []
+            for name in os.listdir(self.directory):
+                filename = os.path.join(self.directory, name)
+                st = os.stat(filename)
+                files.append((st.st_mtime, st.st_size, filename))
+        except EnvironmentError:
+            return
+
+        total = sum(f[1] for f in files)
+        files.sort()
+        for mtime, size, filename in files:
+            if total <= self.maxbytes:
+                break
+            try:
+                os.unlink(filename)
+            except EnvironmentError:
+                pass
+            total -= size
+
+class MarshalCache(object):
+    """Cache of many small values in a single file in the cache
+    directory, in marshal format (so values can include code objects).
+
+    The file is read when the cache is first used, and written by
+    save() if values have been added. The least recently used values
+    are dropped to keep the file smaller than maxbytes. The marshal
+    format depends on the Python version, so this is part of the
+    filename.
+    """
+
+    def __init__(self, name, maxbytes, directory=None):
+        if directory is None:
+            directory = cacheDirectory()
+        self.filename = os.path.join(
+            directory, '%s-py%i%i.marshal' % (
+                name, sys.version_info[0], sys.version_info[1]))
+        self.maxbytes = maxbytes
+        self.lock = threading.Lock()
+        # key -> value, least recently used first (None if not read)
+        self.items = None
+        self.modified = False
+
+    def _load(self):
+        """Read the items from the file (call with lock held)."""
+        self.items = OrderedDict()
+        try:
+            with open(self.filename, 'rb') as f:
+                items = marshal.load(f)
+            # stored as a list of (key, value) to keep the order
+            for key, val in items:
+                self.items[key] = val
+        except Exception:
+            # ignore missing, old or corrupt files
+            self.items.clear()
+
+    def get(self, key, default=None):
+        """Return the value for key or default."""
+        with self.lock:
+            if self.items is None:
+                self._load()
+            try:
+                val = self.items.pop(key)
+            except KeyError:
+                return default
+            self.items[key] = val
+            return val
+
+    def set(self, key, val):
+        """Store val for key (saved by save())."""
+        with self.lock:
+            if self.items is None:
+                self._load()
+            self.items.pop(key, None)
+            self.items[key] = val
+            self.modified = True
+
+    def save(self):
+        """Write the file if values have been added."""
+        with self.lock:
+            if not self.modified:
+                return
+            self.modified = False
+            items = list(self.items.items())
+
+        try:
+            data = marshal.dumps(items)
+        except ValueError:
+            # values which cannot be marshalled
+            return
+        # drop the oldest half of the values until small enough
+        while len(data) > self.maxbytes and items:
+            items = items[len(items)//2+1:]
+            data = marshal.dumps(items)
+
+        directory = os.path.dirname(self.filename)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd, tempname = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        except EnvironmentError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            _replaceFile(tempname, self.filename)
+        except EnvironmentError:
+            try:
+                os.unlink(tempname)
+            except EnvironmentError:
+                pass
@@ -21,7 +21,9 @@ import re
 import math
 import numpy as N
 
+from ..compat import cbasestr, czip
 from . import dates
+from .utilfuncs import LRUCache
 
 _formaterror = 'FormatError'
 
@@ -178,31 +180,24 @@ def formatEngineering(num, fmtarg, locale=None):
 # catch general veusz formatting expression
 _formatRE = re.compile(r'%([-0-9.+# ]*)(VDVS|VD.|V.|[A-Za-z%])')
 
-def formatNumber(num, formatstr, locale=None):
-    """ Format a number in different ways.
+# standard C formatting codes
+_ccodes = 'diouxXeEfFgGcrs'
 
-    formatstr is a standard C format string, with some additions:
-     %Ve    scientific notation X \times 10^{Y}
-     %Vg    switches from normal notation to scientific outside 10^-2 to 10^4
-     %VE    engineering suffix option
+def _minus(text):
+    """Replace hyphen with true minus sign."""
+    return text.replace('-', u'\u2212')
 
-     %VDx   date formatting, where x is one of the arguments in
-            http://docs.python.org/lib/module-time.html in the function
-            strftime
-    """
+class _Conversion(object):
+    """A single conversion in a format string, e.g. %.3Vg."""
 
-    outitems = []
-    while formatstr:
-        # repeatedly try to do string format
-        match = _formatRE.search(formatstr)
-        if not match:
-            outitems.append(formatstr)
-            break
+    def __init__(self, farg, ftype):
+        self.farg = farg
+        self.ftype = ftype
 
-        # argument and type of formatting
-        farg, ftype = match.groups()
+    def format(self, num, locale):
+        """Format a single number."""
 
-        # special veusz formatting
+        farg, ftype = self.farg, self.ftype
         if ftype[:1] == 'V':
             # special veusz formatting
             if ftype == 'Ve':
@@ -225,22 +220,225 @@ def formatNumber(num, formatstr, locale=None):
                         out = _formaterror
             else:
                 out = _formaterror
+            return _minus(out)
 
-            # replace hyphen with true minus sign
-            out = out.replace('-', u'\u2212')
         elif ftype == '%':
-            out = '%'
-        else:
-            # standard C formatting
+            return '%'
+
+        # standard C formatting
+        if ftype not in _ccodes:
+            return _formaterror
+        try:
+            out = ('%' + farg + ftype) % num
+        except Exception:
+            return _formaterror
+        if locale is not None and ftype in 'eEfFgG':
+            out = out.replace('.', locale.decimalPoint())
+        return out
+
+    def formatList(self, vals, arr, locale, dateparts):
+        """Format list of floats vals (also given as numpy array arr)
+        more quickly than individually. dateparts is a function
+        returning the result of _dateParts(arr).
+
+        Returns None if this conversion is not handled quickly."""
+
+        farg, ftype = self.farg, self.ftype
+        dp = locale.decimalPoint() if locale is not None else '.'
+
+        if ftype in 'eEfFgG' or (ftype in 'di' and N.isfinite(arr).all()):
+            fmt = '%' + farg + ftype
             try:
-                out = localeFormat('%' + farg + ftype, (num,),
-                                   locale=locale)
-            except:
-                out = _formaterror
+                out = [fmt % v for v in vals]
+            except Exception:
+                return None
+            if dp != '.' and ftype in 'eEfFgG':
+                out = [t.replace('.', dp) for t in out]
+            return out
+
+        elif ftype == 'Vg' and not farg:
+            # choose between normal and scientific notation as
+            # formatGeneral does
+            a = N.abs(N.array(vals))
+            with N.errstate(invalid='ignore'):
+                sci = (a >= 1e4) | ((a < 1e-2) & (a > 1e-110))
+            out = [formatSciNotation(v, '') if s else '%.10g' % v
+                   for v, s in czip(vals, sci.tolist())]
+            if dp != '.':
+                out = [t.replace('.', dp) for t in out]
+            return [_minus(t) for t in out]
+
+        elif ftype[:2] == 'VD' and (ftype == 'VDVS' or ftype[2] in _datecodes):
+            parts = dateparts()
+            if parts is None:
+                return None
+            if ftype == 'VDVS':
+                return [_minus('%g' % (s+us*1e-6))
+                        for s, us in czip(parts['S'], parts['us'])]
+            fmt, code = _datecodes[ftype[2]]
+            return [fmt % v for v in parts[code]]
 
-        outitems.append(formatstr[:match.start()])
-        outitems.append(out)
-        formatstr = formatstr[match.end():]
+        elif ftype == '%':
+            return ['%']*len(vals)
+
+        return None
+
+# strftime codes which can be formatted quickly, giving the format
+# and date part to use
+_datecodes = {
+    'Y': ('%i', 'Y'),
+    'y': ('%02i', 'y'),
+    'm': ('%02i', 'm'),
+    'd': ('%02i', 'd'),
+    'j': ('%03i', 'j'),
+    'H': ('%02i', 'H'),
+    'M': ('%02i', 'M'),
+    'S': ('%02i', 'S'),
+}
+
+def _dateParts(arr):
+    """Split array of dates (as for floatToDateTime) into dict of
+    lists of parts (year, month, etc, named as strftime codes).
+    Returns None if the dates cannot be handled."""
+
+    if not N.isfinite(arr).all():
+        return None
+
+    # split into days, seconds and microseconds as floatToDateTime
+    days = N.trunc(arr/24/60/60)
+    rem = arr - days*24*60*60
+    sec = N.trunc(rem)
+    usec = N.round((rem-sec)*1e6)
+    total = (days*(24*60*60*1000000) + sec*1000000 + usec)
+    if N.abs(total).max() > 2.5e17:
+        return None
+    dt = N.datetime64(dates.offsetdate, 'us') + total.astype(
+        N.int64).astype('timedelta64[us]')
+
+    years = dt.astype('M8[Y]').astype(N.int64) + 1970
+    # short years are formatted differently by strftime
+    if years.min() < 1000 or years.max() > 9999:
+        return None
+    months = dt.astype('M8[M]')
+    day = dt.astype('M8[D]')
+    daypart = (dt - day).astype(N.int64)
+    return {
+        'Y': years.tolist(),
+        'y': (years % 100).tolist(),
+        'm': (months.astype(N.int64) % 12 + 1).tolist(),
+        'd': ((day - months).astype(N.int64) + 1).tolist(),
+        'j': ((day - dt.astype('M8[Y]')).astype(N.int64) + 1).tolist(),
+        'H': (daypart // 3600000000).tolist(),
+        'M': (daypart // 60000000 % 60).tolist(),
+        'S': (daypart // 1000000 % 60).tolist(),
+        'us': (daypart % 1000000).tolist(),
+        }
+
+class NumberFormatter(object):
+    """A format string (see formatNumber) parsed once, to format many
+    numbers quickly. Use getFormatter to get a cached formatter."""
+
+    def __init__(self, formatstr):
+        self.formatstr = formatstr
+
+        # list of literal text and _Conversion objects
+        self.parts = []
+        while formatstr:
+            match = _formatRE.search(formatstr)
+            if not match:
+                self.parts.append(formatstr)
+                break
+            if match.start() > 0:
+                self.parts.append(formatstr[:match.start()])
+            self.parts.append(_Conversion(*match.groups()))
+            formatstr = formatstr[match.end():]
+
+    def format(self, num, locale=None):
+        """Format a single number."""
+
+        # a memo of recent results, except for zero, as 0. and -0.
+        # are equal but formatted differently
+        if num != 0:
+            key = (self.formatstr, num, type(num),
+                   locale.decimalPoint() if locale is not None else None)
+            try:
+                out = _formatmemo.get(key)
+            except TypeError:
+                # unhashable
+                key = out = None
+            if out is not None:
+                return out
+
+        out = ''.join([
+            p if isinstance(p, cbasestr) else p.format(num, locale)
+            for p in self.parts])
+
+        if num != 0 and key is not None:
+            _formatmemo[key] = out
+        return out
+
+    def formatArray(self, values, locale=None):
+        """Format a sequence of numbers, returning a list of text."""
+
+        arr = N.asarray(values)
+        if arr.ndim != 1 or arr.dtype.kind != 'f':
+            return [self.format(v, locale=locale) for v in values]
+
+        vals = arr.tolist()
+        dateparts = []
+        def getdateparts():
+            if not dateparts:
+                dateparts.append(_dateParts(arr))
+            return dateparts[0]
+
+        columns = []
+        for p in self.parts:
+            if isinstance(p, cbasestr):
+                columns.append(None)
+                continue
+            col = p.formatList(vals, arr, locale, getdateparts)
+            if col is None:
+                # not handled quickly, so format separately
+                return [self.format(v, locale=locale) for v in values]
+            columns.append(col)
+
+        if len(self.parts) == 1 and columns[0] is not None:
+            return columns[0]
+        columns = [[p]*len(vals) if c is None else c
+                   for p, c in czip(self.parts, columns)]
+        return [''.join(items) for items in czip(*columns)]
+
+# cache of parsed formats
+_formattercache = LRUCache(256)
+# memo of recent formatted numbers
+_formatmemo = LRUCache(4096)
+
+def getFormatter(formatstr):
+    """Get a NumberFormatter for formatstr, reusing an earlier one if
+    possible."""
+    formatter = _formattercache.get(formatstr)
+    if formatter is None:
+        formatter = _formattercache[formatstr] = NumberFormatter(formatstr)
+    return formatter
 
-    return ''.join(outitems)
+def formatNumber(num, formatstr, locale=None):
+    """ Format a number in different ways.
 
+    formatstr is a standard C format string, with some additions:
+     %Ve    scientific notation X \times 10^{Y}
+     %Vg    switches from normal notation to scientific outside 10^-2 to 10^4
+     %VE    engineering suffix option
+
+     %VDx   date formatting, where x is one of the arguments in
+            http://docs.python.org/lib/module-time.html in the function
+            strftime
+    """
+    return getFormatter(formatstr).format(num, locale=locale)
+
+def formatArray(values, formatstr, locale=None):
+    """Format a sequence of numbers with formatstr (see formatNumber),
+    returning a list of text.
+
+    This is much quicker than calling formatNumber for each number.
+    """
+    return getFormatter(formatstr).formatArray(values, locale=locale)
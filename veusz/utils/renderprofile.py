@@ -0,0 +1,239 @@
+#    Copyright (C) 2016 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+###############################################################################
+
+"""Optional profiling of the time spent drawing each widget.
+
+Drawing code marks phases of its work with profilePhase, e.g.
+
+ with utils.profilePhase(self, 'autorange'):
+     ...
+
+which costs almost nothing unless a RenderProfile is recording:
+
+ with utils.RenderProfile() as prof:
+     doc.paintTo(helper, 0)
+ print(prof.report())
+"""
+
+from __future__ import division, print_function
+import threading
+import time
+from collections import defaultdict
+
+from ..compat import citems
+
+# phases of drawing which are timed, with descriptions
+phases = (
+    ('draw', 'Drawing (other)'),
+    ('data', 'Data and expressions'),
+    ('autorange', 'Autorange'),
+    ('coords', 'Coordinate conversion'),
+    ('paint', 'Painting'),
+    ('text', 'Text layout'),
+)
+
+# profile being recorded, or None
+active = None
+
+class _NullPhase(object):
+    """Phase used when not profiling."""
+    def __enter__(self):
+        pass
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+_nullphase = _NullPhase()
+
+class _Phase(object):
+    """Context manager for timing a phase."""
+    def __init__(self, profile, widget, phase):
+        self.profile = profile
+        self.widget = widget
+        self.phase = phase
+    def __enter__(self):
+        self.profile.begin(self.widget, self.phase)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.end()
+
+def profilePhase(widget, phase):
+    """Return a context manager timing phase of drawing widget, if
+    profiling. If widget is None, the time is given to the widget of
+    the enclosing phase."""
+    if active is None:
+        return _nullphase
+    return _Phase(active, widget, phase)
+
+def profileCache(name, hit):
+    """Record a hit (hit=True) or miss of the cache with name."""
+    if active is not None:
+        active.cacheAccess(name, hit)
+
+class RenderProfile(object):
+    """Record the time spent in each phase of drawing each widget,
+    the number of items they draw and the hits and misses of caches.
+
+    Use as a context manager, or call start() and stop(), to record
+    drawing done in between. The time of a phase excludes the time
+    spent in phases inside it.
+    """
+
+    def __init__(self):
+        # (widget, phase) -> [time, calls]
+        self.times = defaultdict(lambda: [0., 0])
+        # widget -> number of items drawn
+        self.items = defaultdict(int)
+        # cache name -> [hits, misses]
+        self.caches = defaultdict(lambda: [0, 0])
+        self.totaltime = 0.
+
+        self.lock = threading.Lock()
+        # stack of phases for each thread
+        self.local = threading.local()
+        self.previous = None
+        self.starttime = None
+
+    def start(self):
+        """Start recording."""
+        global active
+        self.previous = active
+        active = self
+        self.starttime = time.time()
+
+    def stop(self):
+        """Stop recording."""
+        global active
+        active = self.previous
+        self.previous = None
+        self.totaltime += time.time() - self.starttime
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _stack(self):
+        try:
+            return self.local.stack
+        except AttributeError:
+            stack = self.local.stack = []
+            return stack
+
+    def begin(self, widget, phase):
+        """Start timing phase for widget (None for the widget of the
+        enclosing phase)."""
+        stack = self._stack()
+        if widget is None and stack:
+            widget = stack[-1][0]
+        # widget, phase, start time, time in inner phases
+        stack.append([widget, phase, time.time(), 0.])
+
+    def end(self):
+        """Finish timing the last phase started."""
+        stack = self._stack()
+        widget, phase, start, inner = stack.pop()
+        delta = time.time() - start
+        if stack:
+            stack[-1][3] += delta
+        with self.lock:
+            entry = self.times[(widget, phase)]
+            entry[0] += delta - inner
+            entry[1] += 1
+
+    def cacheAccess(self, name, hit):
+        """Record a hit or miss of the cache name."""
+        with self.lock:
+            self.caches[name][0 if hit else 1] += 1
+
+    def addItems(self, widget, count):
+        """Record count items drawn by widget."""
+        with self.lock:
+            self.items[widget] += count
+
+    def widgetResults(self):
+        """Return dict of widget paths to dicts of phase names to
+        times, with 'total', 'calls' and 'items' entries."""
+
+        out = {}
+        def getentry(widget):
+            path = widget.path if widget is not None else '(none)'
+            if path not in out:
+                out[path] = dict(
+                    [(p, 0.) for p, descr in phases] +
+                    [('total', 0.), ('calls', 0), ('items', 0)])
+            return out[path]
+
+        for (widget, phase), (t, calls) in citems(self.times):
+            entry = getentry(widget)
+            entry[phase] += t
+            entry['total'] += t
+            if phase == 'draw':
+                entry['calls'] += calls
+        for widget, count in citems(self.items):
+            getentry(widget)['items'] += count
+        return out
+
+    def cacheResults(self):
+        """Return dict of cache names to (hits, misses, hit rate)."""
+        out = {}
+        for name, (hits, misses) in citems(self.caches):
+            rate = hits / (hits+misses) if hits+misses else 0.
+            out[name] = (hits, misses, rate)
+        return out
+
+    def results(self):
+        """Return dict of the results, with keys 'widgets', 'caches'
+        and 'total' (the time spent recording)."""
+        return {
+            'widgets': self.widgetResults(),
+            'caches': self.cacheResults(),
+            'total': self.totaltime,
+        }
+
+    def report(self, maxwidgets=None):
+        """Return the results as a text table, slowest widgets first."""
+
+        widgets = self.widgetResults()
+        paths = sorted(widgets, key=lambda p: -widgets[p]['total'])
+        if maxwidgets is not None:
+            paths = paths[:maxwidgets]
+
+        pathwidth = max([len(p) for p in paths] + [6])
+        cols = ['total'] + [p for p, descr in phases]
+        lines = [
+            ' '.join(['%-*s' % (pathwidth, 'Widget')] +
+                     ['%9s' % c for c in cols] + ['%8s' % 'items'])
+            ]
+        for path in paths:
+            entry = widgets[path]
+            lines.append(' '.join(
+                ['%-*s' % (pathwidth, path)] +
+                ['%9.4f' % entry[c] for c in cols] +
+                ['%8i' % entry['items']]))
+
+        caches = self.cacheResults()
+        if caches:
+            lines.append('')
+            lines.append('%-24s %9s %9s %9s' % (
+                'Cache', 'hits', 'misses', 'rate'))
+            for name in sorted(caches):
+                hits, misses, rate = caches[name]
+                lines.append('%-24s %9i %9i %8.1f%%' % (
+                    name, hits, misses, rate*100))
+        return '\n'.join(lines)
@@ -186,11 +186,12 @@ class CheckNodeVisitor(ast.NodeVisitor):
         self.generic_visit(attr)
 
 def compileChecked(code, mode='eval', filename='<string>',
-                   ignoresecurity=False):
+                   ignoresecurity=False, transformer=None):
     """Compile code, checking for security errors.
 
     Returns a compiled code object.
     mode = 'exec' or 'eval'
+    transformer: optional ast.NodeTransformer applied to the checked tree
     """
 
     try:
@@ -205,6 +206,9 @@ def compileChecked(code, mode='eval', filename='<string>',
         visitor = CheckNodeVisitor()
         visitor.visit(tree)
 
+    if transformer is not None:
+        tree = ast.fix_missing_locations(transformer.visit(tree))
+
     compiled = compile(tree, filename, mode)
 
     return compiled
@@ -25,9 +25,11 @@ import re
 
 import numpy as N
 
-from ..compat import cbasestr, cstr
+from ..compat import cbasestr, cstr, citems, crange, czip
 from .. import qtall as qt4
 from . import points
+from .utilfuncs import LRUCache
+from .renderprofile import profilePhase, profileCache
 
 mmlsupport = True
 try:
@@ -1188,7 +1190,8 @@ class _Renderer:
         self.y = self.yi = y
         self.calcbounds = None
 
-        self._initText(text)
+        with profilePhase(None, 'text'):
+            self._initText(text)
 
     def _initText(self, text):
         """Override this to set up renderer with text."""
@@ -1315,6 +1318,10 @@ class _Renderer:
         self.calcbounds = [xr[0], yr[0], xr[1], yr[1]]
         return self.calcbounds
 
+# cache of parsed part trees and their measured extents for
+# _StdRenderer, keyed on the text, font and output device
+_layoutcache = LRUCache(4096)
+
 class _StdRenderer(_Renderer):
     """Standard rendering class."""
 
@@ -1324,15 +1331,31 @@ class _StdRenderer(_Renderer):
     def _initText(self, text):
 
         # expand any expressions in the text
-        delta = 0
-        for m in self.exprexpansion.finditer(text):
-            expanded = self._expandExpr(m.group(1))
-            text = text[:delta+m.start()] + expanded + text[delta+m.end():]
-            delta += len(expanded) - (m.end()-m.start())
-
-        # make internal tree
-        partlist = makePartList(text)
-        self.parttree = makePartTree(partlist)
+        if '%{{' in text:
+            delta = 0
+            for m in self.exprexpansion.finditer(text):
+                expanded = self._expandExpr(m.group(1))
+                text = text[:delta+m.start()] + expanded + text[delta+m.end():]
+                delta += len(expanded) - (m.end()-m.start())
+
+        # The part tree records line widths when it is measured, so
+        # trees are only shared between renderers with the same font
+        # and device. Each entry is [parttree, extents or None].
+        dev = self.painter.device()
+        self.layoutkey = (
+            text, self.font.key(), FontMetrics,
+            type(dev), dev.logicalDpiX(), dev.logicalDpiY(),
+            getattr(self.painter, 'pixperpt', 1.),
+            getattr(self.painter, 'scaling', 1.) )
+        self.layout = _layoutcache.get(self.layoutkey)
+        profileCache('text layouts', self.layout is not None)
+
+        if self.layout is None:
+            # make internal tree
+            partlist = makePartList(text)
+            self.layout = [makePartTree(partlist), None]
+            _layoutcache[self.layoutkey] = self.layout
+        self.parttree = self.layout[0]
 
     def _expandExpr(self, expr):
         """Expand expression."""
@@ -1349,41 +1372,52 @@ class _StdRenderer(_Renderer):
             except Exception as e:
                 return _("* Evaluation error: %s *") % latexEscape(cstr(e))
 
-    def _getWidthHeight(self):
-        """Get size of box around text."""
-
-        # work out total width and height
-        self.painter.setFont(self.font)
+    def _measure(self):
+        """Measure part tree, returning extents.
 
-        # work out height of box, and
-        # make the bounding box a bit bigger if we want to include descents
+        Returns (width, maxlines, ascent, descent, height, charheight)
+        """
 
+        self.painter.setFont(self.font)
         state = RenderState(
             self.font, self.painter, 0, 0,
             self.alignhorz,
             actually_render = False)
-
         fm = state.fontMetrics()
 
+        # work out width
+        self.parttree.render(state)
+
+        return ( state.x, state.maxlines, fm.ascent(), fm.descent(),
+                 fm.height(), fm.boundingRectChar('0').height() )
+
+    def _getWidthHeight(self):
+        """Get size of box around text."""
+
+        if self.layout[1] is None:
+            with profilePhase(None, 'text'):
+                self.layout[1] = self._measure()
+        (totalwidth, maxlines, ascent, descent,
+         height, charheight) = self.layout[1]
+
+        # work out height of box, and
+        # make the bounding box a bit bigger if we want to include descents
         if self.usefullheight:
-            totalheight = fm.ascent()
-            dy = fm.descent()
+            totalheight = ascent
+            dy = descent
         else:
             if self.alignvert == 0:
                 # if want vertical centering, better to centre around middle
                 # of typical letter (i.e. where strike position is)
                 #totalheight = fm.strikeOutPos()*2
-                totalheight = fm.boundingRectChar('0').height()
+                totalheight = charheight
             else:
                 # if top/bottom alignment, better to use maximum letter height
-                totalheight = fm.ascent()
+                totalheight = ascent
             dy = 0
 
-        # work out width
-        self.parttree.render(state)
-        totalwidth = state.x
         # add number of lines for height
-        totalheight += fm.height()*(state.maxlines-1)
+        totalheight += height*(maxlines-1)
 
         return totalwidth, totalheight, dy
 
@@ -1542,3 +1576,184 @@ def Renderer(painter, font, x, y, text,
         angle=angle, usefullheight=usefullheight,
         doc=doc
         )
+
+# characters which mean text is not drawn as it is
+_markup_re = re.compile(r'[\\{}^_\n]')
+
+def _alignOffsets(widths, heights, alignhorz, alignvert, angle):
+    """Position text boxes as _Renderer.getBounds does, for arrays of
+    widths and heights.
+
+    Returns (xi, yi, bounds), where xi and yi are the offsets of the
+    start of the text from its position and bounds is an array of
+    rows (minx, miny, maxx, maxy) relative to the position.
+    """
+
+    tw = widths[:,None] / 2
+    th = heights[:,None] / 2
+    coordx = N.hstack([-tw, tw, tw, -tw])
+    coordy = N.hstack([th, th, -th, -th])
+
+    theta = -angle * (math.pi / 180.)
+    c = math.cos(theta)
+    s = math.sin(theta)
+    newx = coordx*c + coordy*s
+    newy = coordy*c - coordx*s
+    minx, maxx = newx.min(axis=1), newx.max(axis=1)
+    miny, maxy = newy.min(axis=1), newy.max(axis=1)
+
+    if alignhorz < 0:
+        xr = (0*minx, maxx-minx)
+        xi = newx[:,0] - minx
+    elif alignhorz > 0:
+        xr = (minx-maxx, 0*minx)
+        xi = newx[:,0] - maxx
+    else:
+        xr = (minx, maxx)
+        xi = newx[:,0]
+
+    if alignvert < 0:
+        yr = (miny-maxy, 0*miny)
+        yi = newy[:,0] - maxy
+    elif alignvert > 0:
+        yr = (0*miny, maxy-miny)
+        yi = newy[:,0] - miny
+    else:
+        yr = (miny, maxy)
+        yi = newy[:,0]
+
+    return xi, yi, N.column_stack((xr[0], yr[0], xr[1], yr[1]))
+
+def _nonOverlapping(bounds, maxcells=4000000):
+    """Return indices of boxes (rows of minx, miny, maxx, maxy) which
+    do not overlap earlier boxes chosen.
+
+    Boxes are marked on a grid of cells, so boxes closer than a cell
+    may also be counted as overlapping.
+    """
+
+    if len(bounds) == 0:
+        return N.array([], dtype=N.intp)
+
+    minx, miny = bounds[:,0].min(), bounds[:,1].min()
+    extentx = bounds[:,2].max() - minx
+    extenty = bounds[:,3].max() - miny
+
+    # cells are a fraction of a typical label
+    cell = max(0.25*N.median(bounds[:,3]-bounds[:,1]), 1e-3)
+    cell = max(cell, math.sqrt(extentx*extenty/maxcells))
+    gx0 = ((bounds[:,0]-minx) / cell).astype(N.intp)
+    gy0 = ((bounds[:,1]-miny) / cell).astype(N.intp)
+    gx1 = ((bounds[:,2]-minx) / cell).astype(N.intp) + 1
+    gy1 = ((bounds[:,3]-miny) / cell).astype(N.intp) + 1
+
+    occupied = N.zeros((gy1.max(), gx1.max()), dtype=N.bool_)
+    keep = []
+    for i, (x0, y0, x1, y1) in enumerate(czip(gx0, gy0, gx1, gy1)):
+        block = occupied[y0:y1, x0:x1]
+        if not block.any():
+            block[...] = True
+            keep.append(i)
+    return N.array(keep, dtype=N.intp)
+
+def renderLabels(painter, font, xs, ys, texts,
+                 alignhorz=-1, alignvert=-1, angle=0,
+                 clip=None, avoidoverlap=False, doc=None):
+    """Draw many text labels quickly, returning the number drawn.
+
+    xs and ys are arrays of the positions of the labels in texts,
+    which are aligned and rotated as for Renderer. Each different text
+    is only laid out once, and text without any markup is measured and
+    drawn directly. Labels entirely outside the QRectF clip are not
+    drawn. If avoidoverlap is set, labels which would overlap a label
+    already drawn are skipped.
+    """
+
+    num = min(len(xs), len(ys), len(texts))
+    xs = N.asarray(xs, dtype=N.float64)[:num]
+    ys = N.asarray(ys, dtype=N.float64)[:num]
+
+    with profilePhase(None, 'text'):
+        # index of each label into list of different texts
+        index = {}
+        idxs = N.empty(num, dtype=N.intp)
+        for i in crange(num):
+            idxs[i] = index.setdefault(texts[i], len(index))
+        unique = [None]*len(index)
+        for text, i in citems(index):
+            unique[i] = text
+
+        # plain text is measured here, other text by a Renderer
+        fm = FontMetrics(font, painter.device())
+        plain = N.array([not _markup_re.search(t) and not mml_re.match(t)
+                         for t in unique], dtype=N.bool_)
+
+        todraw = N.nonzero(N.isfinite(xs) & N.isfinite(ys))[0]
+        if clip is not None:
+            # plain labels further from the clip than their maximum
+            # possible size (from the widest character used) are
+            # dropped before measuring them
+            chars = set(''.join([t for t, p in czip(unique, plain) if p]))
+            charwidth = max([fm.width(PartText(c).text) for c in chars]+[0])
+            maxsize = N.where(
+                plain,
+                N.array([len(t) for t in unique])*charwidth+fm.height(),
+                N.inf)[idxs[todraw]]
+            x, y = xs[todraw], ys[todraw]
+            todraw = todraw[
+                (x >= clip.left()-maxsize) & (x <= clip.right()+maxsize) &
+                (y >= clip.top()-maxsize) & (y <= clip.bottom()+maxsize) ]
+
+        # lay out the texts which could be drawn
+        needed = N.zeros(len(unique), dtype=N.bool_)
+        needed[idxs[todraw]] = True
+        height = fm.boundingRectChar('0').height() if alignvert == 0 \
+                 else fm.ascent()
+        widths = N.zeros(len(unique))
+        parts = {}
+        for i in N.nonzero(needed & plain)[0]:
+            part = parts[i] = PartText(unique[i])
+            widths[i] = fm.width(part.text)
+        xi, yi, bounds = _alignOffsets(
+            widths, N.full(len(unique), height), alignhorz, alignvert,
+            angle)
+        renderers = {}
+        for i in N.nonzero(needed & ~plain)[0]:
+            r = renderers[i] = Renderer(
+                painter, font, 0, 0, unique[i], alignhorz, alignvert, angle,
+                doc=doc)
+            bounds[i] = r.getBounds()
+            xi[i], yi[i] = r.xi, r.yi
+
+        # drop labels which are not visible
+        lbounds = bounds[idxs[todraw]] + N.column_stack(
+            (xs[todraw], ys[todraw], xs[todraw], ys[todraw]))
+        if clip is not None:
+            visible = ( (lbounds[:,2] >= clip.left()) &
+                        (lbounds[:,0] <= clip.right()) &
+                        (lbounds[:,3] >= clip.top()) &
+                        (lbounds[:,1] <= clip.bottom()) )
+            todraw, lbounds = todraw[visible], lbounds[visible]
+        if avoidoverlap:
+            todraw = todraw[_nonOverlapping(lbounds)]
+
+        painter.setFont(font)
+        for i in todraw:
+            t = idxs[i]
+            x = xs[i] + xi[t]
+            y = ys[i] + yi[t]
+            if t in renderers:
+                r = renderers[t]
+                r.xi, r.yi = x, y
+                r.render()
+                painter.setFont(font)
+            elif angle == 0:
+                painter.drawText(qt4.QPointF(x, y), parts[t].text)
+            else:
+                painter.save()
+                painter.translate(qt4.QPointF(x, y))
+                painter.rotate(angle)
+                painter.drawText(qt4.QPointF(0, 0), parts[t].text)
+                painter.restore()
+
+    return len(todraw)
@@ -30,7 +30,7 @@ import codecs
 import io
 import csv
 import time
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 from ..compat import citems, cstr, CStringIO, cbasestr, cpy3, cbytes, crepr, \
     crange
@@ -293,6 +293,102 @@ class NonBlockingReaderThread(threading.Thread):
                 self.data += data
                 self.lock.release()
 
+def defaultNumThreads():
+    """Number of threads to use for parallel calculations."""
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+def parallelMap(func, items, numthreads=None, callback=None):
+    """Call func(item) for each item, using a pool of threads.
+
+    Returns a list of the results in the order of items. If callback
+    is set, callback(index, result) is called (in the worker thread)
+    as each result is completed. If func raises an exception, the
+    first exception is re-raised here after the threads finish.
+
+    This is only faster if func releases the GIL for most of its
+    work (e.g. in C code or large numpy operations).
+    """
+
+    items = list(items)
+    if numthreads is None:
+        numthreads = defaultNumThreads()
+    numthreads = max(1, min(numthreads, len(items)))
+
+    results = [None]*len(items)
+    errors = []
+    lock = threading.Lock()
+    nextitem = [0]
+
+    def worker():
+        while True:
+            with lock:
+                idx = nextitem[0]
+                if idx >= len(items) or errors:
+                    return
+                nextitem[0] += 1
+            try:
+                results[idx] = func(items[idx])
+                if callback is not None:
+                    callback(idx, results[idx])
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+
+    if numthreads == 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for i in range(numthreads)]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+class LRUCache(object):
+    """A dict-like cache holding at most maxsize items, discarding the
+    least recently used items first. Access is thread safe."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return item for key (marking it as recently used) or default."""
+        with self.lock:
+            try:
+                val = self.data.pop(key)
+            except KeyError:
+                return default
+            self.data[key] = val
+            return val
+
+    def __setitem__(self, key, val):
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = val
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        """Remove all items."""
+        with self.lock:
+            self.data.clear()
+
 # standard python encodings
 encodings = [
     'ascii', 'big5hkscs', 'big5', 'charmap', 'cp037', 'cp424',
@@ -594,3 +690,19 @@ def findOnPath(cmd):
         if os.path.isfile(cmdtry) and os.access(cmdtry, os.X_OK):
             return cmdtry
     return None
+
+def moduleAvailable(name):
+    """Is the top level module name installed?
+
+    This does not import the module, which can be slow."""
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        # python 2
+        import imp
+        try:
+            imp.find_module(name)
+        except ImportError:
+            return False
+        return True
+    return find_spec(name) is not None
@@ -25,13 +25,40 @@ Results are written to stdout
 All commands in CommandInterface are supported, plus further commands:
 Quit: exit the listening program
 Zoom x: Change the zoom factor of the plot to x
+
+With the binary option (veusz --listen --binary), commands and replies
+are instead sent as messages, so that arrays can be sent without
+converting them to text. Each message (in either direction) is
+
+ uint32 (little endian): length of header in bytes
+ uint64 (little endian): length of data in bytes
+ header: JSON object, encoded as UTF-8
+ data: the contents of the arrays given in the header, in order
+
+A command message has a header like
+
+ {"id": 1, "cmd": "SetData", "args": ["x", {"array": 0}], "kwargs": {},
+  "arrays": [{"dtype": "<f8", "shape": [1000]}]}
+
+where {"array": n} in the arguments is replaced by array n. "id" is
+optional. If it is given, a reply is sent when the command has been
+run, with the same id and either "result" (with any arrays described
+in "arrays") or "error". Several commands can be sent in one message
+as a list in "batch" (sharing "arrays"), which are run without
+updating the document in between. The result of a batch is the list
+of the results of its commands.
 """
 
 from __future__ import division
+import json
+import struct
 import sys
+import traceback
+
+import numpy as N
 
 from . import qtall as qt4
-from .compat import cstr
+from .compat import cstr, cexceptionuser
 
 from .windows.simplewindow import SimpleWindow
 from . import document
@@ -53,12 +80,103 @@ class ReadingThread(qt4.QThread):
                 break
             self.newline.emit(line)
 
+# header length, data length of binary messages
+_messagestruct = struct.Struct('<IQ')
+
+def _readExactly(stream, size):
+    """Read size bytes from stream into a bytearray."""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        num = stream.readinto(view[pos:])
+        if not num:
+            raise EOFError()
+        pos += num
+    return buf
+
+def _decodeArrays(descriptions, data):
+    """Make arrays from the descriptions in a message header and the
+    message data. The arrays use the data without copying."""
+    arrays = []
+    offset = 0
+    for descr in descriptions:
+        dtype = N.dtype(str(descr['dtype']))
+        shape = tuple(descr['shape'])
+        count = 1
+        for dim in shape:
+            count *= dim
+        if dtype.hasobject or offset + count*dtype.itemsize > len(data):
+            raise ValueError('Invalid array in message')
+        if count == 0:
+            array = N.zeros(shape, dtype=dtype)
+        else:
+            array = N.frombuffer(
+                data, dtype=dtype, count=count, offset=offset).reshape(shape)
+        arrays.append(array)
+        offset += count*dtype.itemsize
+    if offset != len(data):
+        raise ValueError('Message data does not match its arrays')
+    return arrays
+
+def _insertArrays(val, arrays):
+    """Replace {"array": n} in val by array n."""
+    if isinstance(val, dict):
+        if len(val) == 1 and 'array' in val:
+            return arrays[val['array']]
+        return dict( (k, _insertArrays(v, arrays)) for k, v in val.items() )
+    elif isinstance(val, list):
+        return [_insertArrays(v, arrays) for v in val]
+    return val
+
+def _extractArrays(val, arrays):
+    """Convert val so it can be written as JSON, moving numerical
+    arrays to the list arrays and replacing them by {"array": n}."""
+    if isinstance(val, N.ndarray):
+        if val.dtype.kind in 'biufcmM':
+            arrays.append(N.ascontiguousarray(val))
+            return {'array': len(arrays)-1}
+        return [_extractArrays(v, arrays) for v in val.tolist()]
+    elif isinstance(val, (list, tuple)):
+        return [_extractArrays(v, arrays) for v in val]
+    elif isinstance(val, dict):
+        return dict(
+            (cstr(k), _extractArrays(v, arrays)) for k, v in val.items() )
+    elif isinstance(val, N.generic):
+        return val.item()
+    return val
+
+class BinaryReadingThread(qt4.QThread):
+    """Stdin reading thread for binary messages. Emits newmessage
+    signals with (header, data) for each message."""
+
+    newmessage = qt4.pyqtSignal(object)
+
+    def __init__(self, parent, stream):
+        qt4.QThread.__init__(self, parent)
+        self.stream = stream
+
+    def run(self):
+        """Emit messages read from stdin."""
+        while True:
+            try:
+                hdrlen, datalen = _messagestruct.unpack(
+                    bytes(_readExactly(self.stream, _messagestruct.size)))
+                header = _readExactly(self.stream, hdrlen)
+                data = _readExactly(self.stream, datalen)
+            except EOFError:
+                break
+            self.newmessage.emit((header, data))
+
 class InputListener(qt4.QObject):
     """Class reads text from stdin, in order to send commands to a document."""
 
-    def __init__(self, window):
+    def __init__(self, window, streams=None):
         """Initialse the listening object to send commands to the
-        document given by window."""
+        document given by window.
+
+        streams is (input, output) binary streams to use for binary
+        messages, or None to read text from stdin."""
         
         qt4.QObject.__init__(self)
 
@@ -78,8 +196,13 @@ class InputListener(qt4.QObject):
         self.ci.addCommand('MoveToPage', self.moveToPage)
 
         # reading is done in a separate thread so as not to block
-        self.readthread = ReadingThread(self)
-        self.readthread.newline.connect(self.processLine)
+        if streams is not None:
+            inp, self.out = streams
+            self.readthread = BinaryReadingThread(self, inp)
+            self.readthread.newmessage.connect(self.processMessage)
+        else:
+            self.readthread = ReadingThread(self)
+            self.readthread.newline.connect(self.processLine)
         self.readthread.start()
 
     def resizeWindow(self, width, height):
@@ -131,9 +254,60 @@ class InputListener(qt4.QObject):
         else:
             self.ci.run(line)
 
-def openWindow(args, quiet=False):
+    def writeMessage(self, header, arrays=()):
+        """Write binary message with header and arrays to stdout."""
+        hdr = json.dumps(header, default=cstr).encode('utf-8')
+        self.out.write(_messagestruct.pack(
+            len(hdr), sum(a.nbytes for a in arrays)))
+        self.out.write(hdr)
+        for a in arrays:
+            self.out.write(a.data)
+        self.out.flush()
+
+    def runCommand(self, command, arrays):
+        """Run command from the header of a binary message."""
+        name = command['cmd']
+        if name not in self.ci.cmds:
+            raise ValueError('Unknown command %s' % name)
+        args = _insertArrays(command.get('args', []), arrays)
+        kwargs = _insertArrays(command.get('kwargs', {}), arrays)
+        kwargs = dict( (str(k), v) for k, v in kwargs.items() )
+        return self.ci.cmds[name](*args, **kwargs)
+
+    def processMessage(self, message):
+        """Process binary message, replying if it has an id."""
+        header, data = message
+        reqid = None
+        try:
+            header = json.loads(bytes(header).decode('utf-8'))
+            reqid = header.get('id')
+            arrays = _decodeArrays(header.get('arrays', []), data)
+
+            # do not update the document until all the commands are run
+            with self.document.suspend():
+                if 'batch' in header:
+                    result = [self.runCommand(c, arrays)
+                              for c in header['batch']]
+                else:
+                    result = self.runCommand(header, arrays)
+        except Exception as e:
+            traceback.print_exc()
+            if reqid is not None:
+                self.writeMessage({'id': reqid, 'error': cexceptionuser(e)})
+        else:
+            if reqid is not None:
+                outarrays = []
+                result = _extractArrays(result, outarrays)
+                self.writeMessage(
+                    {'id': reqid, 'result': result,
+                     'arrays': [{'dtype': a.dtype.str, 'shape': list(a.shape)}
+                                for a in outarrays]},
+                    outarrays)
+
+def openWindow(args, quiet=False, streams=None):
     '''Opening listening window.
     args is a list of arguments to the program
+    streams is (input, output) binary streams for binary messages
     '''
     global _win
     global _listen
@@ -146,7 +320,7 @@ def openWindow(args, quiet=False):
     _win = SimpleWindow(name)
     if not quiet:
         _win.show()
-    _listen = InputListener(_win)
+    _listen = InputListener(_win, streams=streams)
 
 def run():
     '''Actually run the program.'''
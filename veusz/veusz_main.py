@@ -22,6 +22,7 @@
 
 from __future__ import division
 import sys
+import os
 import os.path
 import signal
 import optparse
@@ -91,20 +92,52 @@ def excepthook(excepttype, exceptvalue, tracebackobj):
         d = ExceptionDialog((excepttype, exceptvalue, tracebackobj), None)
         d.exec_()
 
-def listen(args, quiet):
+def binaryStreams():
+    """Get binary stdin and stdout for --listen --binary.
+
+    Other output written to stdout is sent to stderr instead, so that
+    it does not get mixed up with the messages."""
+    out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    if sys.platform == 'win32':
+        import msvcrt
+        msvcrt.setmode(sys.stdin.fileno(), os.O_BINARY)
+        msvcrt.setmode(out.fileno(), os.O_BINARY)
+    inp = getattr(sys.stdin, 'buffer', sys.stdin)
+    return inp, out
+
+def listen(args, quiet, streams):
     '''For running with --listen option.'''
     from veusz.veusz_listen import openWindow
-    openWindow(args, quiet=quiet)
+    openWindow(args, quiet=quiet, streams=streams)
 
-def export(exports, args):
-    '''A shortcut to load a set of files and export them.'''
+def export(exports, args, profile=False):
+    '''A shortcut to load a set of files and export them.
+
+    If there is a single document, all the exports are made from it,
+    drawing the document once.
+
+    If profile is set, print the time spent drawing each widget and
+    updating the evaluation context.'''
     from veusz import document
     from veusz import utils
-    for expfn, vsz in czip(exports, args[1:]):
+    if len(args) == 2 and len(exports) > 1:
+        jobs = [(exports, args[1])]
+    else:
+        jobs = czip(exports, args[1:])
+    for expfn, vsz in jobs:
         doc = document.Document()
         ci = document.CommandInterpreter(doc)
         ci.Load(vsz)
-        ci.run('Export(%s)' % repr(expfn))
+        if profile:
+            with utils.RenderProfile() as prof:
+                ci.run('Export(%s)' % repr(expfn))
+            print('Render profile for %s (%.3fs):' % (vsz, prof.totaltime))
+            print(prof.report())
+            print('')
+            print(doc.evaluate.updateReport())
+        else:
+            ci.run('Export(%s)' % repr(expfn))
 
 def convertArgsUnicode(args):
     '''Convert set of arguments to unicode.
@@ -155,9 +188,17 @@ class VeuszApp(qt4.QApplication):
         parser.add_option('--quiet', action='store_true',
                           help='if in listening mode, do not open a window but'
                           ' execute commands quietly')
+        parser.add_option('--binary', action='store_true',
+                          help='if in listening mode, read commands and'
+                          ' write replies as binary messages')
         parser.add_option('--export', action='append', metavar='FILE',
                           help='export the next document to this'
-                          ' output image file, exiting when finished')
+                          ' output image file, exiting when finished'
+                          ' (if there is one document, this can be given'
+                          ' several times to write several files)')
+        parser.add_option('--profile-render', action='store_true',
+                          help='with --export, print the time spent drawing'
+                          ' each widget and updating the evaluation context')
         parser.add_option('--embed-remote', action='store_true',
                           help=optparse.SUPPRESS_HELP)
         parser.add_option('--plugin', action='append', metavar='FILE',
@@ -168,7 +209,8 @@ class VeuszApp(qt4.QApplication):
         options, args = parser.parse_args(self.arguments())
 
         # export files to make images
-        if options.export and len(options.export) != len(args)-1:
+        if ( options.export and len(options.export) != len(args)-1 and
+             len(args) != 2 ):
             parser.error(
                 'export option needs same number of documents and '
                 'output files')
@@ -177,6 +219,12 @@ class VeuszApp(qt4.QApplication):
         self.args = convertArgsUnicode(args)
         self.options = options
 
+        # binary messages are written to stdout, so this has to be
+        # done before anything else is written to it
+        self.streams = None
+        if options.listen and options.binary:
+            self.streams = binaryStreams()
+
         self.openeventfiles = []
         self.startupdone = False
         self.splash = None
@@ -237,9 +285,12 @@ class VeuszApp(qt4.QApplication):
         options = self.options
         args = self.args
 
-        from veusz.utils import vzdbus, vzsamp
-        vzdbus.setup()
-        vzsamp.setup()
+        if not options.export:
+            # not needed when exporting, and vzsamp imports the
+            # main window
+            from veusz.utils import vzdbus, vzsamp
+            vzdbus.setup()
+            vzsamp.setup()
 
         # add text if we want to display an error after startup
         startuperrors = []
@@ -278,9 +329,10 @@ class VeuszApp(qt4.QApplication):
         # different modes
         if options.listen:
             # listen to incoming commands
-            listen(args, quiet=options.quiet)
+            listen(args, quiet=options.quiet, streams=self.streams)
         elif options.export:
-            export(options.export, args)
+            export(options.export, args,
+                   profile=options.profile_render)
             self.quit()
             sys.exit(0)
         else:
@@ -306,6 +358,12 @@ def run():
         runremote()
         return
 
+    # worker process drawing pages for export
+    if len(sys.argv) == 2 and sys.argv[1] == '--export-worker':
+        from veusz.document.exportworkers import runWorker
+        runWorker()
+        return
+
     # this function is spaghetti-like and has nasty code paths.
     # the idea is to postpone the imports until the splash screen
     # is shown
@@ -634,8 +634,9 @@ class Axis(widget.Widget):
 
     def dataToPlotterCoords(self, posn, data):
         """Convert data values to plotter coordinates, scaling if necessary."""
-        self.updateAxisLocation(posn)
-        return self._graphToPlotter(data*self.settings.datascale)
+        with utils.profilePhase(None, 'coords'):
+            self.updateAxisLocation(posn)
+            return self._graphToPlotter(data*self.settings.datascale)
 
     def plotterToGraphCoords(self, bounds, vals):
         """Convert plotter coordinates on this axis to graph coordinates.
@@ -873,9 +874,10 @@ class Axis(widget.Widget):
                 format = self.autoformat
 
             # generate positions and labels
-            for posn, tickval in czip(coordticks, tickvals):
-                text = utils.formatNumber(tickval*scale, format,
-                                          locale=self.document.locale)
+            texts = utils.formatArray(
+                N.asarray(tickvals, dtype=N.float64)*scale, format,
+                locale=self.document.locale)
+            for posn, text in czip(coordticks, texts):
                 yield posn, text
 
         # position of label perpendicular to axis
@@ -38,33 +38,70 @@ class AxisError(RuntimeError):
 class FunctionError(AxisError):
     pass
 
-def solveFunction(function, vals, mint=None, maxt=None):
-    '''Solve a function for a list of values (vals), if we don't know
-    where the solution lies. function is a function to call.
-
-    This tries a range of possible input values, and uses binary
-    search to refine the solution.
-
-    mint and maxt are the bounds to use when solving
-    '''
-
-    xvals = N.array(
-        ( -1e90, -1e70, -1e50, -1e40, -1e30, -1e20,
-           -1e10, -1e8, -1e6, -1e5, -1e4,
-           -1e3, -1e2, -1e1, -4e0, -2e0, -1e0,
-           -1e-1, -1e-2, -1e-3, -1e-4,
-           -1e-6, -1e-8, -1e-10, -1e-12, -1e-14,
-           -1e-18, -1e-22, -1e-26, -1e-30, -1e-34,
-           -1e-40, -1e-50, -1e-70, -1e-90,
-           0,
-           1e-90, 1e-70, 1e-50, 1e-40,
-           1e-34, 1e-30, 1e-26, 1e-22, 1e-18,
-           1e-14, 1e-12, 1e-10, 1e-8, 1e-6,
-           1e-4, 1e-3, 1e-2, 1e-1,
-           1e0, 2e0, 4e0, 1e1, 1e2, 1e3,
-           1e4, 1e5, 1e6, 1e8, 1e10,
-           1e20, 1e30, 1e40, 1e50, 1e70, 1e90 ))
-
+# values of t tried when looking for solutions
+_probevals = N.array(
+    ( -1e90, -1e70, -1e50, -1e40, -1e30, -1e20,
+       -1e10, -1e8, -1e6, -1e5, -1e4,
+       -1e3, -1e2, -1e1, -4e0, -2e0, -1e0,
+       -1e-1, -1e-2, -1e-3, -1e-4,
+       -1e-6, -1e-8, -1e-10, -1e-12, -1e-14,
+       -1e-18, -1e-22, -1e-26, -1e-30, -1e-34,
+       -1e-40, -1e-50, -1e-70, -1e-90,
+       0,
+       1e-90, 1e-70, 1e-50, 1e-40,
+       1e-34, 1e-30, 1e-26, 1e-22, 1e-18,
+       1e-14, 1e-12, 1e-10, 1e-8, 1e-6,
+       1e-4, 1e-3, 1e-2, 1e-1,
+       1e0, 2e0, 4e0, 1e1, 1e2, 1e3,
+       1e4, 1e5, 1e6, 1e8, 1e10,
+       1e20, 1e30, 1e40, 1e50, 1e70, 1e90 ))
+
+def _evalFunction(function, xvals):
+    """Evaluate function, returning an array the same shape as xvals."""
+    return function(xvals) + N.zeros(xvals.shape)
+
+def _refineTable(function, xvals, yvals, maxpoints=2048, rounds=8):
+    """Add points to the table of x and (increasing) y values where y
+    changes most between points, so solutions start closer."""
+
+    for i in crange(rounds):
+        x1, x2 = xvals[:-1], xvals[1:]
+        y1, y2 = yvals[:-1], yvals[1:]
+        # relative change in y between points
+        with N.errstate(invalid='ignore', divide='ignore'):
+            change = (y2-y1) / (N.abs(y1)+N.abs(y2))
+        split = N.nonzero(change > 0.1)[0]
+        if len(split) == 0 or len(xvals) >= maxpoints:
+            break
+        # split the steepest intervals first
+        split = split[N.argsort(-change[split])][:maxpoints-len(xvals)]
+        split.sort()
+
+        # geometric midpoints if the points are very different in size
+        a, b = x1[split], x2[split]
+        with N.errstate(invalid='ignore'):
+            geom = (a*b > 0) & (
+                (N.abs(b) > 4*N.abs(a)) | (N.abs(a) > 4*N.abs(b)) )
+            xmid = N.where(geom, N.sign(a)*N.sqrt(N.abs(a*b)), 0.5*(a+b))
+        ymid = _evalFunction(function, xmid)
+
+        # only keep new points consistent with a monotonic function
+        ok = (ymid > yvals[split]) & (ymid < yvals[split+1])
+        if not N.any(ok):
+            break
+        xvals = N.insert(xvals, split[ok]+1, xmid[ok])
+        yvals = N.insert(yvals, split[ok]+1, ymid[ok])
+
+    return xvals, yvals
+
+def makeInverseTable(function, mint=None, maxt=None):
+    """Make a table for finding solutions of function, which should be
+    monotonic between mint and maxt.
+
+    Returns (xvals, yvals), where yvals are increasing.
+    """
+
+    xvals = _probevals
     if mint is not None:
         xvals = N.hstack(( mint, xvals[xvals > mint] ))
     if maxt is not None:
@@ -72,7 +109,7 @@ def solveFunction(function, vals, mint=None, maxt=None):
 
     # yvalue in correct shape
     try:
-        yvals = function(xvals) + N.zeros(len(xvals))
+        yvals = _evalFunction(function, xvals)
     except Exception as e:
         raise FunctionError(_('Error evaluating function: %s') % cstr(e))
 
@@ -103,69 +140,99 @@ def solveFunction(function, vals, mint=None, maxt=None):
         yfilt = yfilt[::-1]
         xfilt = xfilt[::-1]
 
-    # do binary search for each input value
-    out = []
-    for thisval in vals:
-        # renorm to zero
-        ydelta = yfilt - thisval
-
-        # solution is between this and the next
-        idx = N.searchsorted(ydelta, 0.)
-        if idx == 0:
-            if ydelta[0] == 0.:
-                # work around value being at start of array
-                idx = 1
-            else:
-                raise AxisError(_('No solution found'))
-        elif idx == len(ydelta):
-            raise AxisError(_('No solution found'))
-
-        x1, x2 = xfilt[idx-1], xfilt[idx]
-        y1, y2 = ydelta[idx-1], ydelta[idx]
-
-        # binary search
-        tol = abs(1e-6 * thisval)
-        for i in crange(30):
-            # print x1, y1, "->", x2, y2
-
-            if abs(y1) <= tol and abs(y1) < abs(y2):
-                x2, y2 = x1, y1
-                break   # found solution
-            if abs(y2) <= tol:
-                x1, y1 = x2, y2
-                break   # found solution
-
-            if y1 == y2 or ((y1<0) and (y2<0)) or ((y1>0) and (y2>0)):
-                raise AxisError(_('No solution found'))
-
-            ### This is a bit faster, but bisection is simpler
-            # xv = N.linspace(x1, x2, num=100)
-            # yv = function(xv) + xv*0. - thisval
-
-            # idx = N.searchsorted(yv, 0.)
-            # if idx == 0:
-            #     idx = 1
-
-            # x1 = xv[idx-1]
-            # y1 = yv[idx-1]
-            # x2 = xv[idx]
-            # y2 = yv[idx]
-
-            x3 = 0.5*(x1+x2)
-            y3 = function(x3) - thisval
-            if not N.isfinite(y3):
-                raise AxisError(_('Non-finite value encountered'))
-
-            if y3 < 0:
-                x1 = x3
-                y1 = y3
-            else:
-                x2 = x3
-                y2 = y3
-
-        out.append(0.5*(x1+x2))
-
-    return out
+    try:
+        return _refineTable(function, xfilt, yfilt)
+    except Exception:
+        return xfilt, yfilt
+
+def solveInverseTable(function, table, vals, maxiter=100):
+    """Solve function for the values vals, given a table from
+    makeInverseTable.
+
+    The solutions are bracketed using the table, then all refined
+    together using false position (the Illinois method), which is
+    safeguarded by bisection.
+    """
+
+    xtab, ytab = table
+    vals = N.array(vals, dtype=N.float64)
+    shape = vals.shape
+    vals = vals.ravel()
+
+    # solution is between this and the next
+    idx = N.searchsorted(ytab, vals)
+    idx[(idx == 0) & (ytab[0] == vals)] = 1
+    if N.any(idx == 0) or N.any(idx == len(ytab)):
+        raise AxisError(_('No solution found'))
+
+    # brackets for solutions, with function values relative to the
+    # wanted values (y1 <= 0 <= y2)
+    x1, x2 = xtab[idx-1], xtab[idx]
+    y1, y2 = ytab[idx-1]-vals, ytab[idx]-vals
+
+    out = N.where(N.abs(y1) < N.abs(y2), x1, x2)
+    tol = N.abs(1e-12 * vals)
+    active = N.nonzero((N.abs(y1) > tol) & (N.abs(y2) > tol))[0]
+    # which side was kept on the last iteration
+    side = N.zeros(len(active), dtype=N.int8)
+
+    x1, x2, y1, y2 = x1[active], x2[active], y1[active], y2[active]
+    for i in crange(maxiter):
+        if len(active) == 0:
+            break
+
+        with N.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            x3 = x1 - y1*(x2-x1)/(y2-y1)
+            # bisect if false position is not inside the bracket, or
+            # every few iterations to guarantee progress
+            bad = ~( (x3-x1)*(x3-x2) < 0 )
+            if i % 4 == 3:
+                bad[:] = True
+            x3[bad] = 0.5*(x1[bad]+x2[bad])
+
+        y3 = _evalFunction(function, x3) - vals[active]
+        if not N.all(N.isfinite(y3)):
+            raise AxisError(_('Non-finite value encountered'))
+
+        # replace the end of the bracket with the same sign
+        low = y3 < 0
+        high = ~low
+        x1 = N.where(low, x3, x1)
+        y1 = N.where(low, y3, y1)
+        x2 = N.where(high, x3, x2)
+        y2 = N.where(high, y3, y2)
+
+        # Illinois modification: if the same end is kept twice, halve
+        # its value to avoid slow convergence
+        newside = N.where(low, 1, -1).astype(N.int8)
+        same = newside == side
+        y2 = N.where(same & low, 0.5*y2, y2)
+        y1 = N.where(same & high, 0.5*y1, y1)
+        side = newside
+
+        out[active] = x3
+        done = ( (N.abs(y3) <= tol[active]) |
+                 (N.abs(x2-x1) <= 1e-15*N.maximum(N.abs(x1), N.abs(x2))) )
+        if N.any(done):
+            keep = ~done
+            active = active[keep]
+            x1, x2, y1, y2 = x1[keep], x2[keep], y1[keep], y2[keep]
+            side = side[keep]
+
+    return out.reshape(shape)
+
+def solveFunction(function, vals, mint=None, maxt=None):
+    '''Solve a function for a list of values (vals), if we don't know
+    where the solution lies. function is a function to call.
+
+    This tries a range of possible input values, and refines the
+    solutions from these.
+
+    mint and maxt are the bounds to use when solving
+    '''
+
+    table = makeInverseTable(function, mint=mint, maxt=maxt)
+    return solveInverseTable(function, table, vals)
 
 class AxisFunction(axis.Axis):
     '''An axis using an function of another axis.'''
@@ -177,6 +244,7 @@ class AxisFunction(axis.Axis):
         axis.Axis.__init__(self, *args, **argsv)
 
         self.cachedfuncobj = None
+        self.cachedinverse = None
         self.cachedbounds = None
         self.funcchangeset = -1
         self.boundschangeset = -1
@@ -261,25 +329,44 @@ class AxisFunction(axis.Axis):
                     return N.nan + t
             self.cachedfuncobj = function
 
-            mint, maxt = self.getMinMaxT()
             try:
-                solveFunction(function, [0.], mint=mint, maxt=maxt)
+                self.getInverseTable(function)
             except FunctionError as e:
                 self.logError(e)
                 self.cachedfuncobj = None
-            except AxisError:
-                pass
 
         return self.cachedfuncobj
 
+    def getInverseTable(self, function):
+        '''Get table for solving function (see makeInverseTable).
+
+        This is reused until the function, its t range or the custom
+        definitions change.
+        '''
+
+        text = self.settings.function.strip()
+        evaluate = self.document.evaluate
+        key = (text, self.getMinMaxT(),
+               tuple(evaluate.def_imports), tuple(evaluate.def_definitions))
+        if 'DATA' in text or 'SETTING' in text:
+            # the function can depend on anything in the document
+            key += (self.document.changeset,)
+
+        if self.cachedinverse is not None and self.cachedinverse[0] == key:
+            return self.cachedinverse[1]
+
+        mint, maxt = key[1]
+        table = makeInverseTable(function, mint=mint, maxt=maxt)
+        self.cachedinverse = (key, table)
+        return table
+
     def invertFunctionVals(self, vals):
         '''Convert values which are a function of fn and compute t.'''
         fn = self.getFunction()
         if fn is None:
             return None
-        mint, maxt = self.getMinMaxT()
         try:
-            return solveFunction(fn, vals, mint=mint, maxt=maxt)
+            return solveInverseTable(fn, self.getInverseTable(fn), vals)
         except Exception as e:
             self.logError(e)
             return None
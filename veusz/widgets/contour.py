@@ -25,6 +25,8 @@ as a C routine (taken from matplotlib) is used to trace the contours.
 from __future__ import division, print_function
 import sys
 import math
+import threading
+import time
 
 from ..compat import czip, crange
 from .. import qtall as qt4
@@ -183,6 +185,17 @@ class Contour(plotters.GenericPlotter):
         self._cachedpolygons = None
         self._cachedsubcontours = None
 
+        # incremented each time contours are retraced
+        self._tracegeneration = 0
+        # (dataset, contour settings) being traced, and thread tracing
+        self._tracing = None
+        self._tracethread = None
+        # data values used to check whether axis conversion has changed
+        self._probevals = None
+        # cache of plotter coordinate polygons and key to check validity
+        self._plotterkey = None
+        self._plotterpolys = {}
+
         if type(self) == Contour:
             self.readDefaults()
 
@@ -231,6 +244,12 @@ class Contour(plotters.GenericPlotter):
                                  usertext=_('Output levels')),
                7, readonly=True )
 
+        s.add( setting.Bool('progressive', False,
+                            descr=_('Trace contours in the background, '
+                                    'showing levels as they are completed'),
+                            usertext=_('Progressive')),
+               8 )
+
         s.add( ContourLabel('ContourLabels',
                             descr = _('Contour label settings'),
                             usertext = _('Contour labels')),
@@ -397,7 +416,8 @@ class Contour(plotters.GenericPlotter):
 
     def getNumberKeys(self):
         """How many keys to show."""
-        self.checkContoursUpToDate()
+        # only the levels are needed, so do not wait for tracing
+        self.checkContoursUpToDate(background=True)
         if self.settings.keyLevels:
             return len( self.settings.levelsOut )
         else:
@@ -420,8 +440,10 @@ class Contour(plotters.GenericPlotter):
             self.settings.Lines.get('lines').makePen(painter, number))
         painter.drawLine(x, y+height/2, x+width, y+height/2)
 
-    def checkContoursUpToDate(self):
+    def checkContoursUpToDate(self, background=False):
         """Update contours if necessary.
+        If background is set, contours may be traced in the background,
+        otherwise any background trace is waited for.
         Returns True if okay to plot contours, False if error
         """
 
@@ -432,6 +454,7 @@ class Contour(plotters.GenericPlotter):
         data = d.data.get(s.data, None)
         if data is None or data.dimensions != 2 or data.data.size == 0:
             self.contsettings = self.lastdataset = None
+            self._tracing = self._tracethread = None
             s.levelsOut = []
             return False
 
@@ -442,25 +465,49 @@ class Contour(plotters.GenericPlotter):
                          tuple(s.manualLevels) )
 
         if data is not self.lastdataset or contsettings != self.contsettings:
-            self.updateContours()
-            self.lastdataset = data
-            self.contsettings = contsettings
+            tracing = self._tracing
+            if ( tracing is None or tracing[0] is not data or
+                 tracing[1] != contsettings ):
+                # contours are marked up to date when tracing finishes
+                self._tracing = (data, contsettings)
+                self._tracethread = self.updateContours(
+                    background=background and s.progressive)
+                if self._tracethread is None:
+                    self._traceDone()
+            thread = self._tracethread
+            if not background and thread is not None:
+                thread.join()
 
         return True
 
+    def _traceDone(self):
+        """Mark the contours being traced as up to date."""
+        tracing = self._tracing
+        if tracing is not None:
+            self.lastdataset, self.contsettings = tracing
+            self._tracing = self._tracethread = None
+
     def dataDraw(self, painter, axes, posn, cliprect):
         """Draw the contours."""
 
         # update contours if necessary
-        if not self.checkContoursUpToDate():
+        interactive = getattr(painter, 'helper', None) is not None and (
+            painter.helper.interactive)
+        if not self.checkContoursUpToDate(background=interactive):
             return
 
         self.plotContourFills(painter, posn, axes, cliprect)
         self.plotContours(painter, posn, axes, cliprect)
         self.plotSubContours(painter, posn, axes, cliprect)
 
-    def updateContours(self):
-        """Update calculated contours."""
+    def updateContours(self, background=False):
+        """Update calculated contours.
+
+        Levels are traced in parallel using a pool of threads. If
+        background is True, tracing is done in a background thread,
+        and a redraw is requested as levels are completed. The thread
+        is returned, or None if tracing has finished.
+        """
 
         s = self.settings
         d = self.document
@@ -487,33 +534,122 @@ class Contour(plotters.GenericPlotter):
         self._cachedcontours = None
         self._cachedpolygons = None
         self._cachedsubcontours = None
+        self._tracegeneration += 1
+        self._plotterkey = None
+        self._plotterpolys = {}
+
+        # points across the data, used to check the axis mapping
+        self._probevals = ( N.linspace(rangex[0], rangex[1], 5),
+                            N.linspace(rangey[0], rangey[1], 5) )
+
+        if Cntr is None:
+            return
+
+        # list of (output list, index, trace arguments)
+        jobs = []
+        if len(s.Lines.lines) != 0:
+            self._cachedcontours = [None]*len(levels)
+            for i, level in enumerate(levels):
+                jobs.append( (self._cachedcontours, i, (level,)) )
+
+        # trace the polygons between the contours
+        if len(s.Fills.fills) != 0 and len(levels) > 1 and not s.Fills.hide:
+            self._cachedpolygons = [None]*(len(levels)-1)
+            for i, (level1, level2) in enumerate(
+                czip(levels[:-1], levels[1:])):
+                jobs.append( (self._cachedpolygons, i, (level1, level2)) )
+
+        # trace sub-levels
+        if len(sublevels) > 0:
+            self._cachedsubcontours = [None]*len(sublevels)
+            for i, level in enumerate(sublevels):
+                jobs.append( (self._cachedsubcontours, i, (level,)) )
+
+        generation = self._tracegeneration
+        threadcntr = threading.local()
+
+        def trace(job):
+            """Trace job, using a Cntr object for each thread, as the
+            tracer state cannot be shared."""
+            if generation != self._tracegeneration:
+                # superseded by later trace
+                return
+            c = getattr(threadcntr, 'cntr', None)
+            if c is None:
+                c = threadcntr.cntr = Cntr(xpts, ypts, data.data, mask)
+            outlist, idx, args = job
+            outlist[idx] = finitePoly(c.trace(*args))
+
+        if not background:
+            utils.parallelMap(trace, jobs)
+            return None
+
+        # minimum interval between redraw requests when progressive
+        lastredraw = [time.time()]
+        def progress(idx, result):
+            if generation != self._tracegeneration:
+                return
+            now = time.time()
+            if idx == len(jobs)-1 or now-lastredraw[0] > 0.5:
+                lastredraw[0] = now
+                d.sigRedrawRequest.emit()
+
+        def runjobs():
+            try:
+                utils.parallelMap(trace, jobs, callback=progress)
+            finally:
+                # make sure final state is shown
+                if generation == self._tracegeneration:
+                    self._traceDone()
+                    d.sigRedrawRequest.emit()
+
+        t = threading.Thread(target=runjobs)
+        t.daemon = True
+        t.start()
+        return t
+
+    def _plotterPolygons(self, name, contours, axes, posn):
+        """Get list of lists of QPolygonF in plotter coordinates for
+        the contours given.
+
+        Converted polygons are cached until the contours are retraced
+        or the mapping from data to plotter coordinates changes. Levels
+        which have not been traced yet are None.
+        """
+
+        # the key checks that points across the data map to the same
+        # plotter coordinates as before
+        px, py = self._probevals
+        key = ( self._tracegeneration, tuple(posn),
+                axes[0].dataToPlotterCoords(posn, px).tobytes(),
+                axes[1].dataToPlotterCoords(posn, py).tobytes() )
+        if key != self._plotterkey:
+            self._plotterkey = key
+            self._plotterpolys = {}
+
+        if name not in self._plotterpolys:
+            self._plotterpolys[name] = [None]*len(contours)
+        cache = self._plotterpolys[name]
+
+        for num, linelist in enumerate(contours):
+            if cache[num] is not None or linelist is None:
+                continue
+
+            polys = []
+            for curve in linelist:
+                # convert coordinates from graph to plotter
+                xplt = axes[0].dataToPlotterCoords(posn, curve[:,0])
+                yplt = axes[1].dataToPlotterCoords(posn, curve[:,1])
 
-        if Cntr is not None:
-            c = Cntr(xpts, ypts, data.data, mask)
-
-            # trace the contour levels
-            if len(s.Lines.lines) != 0:
-                self._cachedcontours = []
-                for level in levels:
-                    linelist = c.trace(level)
-                    self._cachedcontours.append( finitePoly(linelist) )
-
-            # trace the polygons between the contours
-            if len(s.Fills.fills) != 0 and len(levels) > 1 and not s.Fills.hide:
-                self._cachedpolygons = []
-                for level1, level2 in czip(levels[:-1], levels[1:]):
-                    linelist = c.trace(level1, level2)
-                    self._cachedpolygons.append( finitePoly(linelist) )
-
-            # trace sub-levels
-            if len(sublevels) > 0:
-                self._cachedsubcontours = []
-                for level in sublevels:
-                    linelist = c.trace(level)
-                    self._cachedsubcontours.append( finitePoly(linelist) )
+                pts = qt4.QPolygonF()
+                utils.addNumpyToPolygonF(pts, xplt, yplt)
+                polys.append(pts)
+            cache[num] = polys
+
+        return cache
 
     def _plotContours(self, painter, posn, axes, linestyles,
-                      contours, showlabels, hidelines, clip):
+                      contours, showlabels, hidelines, clip, name):
         """Plot a set of contours.
         """
 
@@ -533,8 +669,13 @@ class Contour(plotters.GenericPlotter):
             clip, cl.rotate, painter, font, self.document)
         levels = []
 
+        plotterpolys = self._plotterPolygons(name, contours, axes, posn)
+
         # iterate over each level, and list of lines
-        for num, linelist in enumerate(contours):
+        for num, polys in enumerate(plotterpolys):
+            if polys is None:
+                # not traced yet
+                continue
 
             if showlabels:
                 number = s.levelsOut[num]
@@ -550,13 +691,7 @@ class Contour(plotters.GenericPlotter):
                 textdims = qt4.QSizeF(0, 0)
 
             # iterate over each complete line of the contour
-            for curve in linelist:
-                # convert coordinates from graph to plotter
-                xplt = axes[0].dataToPlotterCoords(posn, curve[:,0])
-                yplt = axes[1].dataToPlotterCoords(posn, curve[:,1])
-                    
-                pts = qt4.QPolygonF()
-                utils.addNumpyToPolygonF(pts, xplt, yplt)
+            for pts in polys:
                 linelabeller.addLine(pts, textdims)
 
                 if showlabels:
@@ -583,14 +718,15 @@ class Contour(plotters.GenericPlotter):
         s = self.settings
         self._plotContours(painter, posn, axes, s.Lines.get('lines'),
                            self._cachedcontours,
-                           not s.ContourLabels.hide, s.Lines.hide, clip)
+                           not s.ContourLabels.hide, s.Lines.hide, clip,
+                           'lines')
 
     def plotSubContours(self, painter, posn, axes, clip):
         """Plot sub contours on painter."""
         s = self.settings
         self._plotContours(painter, posn, axes, s.SubLines.get('lines'),
                            self._cachedsubcontours,
-                           False, s.SubLines.hide, clip)
+                           False, s.SubLines.hide, clip, 'sublines')
 
     def plotContourFills(self, painter, posn, axes, clip):
         """Plot the traced contours on the painter."""
@@ -601,26 +737,34 @@ class Contour(plotters.GenericPlotter):
         if self._cachedpolygons is None or s.Fills.hide:
             return
 
-        # iterate over each level, and list of lines
-        for num, polylist in enumerate(self._cachedpolygons):
+        plotterpolys = self._plotterPolygons(
+            'fills', self._cachedpolygons, axes, posn)
 
-            # iterate over each complete line of the contour
-            path = qt4.QPainterPath()
-            for poly in polylist:
-                # convert coordinates from graph to plotter
-                xplt = axes[0].dataToPlotterCoords(posn, poly[:,0])
-                yplt = axes[1].dataToPlotterCoords(posn, poly[:,1])
+        # clipped paths are cached for the clipping rectangle
+        pathname = ('fillpaths', clip.left(), clip.top(),
+                    clip.width(), clip.height())
+        if pathname not in self._plotterpolys:
+            self._plotterpolys[pathname] = [None]*len(plotterpolys)
+        paths = self._plotterpolys[pathname]
 
-                pts = qt4.QPolygonF()
-                utils.addNumpyToPolygonF(pts, xplt, yplt)
-
-                clippedpoly = qt4.QPolygonF()
-                utils.polygonClip(pts, clip, clippedpoly)
-                path.addPolygon(clippedpoly)
+        # iterate over each level, and list of lines
+        for num, polys in enumerate(plotterpolys):
+            if polys is None:
+                # not traced yet
+                continue
+
+            if paths[num] is None:
+                # iterate over each complete line of the contour
+                path = qt4.QPainterPath()
+                for pts in polys:
+                    clippedpoly = qt4.QPolygonF()
+                    utils.polygonClip(pts, clip, clippedpoly)
+                    path.addPolygon(clippedpoly)
+                paths[num] = path
 
             # fill polygons
             brush = s.Fills.get('fills').returnBrushExtended(num)
-            utils.brushExtFillPath(painter, brush, path)
+            utils.brushExtFillPath(painter, brush, paths[num])
 
 # allow the factory to instantiate a contour
 document.thefactory.register( Contour )
@@ -34,14 +34,24 @@ from .. import qtall as qt4
 from .function import FunctionPlotter
 from . import widget
 
-# try importing iminuit first, then minuit, then None
-try:
-    import iminuit as minuit
-except ImportError:
-    try:
-        import minuit
-    except ImportError:
-        minuit = None
+# minuit module, imported when first fitting as it is slow to import
+minuit = None
+_minuitimported = False
+
+def importMinuit():
+    """Import iminuit first, then minuit, returning the module or
+    None if neither is available."""
+    global minuit, _minuitimported
+    if not _minuitimported:
+        _minuitimported = True
+        try:
+            import iminuit as minuit
+        except ImportError:
+            try:
+                import minuit
+            except ImportError:
+                minuit = None
+    return minuit
 
 def _(text, disambiguation=None, context='Fit'):
     """Translate text."""
@@ -340,7 +350,7 @@ class Fit(FunctionPlotter):
             sys.stderr.write(_('No data values. Not fitting.\n'))
             return
 
-        if minuit is not None:
+        if importMinuit() is not None:
             vals, chi2, dof = minuitFit(evalfunc, params, paramnames, s.values,
                                         xvals, yvals, yserr)
         else:
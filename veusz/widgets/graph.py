@@ -278,7 +278,8 @@ class Graph(widget.Widget):
                     for i in range(ax.breakvnum):
                         ax.switchBreak(i, bounds)
                         if len(b) == 1:
-                            c.draw(bounds, painthelper, outerbounds=outerbounds)
+                            self.drawChild(c, bounds, painthelper,
+                                           outerbounds=outerbounds)
                         else:
                             iteratebrokenaxes(b[1:])
                     ax.switchBreak(None, bounds)
@@ -287,7 +288,8 @@ class Graph(widget.Widget):
             else:
 
                 # standard non broken axis drawing
-                c.draw(bounds, painthelper, outerbounds=outerbounds)
+                self.drawChild(c, bounds, painthelper,
+                               outerbounds=outerbounds)
 
         # then for grid lines on top
         axiswidgets = [axis for name, axis in axisdrawlist]
@@ -299,7 +301,8 @@ class Graph(widget.Widget):
         # draw remaining axes
         for awidget in axiswidgets:
             if awidget not in axesdrawn:
-                awidget.draw(bounds, painthelper, outerbounds=outerbounds)
+                self.drawChild(awidget, bounds, painthelper,
+                               outerbounds=outerbounds)
 
         return bounds
 
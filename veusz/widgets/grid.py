@@ -373,7 +373,7 @@ class Grid(widget.Widget):
                 coutbound[3] = parentposn[3]
 
         # draw widget
-        child.draw(newbounds, phelper, outerbounds=coutbound)
+        self.drawChild(child, newbounds, phelper, outerbounds=coutbound)
 
     def getMargins(self, painthelper):
         """Use settings to compute margins."""
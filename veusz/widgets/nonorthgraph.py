@@ -159,7 +159,7 @@ class NonOrthGraph(Widget):
 
             # paint children
             for c in reversed(self.children):
-                c.draw(bounds, phelper, outerbounds=outerbounds)
+                self.drawChild(c, bounds, phelper, outerbounds=outerbounds)
 
         # controls for adjusting margins
         phelper.setControlGraph(self, [
@@ -21,7 +21,6 @@
 from __future__ import division
 import numpy as N
 
-from ..compat import czip
 from .. import qtall as qt4
 from .. import document
 from .. import datasets
@@ -173,13 +172,11 @@ class NonOrthPoint(Widget):
         font = lab.makeQFont(painter)
         angle = lab.angle
 
-        # iterate over each point and plot each label
-        for x, y, t in czip(xplotter+deltax, yplotter+deltay,
-                            textvals):
-            utils.Renderer(
-                painter, font, x, y, t,
-                alignhorz, alignvert, angle,
-                doc=self.document).render()
+        # draw the labels
+        utils.renderLabels(
+            painter, font, xplotter+deltax, yplotter+deltay, textvals,
+            alignhorz, alignvert, angle,
+            avoidoverlap=lab.avoidOverlap, doc=self.document)
 
     def getColorbarParameters(self):
         """Return parameters for colorbar."""
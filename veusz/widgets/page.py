@@ -189,7 +189,8 @@ class AxisDependHelper(object):
         if axrange == defaultrange:
             axrange = None
         # print "Updating", axis.name, axrange
-        axis.setAutoRange(axrange)
+        with utils.profilePhase(axis, 'autorange'):
+            axis.setAutoRange(axrange)
         del self.ranges[axis]
 
     def _updateRangeFromPlotter(self, axis, plotter, plotterdep):
@@ -198,7 +199,8 @@ class AxisDependHelper(object):
         if axis.isLinked():
             # take range and map back to real axis
             therange = list(defaultrange)
-            plotter.getRange(axis, plotterdep, therange)
+            with utils.profilePhase(plotter, 'autorange'):
+                plotter.getRange(axis, plotterdep, therange)
 
             if therange != defaultrange:
                 # follow up chain
@@ -215,7 +217,8 @@ class AxisDependHelper(object):
                         N.nanmax((self.ranges[axis][1], therange[1]))
                         ]
         else:
-            plotter.getRange(axis, plotterdep, self.ranges[axis])
+            with utils.profilePhase(plotter, 'autorange'):
+                plotter.getRange(axis, plotterdep, self.ranges[axis])
 
     def processWidgetDeps(self, dep):
         """Process dependencies for a single widget."""
@@ -270,11 +273,12 @@ class AxisDependHelper(object):
         Follows the dependencies calculated above.
         """
 
-        self.processDepends()
+        with utils.profilePhase(None, 'autorange'):
+            self.processDepends()
 
-        # set any remaining ranges
-        for axis in list(self.ranges.keys()):
-            self._updateAxisAutoRange(axis)
+            # set any remaining ranges
+            for axis in list(self.ranges.keys()):
+                self._updateAxisAutoRange(axis)
 
 class Page(widget.Widget):
     """A class for representing a page of plotting."""
@@ -62,6 +62,12 @@ class GenericPlotter(widget.Widget):
         s.add( setting.Axis('yAxis', 'y', 'vertical',
                             descr = _('Name of Y-axis to use'),
                             usertext=_('Y axis')) )
+        s.add( setting.Choice('exportAs', ('auto', 'vector', 'bitmap'), 'auto',
+                              descr = _('Write plot as vectors or as a bitmap '
+                                        'in PDF, SVG and EMF files. Auto '
+                                        'uses a bitmap if the plot has more '
+                                        'items than the export threshold'),
+                              usertext=_('Export as')) )
 
     def autoColor(self, painter, dataindex=0):
         """Automatic color for plotting."""
@@ -177,7 +183,7 @@ class GenericPlotter(widget.Widget):
             self.dataDraw(painter, axes, posn, cliprect)
 
         for c in self.children:
-            c.draw(posn, painthelper, outerbounds)
+            self.drawChild(c, posn, painthelper, outerbounds)
 
         return posn
 
@@ -766,8 +766,8 @@ class PointPlotter(GenericPlotter):
         painter.restore()
 
     def drawLabels(self, painter, xplotter, yplotter,
-                   textvals, markersize):
-        """Draw labels for the points."""
+                   textvals, markersize, cliprect=None):
+        """Draw labels for the points, if they are inside cliprect."""
 
         s = self.settings
         lab = s.get('Label')
@@ -784,13 +784,11 @@ class PointPlotter(GenericPlotter):
         font = lab.makeQFont(painter)
         angle = lab.angle
 
-        # iterate over each point and plot each label
-        for x, y, t in czip(xplotter+deltax, yplotter+deltay,
-                            textvals):
-            utils.Renderer(
-                painter, font, x, y, t,
-                alignhorz, alignvert, angle,
-                doc=self.document).render()
+        # draw the labels
+        utils.renderLabels(
+            painter, font, xplotter+deltax, yplotter+deltay, textvals,
+            alignhorz, alignvert, angle, clip=cliprect,
+            avoidoverlap=lab.avoidOverlap, doc=self.document)
 
     def getAxisLabels(self, direction):
         """Get labels for axis if using a label axis."""
@@ -976,7 +974,7 @@ class PointPlotter(GenericPlotter):
             if tvals and not s.Label.hide:
                 self.drawLabels(
                     painter, xpltpoint, ypltpoint,
-                    tvals, markersize)
+                    tvals, markersize, cliprect)
 
 # allow the factory to instantiate an x,y plotter
 document.thefactory.register( PointPlotter )
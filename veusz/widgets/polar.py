@@ -29,7 +29,7 @@ from .nonorthgraph import NonOrthGraph
 from .axisticks import AxisTicks
 from . import axis
 
-from ..compat import crange
+from ..compat import crange, czip
 from .. import qtall as qt4
 from .. import document
 from .. import setting
@@ -372,9 +372,10 @@ class Polar(NonOrthGraph):
 
         # draw ticks
         if not s.TickLabels.hideradial:
-            for tick in majtick:
-                num = utils.formatNumber(
-                    tick*scale, fmt,locale=self.document.locale)
+            nums = utils.formatArray(
+                N.asarray(majtick, dtype=N.float64)*scale, fmt,
+                locale=self.document.locale)
+            for tick, num in czip(majtick, nums):
                 x = self.toPlotRadius(tick) * self._xscale + self._xc
                 r = utils.Renderer(
                     painter, font, x, self._yc, num,
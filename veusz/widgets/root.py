@@ -135,7 +135,7 @@ class Root(widget.Widget):
         painter = painthelper.painter(self, posn)
         with painter:
             page = self.children[pagenum]
-            page.draw( posn, painthelper )
+            self.drawChild(page, posn, painthelper)
 
         # w and h are non integer
         w = self.settings.get('width').convert(painter)
@@ -20,6 +20,7 @@
 
 from __future__ import division, print_function
 import itertools
+import math
 import os
 
 from ..compat import czip, cbytes
@@ -254,10 +255,11 @@ class ImageFile(BoxShape):
         if type(self) == ImageFile:
             self.readDefaults()
 
-        self.cacheimage = None
-        self.cachefilename = None
-        self.cachestat = None
+        # embedded data and the key for it in the document image cache
         self.cacheembeddata = None
+        self.cacheembedkey = None
+        # key of last image file drawn
+        self.cachefilekey = None
 
         self.addAction( widget.Action('embed', self.actionEmbed,
                                       descr = _('Embed image in Veusz document '
@@ -318,24 +320,31 @@ class ImageFile(BoxShape):
         self.document.applyOperation(
             document.OperationMultiple(ops, descr=_('embed image')) )
 
-    def updateCachedImage(self):
-        """Update cache."""
+    def getImageSource(self):
+        """Return (image cache key, source) for the image, or None."""
         s = self.settings
-        self.cachestat = os.stat(s.filename)
-        self.cacheimage = qt4.QImage(s.filename)
-        self.cachefilename = s.filename
+        cache = self.document.imagecache
 
-    def updateCachedEmbedded(self):
-        """Update cached image from embedded data."""
-        s = self.settings
-        self.cacheimage = qt4.QImage()
-
-        # convert the embedded data from base64 and load into the image
-        decoded = qt4.QByteArray.fromBase64(s.embeddedImageData)
-        self.cacheimage.loadFromData(decoded)
-
-        # we cache the data we have decoded
-        self.cacheembeddata = s.embeddedImageData
+        if s.filename == '{embedded}':
+            data = s.embeddedImageData
+            if not data:
+                return None
+            # only hash the embedded data again if it changes
+            if data is not self.cacheembeddata:
+                self.cacheembedkey = cache.dataKey(data)
+                self.cacheembeddata = data
+            return self.cacheembedkey, ('data', data)
+
+        if s.filename == '':
+            return None
+        key = cache.fileKey(s.filename)
+        if key is None:
+            return None
+        if key != self.cachefilekey:
+            self.cachefilekey = key
+            # clear any embedded image data
+            s.get('embeddedImageData').set('')
+        return key, ('file', s.filename)
 
     def drawShape(self, painter, rect):
         """Draw image."""
@@ -344,52 +353,55 @@ class ImageFile(BoxShape):
         # draw border and fill
         painter.drawRect(rect)
 
-        # check to see whether image needs reloading
         image = None
-        if s.filename != '' and os.path.isfile(s.filename):
-            if (self.cachefilename != s.filename or
-                os.stat(s.filename) != self.cachestat):
-                # update the image cache
-                self.updateCachedImage()
-                # clear any embedded image data
-                self.settings.get('embeddedImageData').set('')
-            image = self.cacheimage
-
-        # or needs recreating from embedded data
-        if s.filename == '{embedded}':
-            if s.embeddedImageData is not self.cacheembeddata:
-                self.updateCachedEmbedded()
-            image = self.cacheimage
+        source = self.getImageSource()
+        if source is not None:
+            key, source = source
+            cache = self.document.imagecache
+            size = cache.imageSize(key, source)
+            if size.isValid() and size.width() > 0 and size.height() > 0:
+                irect = qt4.QRectF(qt4.QPointF(0, 0), qt4.QSizeF(size))
+
+                # preserve aspect ratio
+                if s.aspect:
+                    xr = rect.width() / irect.width()
+                    yr = rect.height() / irect.height()
+
+                    if xr > yr:
+                        rect = qt4.QRectF(
+                            rect.left()+(rect.width()-irect.width()*yr)*0.5,
+                            rect.top(), irect.width()*yr, rect.height())
+                    else:
+                        rect = qt4.QRectF(
+                            rect.left(),
+                            rect.top()+(rect.height()-irect.height()*xr)*0.5,
+                            rect.width(), irect.height()*xr)
+
+                if painter.helper.interactive:
+                    # on the screen, use a smaller version of the
+                    # image matching the size drawn, decoded in the
+                    # background
+                    t = painter.worldTransform()
+                    target = qt4.QSizeF(
+                        abs(rect.width())*math.hypot(t.m11(), t.m12()),
+                        abs(rect.height())*math.hypot(t.m21(), t.m22()))
+                    image = cache.getImage(
+                        key, source, targetsize=target, background=True)
+                else:
+                    image = cache.getImage(key, source)
 
         # if no image, then use default image
         if ( not image or image.isNull() or
              image.width() == 0 or image.height() == 0 ):
             # load replacement image
+            from PyQt5.QtSvg import QSvgRenderer
             fname = os.path.join(utils.imagedir, 'button_imagefile.svg')
-            r = qt4.QSvgRenderer(fname)
+            r = QSvgRenderer(fname)
             r.render(painter, rect)
 
         else:
-            # image rectangle
-            irect = qt4.QRectF(image.rect())
-
-            # preserve aspect ratio
-            if s.aspect:
-                xr = rect.width() / irect.width()
-                yr = rect.height() / irect.height()
-
-                if xr > yr:
-                    rect = qt4.QRectF(
-                        rect.left()+(rect.width()-irect.width()*yr)*0.5,
-                        rect.top(), irect.width()*yr, rect.height())
-                else:
-                    rect = qt4.QRectF(
-                        rect.left(),
-                        rect.top()+(rect.height()-irect.height()*xr)*0.5,
-                        rect.width(), irect.height()*xr)
-
             # finally draw image
-            painter.drawImage(rect, image, irect)
+            painter.drawImage(rect, image, qt4.QRectF(image.rect()))
 
 document.thefactory.register( Ellipse )
 document.thefactory.register( Rectangle )
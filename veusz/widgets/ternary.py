@@ -324,15 +324,14 @@ class Ternary(NonOrthGraph):
 
     def _getLabels(self, ticks, autoformat):
         """Return tick labels."""
-        labels = []
         tl = self.settings.TickLabels
         format = tl.format
         scale = tl.scale
         if format.lower() == 'auto':
             format = autoformat
-        for v in ticks:
-            l = utils.formatNumber(v*scale, format, locale=self.document.locale)
-            labels.append(l)
+        labels = utils.formatArray(
+            N.asarray(ticks, dtype=N.float64)*scale, format,
+            locale=self.document.locale)
         if self.settings.reverse:
             labels = labels[::-1]
         return labels
@@ -25,6 +25,7 @@ import itertools
 from ..compat import czip, crepr
 from .. import document
 from .. import setting
+from .. import utils
 from .. import qtall as qt4
 
 def _(text, disambiguation=None, context='Widget'):
@@ -54,6 +55,9 @@ class Action(object):
         self.descr = descr
         self.usertext = usertext
 
+# prototype settings for each widget class (see Widget.makeSettings)
+_settingsprototypes = {}
+
 class Widget(object):
     """ Fundamental plotting widget interface."""
 
@@ -73,6 +77,12 @@ class Widget(object):
         self.parent = parent
         self.document = None
 
+        # store child widgets, an index of children by name and the
+        # next number to try for each prefix in createUniqueName
+        self.children = []
+        self._childindex = {}
+        self._namecounters = {}
+
         if not self.isAllowedParent(parent):
             raise RuntimeError("Widget parent is of incorrect type")
 
@@ -85,16 +95,10 @@ class Widget(object):
             self.document = parent.document
             parent.addChild(self)
 
-        # store child widgets
-        self.children = []
-        
         # settings for widget
-        self.settings = setting.Settings( 'Widget_' + self.typename,
-                                          setnsmode='widgetsettings' )
+        self.settings = self.makeSettings()
         self.settings.parent = self
 
-        self.addSettings(self.settings)
-
         # actions for widget
         self.actions = []
 
@@ -103,6 +107,22 @@ class Widget(object):
         """Get types of widgets this can be a child of."""
         return ()
 
+    @classmethod
+    def makeSettings(klass):
+        """Make the settings for a new widget.
+
+        The settings made by addSettings are kept as a prototype for
+        each class, which new widgets get a lightweight copy of.
+        """
+
+        proto = _settingsprototypes.get(klass)
+        if proto is None:
+            proto = setting.Settings( 'Widget_' + klass.typename,
+                                      setnsmode='widgetsettings' )
+            klass.addSettings(proto)
+            _settingsprototypes[klass] = proto
+        return proto.clone()
+
     @classmethod
     def addSettings(klass, s):
         """Add items to settings s."""
@@ -115,6 +135,18 @@ class Widget(object):
         """Is this object a widget?"""
         return True
 
+    @property
+    def name(self):
+        """Name of widget."""
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        oldname = self.__dict__.get('_name')
+        self._name = name
+        if oldname is not None and self.parent is not None:
+            self.parent._childRenamed(self, oldname)
+
     def getDocument(self):
         """Return document.
         Unfortunately we need this as document is shadowed in StyleSheet,
@@ -131,9 +163,9 @@ class Widget(object):
             raise ValueError('Names cannot contain "/"')
 
         # check whether name already exists in siblings
-        for i in self.parent.children:
-            if i != self and i.name == name:
-                raise ValueError('New name "%s" already exists' % name)
+        existing = self.parent.getChild(name)
+        if existing is not None and existing is not self:
+            raise ValueError('New name "%s" already exists' % name)
 
         self.name = name
 
@@ -180,14 +212,61 @@ class Widget(object):
         index is a position to place the new child
         """
         self.children.insert(index, child)
+        self._indexChild(child)
+        self._structureChanged()
+
+    def popChild(self, index):
+        """Remove and return the child at position index."""
+        child = self.children.pop(index)
+        self._unindexChild(child, child.name)
+        self._structureChanged()
+        return child
+
+    def _indexChild(self, child):
+        """Add child to the name index.
+
+        If children share a name, the first in the list is indexed.
+        """
+        name = child.name
+        existing = self._childindex.get(name)
+        if ( existing is None or
+             self.children.index(child) < self.children.index(existing) ):
+            self._childindex[name] = child
+
+    def _unindexChild(self, child, name):
+        """Remove child from the name index, if it is there under name.
+
+        If another child has the same name, it takes its place.
+        """
+        if self._childindex.get(name) is child:
+            del self._childindex[name]
+            for c in self.children:
+                if c.name == name and c is not child:
+                    self._childindex[name] = c
+                    break
+        # names have become free, so unique names may be reused
+        self._namecounters.clear()
+
+    def _childRenamed(self, child, oldname):
+        """Update the name index after child is renamed from oldname."""
+        self._unindexChild(child, oldname)
+        self._indexChild(child)
+        self._structureChanged()
+
+    def _structureChanged(self):
+        """Note that the widget tree has changed in the document."""
+        if self.document is not None:
+            self.document.treechangeset += 1
 
     def createUniqueName(self, prefix):
         """Create a name using the prefix which hasn't been used before."""
-        names = self.childnames
 
-        i = 1
-        while "%s%i" % (prefix, i) in names:
+        # start from the last number handed out, which is safe as
+        # the counters are reset whenever a child is removed or renamed
+        i = self._namecounters.get(prefix, 1)
+        while self.getChild("%s%i" % (prefix, i)) is not None:
             i += 1
+        self._namecounters[prefix] = i + 1
         return "%s%i" % (prefix, i)
 
     def chooseName(self):
@@ -230,10 +309,7 @@ class Widget(object):
 
     def getChild(self, name):
         """Return a child with a name."""
-        for i in self.children:
-            if i.name == name:
-                return i
-        return None
+        return self._childindex.get(name)
 
     def hasChild(self, name):
         """Return whether there is a child with a name."""
@@ -247,15 +323,10 @@ class Widget(object):
     def removeChild(self, name):
         """Remove a child."""
 
-        i = 0
-        nc = len(self.children)
-        while i < nc and self.children[i].name != name:
-            i += 1
-
-        if i < nc:
-            self.children.pop(i)
-        else:
+        c = self.getChild(name)
+        if c is None:
             raise ValueError("Cannot remove graph '%s' - does not exist" % name)
+        self.popChild(self.children.index(c))
 
     def widgetSiblingIndex(self):
         """Get index of widget in its siblings."""
@@ -306,11 +377,19 @@ class Widget(object):
 
             # iterate over children in reverse order
             for c in reversed(self.children):
-                c.draw(bounds, painthelper, outerbounds=outerbounds)
+                self.drawChild(c, bounds, painthelper,
+                               outerbounds=outerbounds)
  
         # return our final bounds
         return bounds
 
+    def drawChild(self, child, *args, **argsk):
+        """Draw child widget, passing the arguments to its draw method.
+
+        The time taken is recorded if drawing is being profiled."""
+        with utils.profilePhase(child, 'draw'):
+            return child.draw(*args, **argsk)
+
     def getSaveText(self, saveall = False):
         """Return text to restore object
 
@@ -372,7 +451,7 @@ class Widget(object):
         oldindex = c.index(w)
 
         # remove the widget from its current location
-        c.pop(oldindex)
+        self.popChild(oldindex)
 
         # build a list of places widgets can be placed (slots)
         slots = []
@@ -397,13 +476,13 @@ class Widget(object):
 
         # we failed to find a new parent
         if ourindex < 0 or ourindex >= len(slots):
-            c.insert(oldindex, w)
+            self.addChild(w, index=oldindex)
             return False
         else:
             newparent, newindex = slots[ourindex]
-            existingname = w.name in newparent.childnames
-            newparent.children.insert(newindex, w)
+            existingname = newparent.hasChild(w.name)
             w.parent = newparent
+            newparent.addChild(w, index=newindex)
 
             # require a new name because of a clash
             if existingname:
@@ -26,11 +26,6 @@ import sys
 import glob
 import re
 
-try:
-    import h5py
-except ImportError:
-    h5py = None
-
 from ..compat import cstr, cstrerror, cgetcwd, cbytes
 from .. import qtall as qt4
 
@@ -504,6 +499,10 @@ class MainWindow(qt4.QMainWindow):
             'view.addtool':
                 a(self, _('Show or hide insert toolbar'), _('Insert toolbar'),
                   None, checkable=True),
+            'view.renderprofile':
+                a(self, _('Show the time spent drawing each widget on the '
+                          'current page'), _('Render &profile...'),
+                  self.slotViewRenderProfile),
 
             'data.import':
                 a(self, _('Import data into Veusz'), _('&Import...'),
@@ -594,6 +593,7 @@ class MainWindow(qt4.QMainWindow):
             ]
         viewmenu = [
             ['view.viewwindows', _('&Windows'), viewwindowsmenu],
+            'view.renderprofile',
             ''
             ]
         insertmenu = [
@@ -777,6 +777,14 @@ class MainWindow(qt4.QMainWindow):
         self.showDialog(dialog)
         return dialog
 
+    def slotViewRenderProfile(self):
+        """Show time taken drawing widgets on current page."""
+        from ..dialogs.renderprofile import RenderProfileDialog
+        dialog = RenderProfileDialog(
+            self, self.document, self.plot.getPageNumber())
+        self.showDialog(dialog)
+        return dialog
+
     def slotHelpHomepage(self):
         """Go to the veusz homepage."""
         qt4.QDesktopServices.openUrl(qt4.QUrl('https://veusz.github.io/'))
@@ -998,7 +1006,7 @@ class MainWindow(qt4.QMainWindow):
         """Save As file."""
 
         filters = [_('Veusz document files (*.vsz)')]
-        if h5py is not None:
+        if utils.moduleAvailable('h5py'):
             filters += [_('Veusz HDF5 document files (*.vszh5)')]
         filename = self.fileSaveDialog(filters, _('Save as'))
         if filename:
@@ -1129,7 +1137,7 @@ class MainWindow(qt4.QMainWindow):
         """Open an existing file in a new window."""
 
         filters = ['*.vsz']
-        if h5py is not None:
+        if utils.moduleAvailable('h5py'):
             filters.append('*.vszh5')
 
         filename = self.fileOpenDialog(
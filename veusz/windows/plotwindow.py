@@ -286,6 +286,7 @@ class PlotWindow( qt4.QGraphicsView ):
         self.docchangeset = -100
         self.oldpagenumber = -1
         self.document.signalModified.connect(self.slotDocModified)
+        self.document.sigRedrawRequest.connect(self.actionForceUpdate)
 
         # state of last plot from painthelper
         self.painthelper = None
@@ -938,7 +939,8 @@ class PlotWindow( qt4.QGraphicsView ):
                 try:
                     phelper = document.PaintHelper(
                         self.document, size,
-                        scaling=self.zoomfactor, dpi=self.dpi)
+                        scaling=self.zoomfactor, dpi=self.dpi,
+                        interactive=True)
                     self.document.paintTo(phelper, self.pagenumber)
 
                 except Exception:
@@ -1023,6 +1025,7 @@ class PlotWindow( qt4.QGraphicsView ):
 
         menu.exec_(qt4.QCursor.pos())
 
+    @qt4.pyqtSlot()
     def actionForceUpdate(self):
         """Force an update for the graph."""
         self.docchangeset = -100
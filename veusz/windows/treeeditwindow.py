@@ -1003,7 +1003,7 @@ class TreeEditDock(qt4.QDockWidget):
 
         assert parent is not None
 
-        if name in parent.childnames:
+        if parent.hasChild(name):
             name = None
         
         # make the new widget and update the document